@@ -0,0 +1,258 @@
+"""
+Local audit archive of logged events
+Time-rolled segments compressed with gzip, each with a sidecar index by server, user and event type
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from log_events import LogEvent
+
+ACTIVE_SUFFIX = '.jsonl'
+SEGMENT_SUFFIX = '.jsonl.gz'
+INDEX_SUFFIX = '.idx.json'
+
+class SegmentIndex:
+    """Which servers, users and event types appear in one segment, and its time range"""
+
+    def __init__(self, name, start=None, end=None, count=0, guilds=None):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.count = count
+        # guild_id -> {'events': LogEvent bits, 'users': set of user IDs}
+        self.guilds = guilds if guilds is not None else {}
+
+    def add(self, record):
+        self.start = record['t'] if self.start is None else min(self.start, record['t'])
+        self.end = record['t'] if self.end is None else max(self.end, record['t'])
+        self.count += 1
+        entry = self.guilds.get(record['g'])
+        if entry is None:
+            entry = self.guilds[record['g']] = {'events': 0, 'users': set()}
+        entry['events'] |= LogEvent[record['e']]
+        if record['u'] is not None:
+            entry['users'].add(record['u'])
+
+    def matches(self, guild_id, since, user_id=None, events=None):
+        """True if the segment may contain records for this query"""
+        entry = self.guilds.get(guild_id)
+        if entry is None or self.end is None or self.end < since:
+            return False
+        if events is not None and not entry['events'] & events:
+            return False
+        if user_id is not None and user_id not in entry['users']:
+            return False
+        return True
+
+    def to_dict(self):
+        return {
+            'start': self.start,
+            'end': self.end,
+            'count': self.count,
+            'guilds': {
+                str(guild_id): {'events': int(entry['events']), 'users': sorted(entry['users'])}
+                for guild_id, entry in self.guilds.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, name, data):
+        guilds = {
+            int(guild_id): {'events': entry['events'], 'users': set(entry['users'])}
+            for guild_id, entry in data['guilds'].items()
+        }
+        return cls(name, data['start'], data['end'], data['count'], guilds)
+
+class AuditArchive:
+    """Append-only archive of log events with per-segment indexes for fast searches"""
+
+    def __init__(self, directory, segment_seconds=3600, retention_days=30, flush_interval=1.0):
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.retention_days = retention_days
+        self.flush_interval = flush_interval
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='audit-archive')
+        self.buffer = []
+        self.indexes = []  # SegmentIndex for every finished segment, oldest first
+        self.active = None  # SegmentIndex of the segment being written
+        self.active_started = 0
+        self.task = None
+        self.archived = 0
+        self.listeners = []  # Called on the archive thread with every written batch
+
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+    def _path(self, name, suffix):
+        return os.path.join(self.directory, name + suffix)
+
+    def _recover(self):
+        """Finish segments left open by a previous run and load all sidecar indexes"""
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith(ACTIVE_SUFFIX):
+                self._finish_segment(filename[:-len(ACTIVE_SUFFIX)])
+
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith(INDEX_SUFFIX):
+                name = filename[:-len(INDEX_SUFFIX)]
+                try:
+                    with open(self._path(name, INDEX_SUFFIX), 'r') as f:
+                        self.indexes.append(SegmentIndex.from_dict(name, json.load(f)))
+                except (OSError, ValueError) as e:
+                    logging.error(f"Could not read archive index {filename}: {e}")
+        self._prune()
+
+    def _finish_segment(self, name):
+        """Compress a finished segment and write its sidecar index"""
+        active_path = self._path(name, ACTIVE_SUFFIX)
+        index = SegmentIndex(name)
+        with open(active_path, 'rb') as source, gzip.open(self._path(name, SEGMENT_SUFFIX), 'wb') as target:
+            for line in source:
+                try:
+                    index.add(json.loads(line))
+                except (ValueError, KeyError):
+                    continue
+                target.write(line)
+
+        with open(self._path(name, INDEX_SUFFIX) + '.tmp', 'w') as f:
+            json.dump(index.to_dict(), f, separators=(',', ':'))
+        os.replace(self._path(name, INDEX_SUFFIX) + '.tmp', self._path(name, INDEX_SUFFIX))
+        os.remove(active_path)
+        return index
+
+    def _prune(self):
+        """Delete segments older than the retention period"""
+        cutoff = time.time() - self.retention_days * 86400
+        while self.indexes and self.indexes[0].end is not None and self.indexes[0].end < cutoff:
+            index = self.indexes.pop(0)
+            for suffix in (SEGMENT_SUFFIX, INDEX_SUFFIX):
+                try:
+                    os.remove(self._path(index.name, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def record(self, guild_id, event, user_id=None, data=None):
+        """Queue one event for the archive"""
+        self.buffer.append({
+            't': time.time(),
+            'g': guild_id,
+            'u': user_id,
+            'e': event.name,
+            'd': data or {}
+        })
+
+    def _write(self, records):
+        """Append records to the active segment, rolling it over when it gets too old"""
+        now = time.time()
+        if self.active is not None and now - self.active_started >= self.segment_seconds:
+            self.indexes.append(self._finish_segment(self.active.name))
+            self.active = None
+            self._prune()
+
+        if self.active is None:
+            name = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S-%f')
+            self.active = SegmentIndex(name)
+            self.active_started = now
+
+        with open(self._path(self.active.name, ACTIVE_SUFFIX), 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+                self.active.add(record)
+
+        for listener in self.listeners:
+            try:
+                listener(records)
+            except Exception as e:
+                logging.error(f"Audit archive listener failed: {e}")
+
+    async def flush(self):
+        """Write buffered records on the archive thread"""
+        if not self.buffer:
+            return
+        records, self.buffer = self.buffer, []
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self._write, records)
+            self.archived += len(records)
+        except OSError as e:
+            logging.error(f"Failed to write audit archive: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        self.task = asyncio.create_task(self._flush_loop())
+
+    def _read_segment(self, name, active):
+        if active:
+            with open(self._path(name, ACTIVE_SUFFIX), 'rb') as f:
+                data = f.read()
+        else:
+            with gzip.open(self._path(name, SEGMENT_SUFFIX), 'rb') as f:
+                data = f.read()
+        for line in data.splitlines():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+    def _search(self, guild_id, since, user_id, events, limit):
+        segments = [(index.name, False) for index in self.indexes
+                    if index.matches(guild_id, since, user_id, events)]
+        if self.active is not None and self.active.matches(guild_id, since, user_id, events):
+            segments.append((self.active.name, True))
+
+        results = []
+        read = 0
+        # Newest segments first so the most recent matches are found without reading everything
+        for name, active in reversed(segments):
+            read += 1
+            matches = []
+            for record in self._read_segment(name, active):
+                if record['g'] != guild_id or record['t'] < since:
+                    continue
+                if user_id is not None and record['u'] != user_id:
+                    continue
+                if events is not None and not LogEvent[record['e']] & events:
+                    continue
+                matches.append(record)
+            results.extend(reversed(matches))
+            if len(results) >= limit:
+                break
+        return results[:limit], read
+
+    async def search(self, guild_id, since, user_id=None, events=None, limit=25):
+        """Newest matching records and the number of segments that had to be read"""
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._search, guild_id, since, user_id, events, limit)
+
+    def stats(self):
+        """Archive size for status commands"""
+        return {
+            'segments': len(self.indexes) + (1 if self.active else 0),
+            'records': sum(index.count for index in self.indexes) + (self.active.count if self.active else 0),
+            'archived': self.archived
+        }
+
+    async def close(self):
+        """Stop the flush task, write what is buffered and close the active segment"""
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        await self.flush()
+        if self.active is not None:
+            loop = asyncio.get_running_loop()
+            index = await loop.run_in_executor(self.executor, self._finish_segment, self.active.name)
+            self.indexes.append(index)
+            self.active = None
+        self.executor.shutdown(wait=True)
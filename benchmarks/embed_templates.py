@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: cost of building one "Message Sent" log embed
+Compares the old inline embed construction with the precomputed templates and author cache
+
+Run from the repository root:
+    python benchmarks/embed_templates.py
+"""
+
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+
+import log_embeds
+
+AUTHORS = [
+    discord.User(state=None, data={
+        'id': str(100000000000000000 + i),
+        'username': f'user{i}',
+        'discriminator': '0',
+        'avatar': f'{i:032x}' if i % 4 else None,
+        'global_name': None
+    })
+    for i in range(50)
+]
+
+def make_message(i):
+    return SimpleNamespace(
+        id=200000000000000000 + i,
+        author=AUTHORS[i % len(AUTHORS)],
+        channel=SimpleNamespace(id=300000000000000000, mention='<#300000000000000000>'),
+        content=f'message number {i} with some typical chat text in it',
+        attachments=[]
+    )
+
+MESSAGES = [make_message(i) for i in range(1000)]
+
+def inline_embed(message):
+    """How the handlers built embeds before templates"""
+    embed = discord.Embed(
+        title="📝 Message Sent",
+        color=0x00ff00,
+        timestamp=datetime.now(timezone.utc)
+    )
+    embed.add_field(name="👤 User", value=f"{message.author.mention} ({message.author})", inline=True)
+    embed.add_field(name="📁 Channel", value=f"{message.channel.mention}", inline=True)
+    embed.add_field(name="🆔 Message ID", value=message.id, inline=True)
+    embed.add_field(name="💬 Content", value=message.content[:1000] if message.content else "*No text content*", inline=False)
+    if message.attachments:
+        embed.add_field(name="📎 Attachments", value="\n".join([att.filename for att in message.attachments]), inline=False)
+    embed.set_thumbnail(url=message.author.avatar.url if message.author.avatar else message.author.default_avatar.url)
+    return embed
+
+author_cache = log_embeds.AuthorCache()
+
+def template_embed(message):
+    user, avatar_url = author_cache.get(message.author)
+    attachments = [att.filename for att in message.attachments]
+    return log_embeds.MESSAGE_SENT.build(
+        user,
+        message.channel.mention,
+        message.id,
+        message.content[:1000] if message.content else "*No text content*",
+        "\n".join(attachments) if attachments else None,
+        thumbnail=avatar_url
+    )
+
+def run(build, repeat=5):
+    def batch():
+        for message in MESSAGES:
+            build(message)
+    best = min(timeit.repeat(batch, number=1, repeat=repeat))
+    return best / len(MESSAGES) * 1e6
+
+if __name__ == '__main__':
+    # Both paths must produce the same payload apart from the timestamp
+    for message in MESSAGES[:10]:
+        before, after = inline_embed(message).to_dict(), template_embed(message).to_dict()
+        before.pop('timestamp')
+        after.pop('timestamp')
+        assert before == after, (before, after)
+
+    inline_us = run(inline_embed)
+    template_us = run(template_embed)
+    print(f"inline:   {inline_us:.2f} µs/event")
+    print(f"template: {template_us:.2f} µs/event ({inline_us / template_us:.2f}x)")
+    print(f"author cache: {author_cache.stats()}")
@@ -0,0 +1,118 @@
+"""
+Benchmark: event throughput on the default asyncio loop vs uvloop
+Replays the bot's event pattern (one task per dispatched listener, each awaiting a little
+I/O) plus newline-delimited messages over a local TCP connection like the cluster IPC
+
+Run from the repository root (uvloop is skipped if it is not installed):
+    python benchmarks/event_loop.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loop_monitor import LoopMonitor
+
+EVENTS = 50000
+MESSAGES = 20000
+
+async def dispatch_events():
+    """Events per second when every event schedules a listener task, as Client.dispatch does"""
+    queue = asyncio.Queue()
+    done = asyncio.Event()
+    handled = 0
+
+    async def listener(payload):
+        nonlocal handled
+        await queue.put(payload['id'])
+        await asyncio.sleep(0)
+        handled += 1
+        if handled == EVENTS:
+            done.set()
+
+    async def drain():
+        while True:
+            await queue.get()
+
+    drainer = asyncio.create_task(drain())
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    for i in range(EVENTS):
+        loop.create_task(listener({'id': i, 't': 'MESSAGE_CREATE'}))
+        if i % 500 == 0:
+            await asyncio.sleep(0)  # Let handlers run between gateway reads
+    await done.wait()
+    elapsed = time.perf_counter() - started
+    drainer.cancel()
+    return EVENTS / elapsed
+
+async def stream_messages():
+    """JSON lines per second through a loopback TCP connection"""
+    received = 0
+    finished = asyncio.Event()
+
+    async def serve(reader, writer):
+        nonlocal received
+        while await reader.readline():
+            received += 1
+            if received == MESSAGES:
+                finished.set()
+        writer.close()
+
+    server = await asyncio.start_server(serve, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    line = json.dumps({'op': 'call', 'action': 'stats', 'args': {}}).encode('utf-8') + b'\n'
+
+    started = time.perf_counter()
+    for i in range(MESSAGES):
+        writer.write(line)
+        if i % 100 == 0:
+            await writer.drain()
+    await writer.drain()
+    await finished.wait()
+    elapsed = time.perf_counter() - started
+    writer.close()
+    server.close()
+    await server.wait_closed()
+    return MESSAGES / elapsed
+
+async def workload():
+    monitor = LoopMonitor(interval=0.01, warn_after=10.0)
+    monitor.start()
+    events = await dispatch_events()
+    messages = await stream_messages()
+    await monitor.close()
+    return events, messages, monitor.stats()
+
+def run(new_loop, repeat=3):
+    results = []
+    for _ in range(repeat):
+        loop = new_loop()
+        try:
+            results.append(loop.run_until_complete(workload()))
+        finally:
+            loop.close()
+    # Best throughput of the runs, lag from the same run
+    return max(results, key=lambda result: result[0])
+
+def report(name, result):
+    events, messages, lag = result
+    print(f"{name:<8} events: {events:>10,.0f}/s   ipc lines: {messages:>10,.0f}/s   "
+          f"loop lag p99: {lag['p99'] * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    baseline = run(asyncio.new_event_loop)
+    report("asyncio", baseline)
+    try:
+        import uvloop
+    except ImportError:
+        print("uvloop   not installed (pip install uvloop)")
+    else:
+        result = run(uvloop.new_event_loop)
+        report("uvloop", result)
+        print(f"uvloop speedup: events {result[0] / baseline[0]:.2f}x, ipc lines {result[1] / baseline[1]:.2f}x")
@@ -0,0 +1,254 @@
+"""
+Lightweight stand-ins for discord.py models, built from raw gateway payloads
+Only the attributes SecureBot's handlers read are implemented, so events can be replayed
+without a connection, a ConnectionState or the library's caches
+"""
+
+import itertools
+from datetime import datetime, timezone
+
+import discord
+
+_CDN = "https://cdn.discordapp.com"
+
+class FakeAsset:
+    __slots__ = ('url',)
+
+    def __init__(self, url):
+        self.url = url
+
+class FakeUser:
+    __slots__ = ('id', 'name', 'bot', 'avatar', 'default_avatar')
+
+    def __init__(self, data):
+        self.id = int(data['id'])
+        self.name = data.get('global_name') or data.get('username', 'user')
+        self.bot = data.get('bot', False)
+        avatar = data.get('avatar')
+        self.avatar = FakeAsset(f"{_CDN}/avatars/{self.id}/{avatar}.png") if avatar else None
+        self.default_avatar = FakeAsset(f"{_CDN}/embed/avatars/{(self.id >> 22) % 6}.png")
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+    @property
+    def created_at(self):
+        return discord.utils.snowflake_time(self.id)
+
+    def __str__(self):
+        return self.name
+
+class FakeRole:
+    __slots__ = ('id', 'name')
+
+    def __init__(self, data):
+        self.id = int(data['id'])
+        self.name = data.get('name', 'role')
+
+def _member_roles(guild, role_ids):
+    # Like Member.roles: @everyone first, then the member's roles
+    return [guild.default_role] + [guild.roles[int(role_id)] for role_id in role_ids if int(role_id) in guild.roles]
+
+class FakeMember(FakeUser):
+    __slots__ = ('guild', 'nick', 'roles', 'joined_at', 'status')
+
+    def __init__(self, data, guild):
+        super().__init__(data['user'])
+        self.guild = guild
+        self.nick = data.get('nick')
+        self.roles = _member_roles(guild, data.get('roles', ()))
+        joined_at = data.get('joined_at')
+        self.joined_at = datetime.fromisoformat(joined_at) if joined_at else None
+        self.status = discord.Status.offline
+
+    def updated(self, data):
+        """A copy with a GUILD_MEMBER_UPDATE applied, the original stays as the 'before' state"""
+        member = object.__new__(FakeMember)
+        for name in FakeUser.__slots__ + FakeMember.__slots__:
+            setattr(member, name, getattr(self, name))
+        member.nick = data.get('nick', self.nick)
+        member.roles = _member_roles(self.guild, data['roles']) if 'roles' in data else list(self.roles)
+        return member
+
+class FakeChannel:
+    __slots__ = ('id', 'name', 'type', 'guild')
+
+    def __init__(self, data, guild):
+        self.id = int(data['id'])
+        self.name = data.get('name', 'channel')
+        self.type = discord.ChannelType(data.get('type', 0))
+        self.guild = guild
+
+    @property
+    def mention(self):
+        return f"<#{self.id}>"
+
+class FakeGuild:
+    __slots__ = ('id', 'name', 'member_count', 'roles', 'default_role', 'channels', 'member_map', 'chunked')
+
+    def __init__(self, data):
+        self.id = int(data['id'])
+        self.name = data.get('name', 'guild')
+        self.roles = {int(role['id']): FakeRole(role) for role in data.get('roles', ())}
+        self.default_role = self.roles.get(self.id) or FakeRole({'id': self.id, 'name': '@everyone'})
+        self.channels = {}
+        self.member_map = {}  # user_id -> FakeMember
+        self.chunked = True
+        for channel in data.get('channels', ()):
+            self.channels[int(channel['id'])] = FakeChannel(channel, self)
+        for member in data.get('members', ()):
+            member = FakeMember(member, self)
+            self.member_map[member.id] = member
+        self.member_count = data.get('member_count', len(self.member_map))
+
+    @property
+    def members(self):
+        return list(self.member_map.values())
+
+class FakeAttachment:
+    __slots__ = ('filename',)
+
+    def __init__(self, data):
+        self.filename = data.get('filename', 'file')
+
+class FakeMessage:
+    __slots__ = ('id', 'author', 'channel', 'guild', 'content', 'attachments')
+
+    def __init__(self, data, author, channel, guild):
+        self.id = int(data['id'])
+        self.author = author
+        self.channel = channel
+        self.guild = guild
+        self.content = data.get('content', '')
+        self.attachments = [FakeAttachment(attachment) for attachment in data.get('attachments', ())]
+
+    @property
+    def created_at(self):
+        return discord.utils.snowflake_time(self.id)
+
+class FakeRawMessageUpdate:
+    """RawMessageUpdateEvent without the Message object the library would build"""
+    __slots__ = ('message_id', 'channel_id', 'guild_id', 'data', 'cached_message')
+
+    def __init__(self, data):
+        self.message_id = int(data['id'])
+        self.channel_id = int(data['channel_id'])
+        self.guild_id = int(data['guild_id']) if 'guild_id' in data else None
+        self.data = data
+        self.cached_message = None
+
+class FakeVoiceState:
+    __slots__ = ('channel',)
+
+    def __init__(self, channel):
+        self.channel = channel
+
+# =================================
+# WORLD STATE
+# =================================
+
+class World:
+    """Servers, members and voice states built up from the stream, turning payloads into handler calls
+
+    GUILD_CREATE payloads (synthetic or recorded) define the servers, servers first seen in
+    another event start empty. Every other supported event becomes (handler name, args).
+    """
+
+    HANDLERS = {
+        'MESSAGE_CREATE': 'on_message',
+        'MESSAGE_UPDATE': 'on_raw_message_edit',
+        'MESSAGE_DELETE': 'on_raw_message_delete',
+        'MESSAGE_DELETE_BULK': 'on_raw_bulk_message_delete',
+        'GUILD_MEMBER_ADD': 'on_member_join',
+        'GUILD_MEMBER_REMOVE': 'on_member_remove',
+        'GUILD_MEMBER_UPDATE': 'on_member_update',
+        'VOICE_STATE_UPDATE': 'on_voice_state_update',
+        'CHANNEL_CREATE': 'on_guild_channel_create',
+        'CHANNEL_DELETE': 'on_guild_channel_delete'
+    }
+
+    def __init__(self):
+        self.guilds = {}
+        self.users = {}
+        self.voice = {}  # (guild_id, user_id) -> channel
+
+    def get_user(self, user_id):
+        return self.users.get(user_id)
+
+    def _member(self, guild, data):
+        user = data.get('user') or data.get('author')
+        member = guild.member_map.get(int(user['id']))
+        if member is None:
+            member = FakeMember({'user': user, 'roles': data.get('roles', ())}, guild)
+            guild.member_map[member.id] = member
+            self.users[member.id] = member
+        return member
+
+    def _channel(self, guild, channel_id):
+        channel = guild.channels.get(channel_id)
+        if channel is None:
+            channel = guild.channels[channel_id] = FakeChannel({'id': channel_id}, guild)
+        return channel
+
+    def apply(self, event):
+        """Handler name and arguments for one {'t', 'd'} payload, or None if it is not replayed"""
+        kind, data = event.get('t'), event.get('d') or {}
+        if kind == 'GUILD_CREATE':
+            guild = self.guilds[int(data['id'])] = FakeGuild(data)
+            self.users.update(guild.member_map)
+            return None
+        if kind not in self.HANDLERS:
+            return None
+        if 'guild_id' not in data:
+            return None  # DMs
+        guild = self.guilds.get(int(data['guild_id']))
+        if guild is None:
+            # Recordings can start after the server's GUILD_CREATE
+            guild = self.guilds[int(data['guild_id'])] = FakeGuild({'id': data['guild_id']})
+
+        if kind == 'MESSAGE_CREATE':
+            author = self._member(guild, data) if not data['author'].get('bot') else FakeUser(data['author'])
+            args = (FakeMessage(data, author, self._channel(guild, int(data['channel_id'])), guild),)
+        elif kind == 'MESSAGE_UPDATE':
+            args = (FakeRawMessageUpdate(data),)
+        elif kind == 'MESSAGE_DELETE':
+            args = (discord.RawMessageDeleteEvent(data),)
+        elif kind == 'MESSAGE_DELETE_BULK':
+            args = (discord.RawBulkMessageDeleteEvent(data),)
+        elif kind == 'GUILD_MEMBER_ADD':
+            member = FakeMember(data, guild)
+            guild.member_map[member.id] = self.users[member.id] = member
+            guild.member_count += 1
+            args = (member,)
+        elif kind == 'GUILD_MEMBER_REMOVE':
+            member = guild.member_map.pop(int(data['user']['id']), None)
+            if member is None:
+                return None
+            guild.member_count -= 1
+            args = (member,)
+        elif kind == 'GUILD_MEMBER_UPDATE':
+            before = self._member(guild, data)
+            after = guild.member_map[before.id] = self.users[before.id] = before.updated(data)
+            args = (before, after)
+        elif kind == 'VOICE_STATE_UPDATE':
+            member = self._member(guild, data.get('member') or {'user': {'id': data['user_id']}})
+            key = (guild.id, member.id)
+            before = self.voice.get(key)
+            after = self._channel(guild, int(data['channel_id'])) if data.get('channel_id') else None
+            self.voice[key] = after
+            args = (member, FakeVoiceState(before), FakeVoiceState(after))
+        elif kind == 'CHANNEL_CREATE':
+            channel = guild.channels[int(data['id'])] = FakeChannel(data, guild)
+            args = (channel,)
+        else:  # CHANNEL_DELETE
+            channel = guild.channels.pop(int(data['id']), None) or FakeChannel(data, guild)
+            args = (channel,)
+        return self.HANDLERS[kind], args
+
+# One millisecond apart, starting 2024-01-01
+_snowflakes = itertools.count(discord.utils.time_snowflake(datetime(2024, 1, 1, tzinfo=timezone.utc)), 1 << 22)
+
+def snowflake():
+    """A fresh, increasing Discord ID"""
+    return next(_snowflakes)
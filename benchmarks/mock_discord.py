@@ -0,0 +1,208 @@
+"""
+Local stand-in for the parts of Discord's REST API the bot uses for logging and moderation
+Serves channel messages, webhook executes, bans, kicks and role changes with simulated
+latency, per-route rate limit buckets (429 with Retry-After and X-RateLimit headers) and 5xx bursts.
+
+Point discord.py at it with point_discord_py_at(mock.url); see benchmarks/rest_load.py for scenarios.
+"""
+
+import asyncio
+import collections
+import json
+import random
+import time
+
+import discord
+from aiohttp import web
+
+BOT_USER = {'id': '100000000000000001', 'username': 'MockBot', 'discriminator': '0', 'avatar': None, 'bot': True}
+APPLICATION = {
+    'id': BOT_USER['id'], 'name': 'MockBot', 'description': '', 'icon': None, 'verify_key': '0' * 64,
+    'bot_public': True, 'bot_require_code_grant': False, 'flags': 0,
+    'owner': {'id': '100000000000000002', 'username': 'owner', 'discriminator': '0', 'avatar': None}
+}
+
+def json_response(body, status=200, headers=None):
+    # discord.py only decodes bodies whose Content-Type is exactly application/json, without a charset
+    headers = dict(headers or {}, **{'Content-Type': 'application/json'})
+    return web.Response(body=json.dumps(body).encode('utf-8'), status=status, headers=headers)
+
+def point_discord_py_at(url):
+    """Send every discord.py REST and webhook request to the mock instead of discord.com"""
+    discord.http.Route.BASE = f'{url}/api/v10'
+
+class Bucket:
+    """A fixed window rate limit like Discord's per-route buckets"""
+    __slots__ = ('limit', 'window', 'remaining', 'reset_at')
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def take(self, now):
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+        if self.remaining == 0:
+            return False
+        self.remaining -= 1
+        return True
+
+class MockDiscord:
+    """The mock server
+
+    limits maps a route name ('messages', 'webhook', 'ban', 'kick', 'role') to (requests, window
+    seconds) per major parameter, like Discord's buckets. Defaults are Discord's documented
+    5 per 5 seconds for channel messages and generous limits elsewhere.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.03, limits=None, global_limit=50,
+                 error_rate=0.0, error_burst=(2.0, 0.5), seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.limits = {'messages': (5, 5.0), 'webhook': (5, 2.0), 'ban': (10, 10.0), 'kick': (10, 10.0), 'role': (10, 10.0)}
+        self.limits.update(limits or {})
+        self.global_limit = global_limit  # Requests per second across all routes, 0 for none
+        # Chance per second that a burst of 5xx responses starts, and (length, share of requests failing)
+        self.error_rate = error_rate
+        self.error_burst = error_burst
+        self.error_until = 0.0
+        self.next_error_check = 0.0
+        self.rng = random.Random(seed)
+        self.buckets = {}
+        self.global_bucket = Bucket(global_limit, 1.0) if global_limit else None
+        self.statuses = collections.Counter()
+        self.received = []  # (perf_counter time, route, major parameter, payload)
+        self.runner = None
+        self.url = None
+
+    # =================================
+    # FAULTS
+    # =================================
+
+    def _limited(self, route, major, now):
+        """None if the request may proceed, otherwise (retry_after, global)"""
+        if self.global_bucket and not self.global_bucket.take(now):
+            return self.global_bucket.reset_at - now, True
+        bucket = self.buckets.get((route, major))
+        if bucket is None:
+            bucket = self.buckets[(route, major)] = Bucket(*self.limits[route])
+        if not bucket.take(now):
+            return bucket.reset_at - now, False
+        return None
+
+    def _server_error(self, now):
+        if self.error_rate and now >= self.next_error_check:
+            self.next_error_check = now + 1.0
+            if self.rng.random() < self.error_rate:
+                self.error_until = now + self.error_burst[0]
+        return now < self.error_until and self.rng.random() < self.error_burst[1]
+
+    def _ratelimit_headers(self, route, major, now):
+        bucket = self.buckets[(route, major)]
+        return {
+            'X-RateLimit-Limit': str(bucket.limit),
+            'X-RateLimit-Remaining': str(bucket.remaining),
+            'X-RateLimit-Reset': f'{time.time() + bucket.reset_at - now:.3f}',
+            'X-RateLimit-Reset-After': f'{bucket.reset_at - now:.3f}',
+            'X-RateLimit-Bucket': f'mock-{route}'
+        }
+
+    async def _handle(self, request, route, major, respond):
+        await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+        now = time.monotonic()
+
+        if self._server_error(now):
+            status = self.rng.choice((500, 502, 503))
+            self.statuses[status] += 1
+            return web.Response(status=status, text='upstream connect error')
+
+        limited = self._limited(route, major, now)
+        if limited is not None:
+            retry_after, is_global = limited
+            self.statuses[429] += 1
+            headers = {'Retry-After': f'{retry_after:.3f}', 'Via': '1.1 google',
+                       'X-RateLimit-Scope': 'global' if is_global else 'user'}
+            if is_global:
+                headers['X-RateLimit-Global'] = 'true'
+            else:
+                headers.update(self._ratelimit_headers(route, major, now))
+            body = {'message': 'You are being rate limited.', 'retry_after': round(retry_after, 3), 'global': is_global}
+            return json_response(body, status=429, headers=headers)
+
+        payload = await request.json() if request.can_read_body else None
+        self.received.append((time.perf_counter(), route, major, payload))
+        status, body = respond(request, payload)
+        self.statuses[status] += 1
+        headers = self._ratelimit_headers(route, major, now)
+        if body is None:
+            return web.Response(status=status, headers=headers)
+        return json_response(body, status=status, headers=headers)
+
+    # =================================
+    # ROUTES
+    # =================================
+
+    def _message(self, channel_id, payload):
+        payload = payload or {}
+        return {
+            'id': str(discord.utils.time_snowflake(discord.utils.utcnow())),
+            'channel_id': str(channel_id),
+            'type': 0,
+            'author': BOT_USER,
+            'content': payload.get('content') or '',
+            'embeds': payload.get('embeds') or [],
+            'attachments': [],
+            'mentions': [],
+            'mention_roles': [],
+            'mention_everyone': False,
+            'pinned': False,
+            'tts': False,
+            'timestamp': discord.utils.utcnow().isoformat(),
+            'edited_timestamp': None
+        }
+
+    async def _messages(self, request):
+        channel_id = request.match_info['channel_id']
+        return await self._handle(request, 'messages', channel_id,
+                                  lambda request, payload: (200, self._message(channel_id, payload)))
+
+    async def _webhook(self, request):
+        webhook_id = request.match_info['webhook_id']
+        def respond(request, payload):
+            if request.query.get('wait') in ('true', '1'):
+                return 200, self._message(webhook_id, payload)
+            return 204, None
+        return await self._handle(request, 'webhook', webhook_id, respond)
+
+    async def _no_content(self, request, route):
+        return await self._handle(request, route, request.match_info['guild_id'], lambda request, payload: (204, None))
+
+    async def _me(self, request):
+        return json_response(BOT_USER)
+
+    async def _application(self, request):
+        return json_response(APPLICATION)
+
+    async def start(self, port=0):
+        app = web.Application()
+        app.router.add_get('/api/v10/users/@me', self._me)
+        app.router.add_get('/api/v10/oauth2/applications/@me', self._application)
+        app.router.add_post('/api/v10/channels/{channel_id}/messages', self._messages)
+        app.router.add_post('/api/v10/webhooks/{webhook_id}/{token}', self._webhook)
+        app.router.add_put('/api/v10/guilds/{guild_id}/bans/{user_id}', lambda request: self._no_content(request, 'ban'))
+        app.router.add_delete('/api/v10/guilds/{guild_id}/members/{user_id}', lambda request: self._no_content(request, 'kick'))
+        app.router.add_put('/api/v10/guilds/{guild_id}/members/{user_id}/roles/{role_id}', lambda request: self._no_content(request, 'role'))
+        app.router.add_delete('/api/v10/guilds/{guild_id}/members/{user_id}/roles/{role_id}', lambda request: self._no_content(request, 'role'))
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', port)
+        await site.start()
+        self.url = f'http://127.0.0.1:{self.runner.addresses[0][1]}'
+        return self.url
+
+    async def close(self):
+        if self.runner:
+            await self.runner.cleanup()
@@ -0,0 +1,288 @@
+"""
+Benchmark: replay gateway events through SecureBot's event handlers offline
+Events are synthetic or loaded from a recording, turned into fake discord.py objects and
+pushed through the handlers with log delivery and the audit archive replaced by an in-process sink
+
+Run from the repository root:
+    python benchmarks/replay.py                              # 50,000 synthetic events
+    python benchmarks/replay.py --events 200000 --guilds 50
+    python benchmarks/replay.py --input capture.jsonl.gz     # recorded {"t", "d"} lines
+    python benchmarks/replay.py --input data/captures        # every GATEWAY_RECORD capture
+    python benchmarks/replay.py --rate 2000                  # paced at 2,000 events/s
+    python benchmarks/replay.py --dispatch                   # include _run_event and instrumentation
+"""
+
+import argparse
+import asyncio
+import collections
+import gzip
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import World, snowflake
+from guild_config import GuildLogConfig
+
+LOG_CHANNEL_ID = 1
+
+WORDS = ("the quick brown fox jumps over lazy dog server raid ban role voice channel message "
+         "hello thanks please lol ok sure maybe tomorrow tonight game stream music").split()
+
+# Relative frequency of each event type in the synthetic stream, roughly a busy community server
+WEIGHTS = {
+    'MESSAGE_CREATE': 60,
+    'MESSAGE_UPDATE': 8,
+    'MESSAGE_DELETE': 6,
+    'MESSAGE_DELETE_BULK': 0.2,
+    'GUILD_MEMBER_UPDATE': 10,
+    'VOICE_STATE_UPDATE': 10,
+    'GUILD_MEMBER_ADD': 2,
+    'GUILD_MEMBER_REMOVE': 2,
+    'CHANNEL_CREATE': 0.4,
+    'CHANNEL_DELETE': 0.4
+}
+
+class LogSink:
+    """Stands in for both the log dispatcher and the audit archive"""
+
+    def __init__(self):
+        self.embeds = collections.Counter()
+        self.records = 0
+        self.payload_bytes = 0
+
+    def enqueue(self, guild_id, channel_id, embed, event):
+        # Delivery serializes every embed, so the sink does too
+        self.payload_bytes += len(json.dumps(embed.to_dict()))
+        self.embeds[event.name] += 1
+
+    def record(self, guild_id, event, user_id=None, data=None):
+        self.records += 1
+
+# =================================
+# EVENT STREAMS
+# =================================
+
+def _user(rng):
+    user_id = snowflake()
+    return {'id': str(user_id), 'username': f'user{user_id % 100000}',
+            'avatar': f'{rng.getrandbits(128):032x}' if rng.random() < 0.7 else None}
+
+def _text(rng, low=3, high=30):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+def synthetic_events(count, guilds=20, members=200, seed=1):
+    """GUILD_CREATE for each server, then count weighted random events as {'t', 'd'} dicts"""
+    rng = random.Random(seed)
+    state = []
+    for g in range(guilds):
+        guild_id = snowflake()
+        roles = [{'id': str(guild_id), 'name': '@everyone'}] + [{'id': str(snowflake()), 'name': f'role-{i}'} for i in range(12)]
+        text = [{'id': str(snowflake()), 'name': f'chat-{i}', 'type': 0} for i in range(8)]
+        voice = [{'id': str(snowflake()), 'name': f'Voice {i}', 'type': 2} for i in range(3)]
+        member_list = [
+            {'user': _user(rng), 'nick': None, 'roles': [role['id'] for role in rng.sample(roles[1:], 2)],
+             'joined_at': '2023-06-01T12:00:00+00:00'}
+            for _ in range(members)
+        ]
+        yield {'t': 'GUILD_CREATE', 'd': {'id': str(guild_id), 'name': f'Server {g}', 'roles': roles,
+                                          'channels': text + voice, 'members': member_list, 'member_count': members}}
+        state.append({'id': str(guild_id), 'roles': roles, 'text': text, 'voice': voice,
+                      'members': member_list, 'messages': collections.deque(maxlen=500), 'in_voice': {}})
+
+    kinds, weights = zip(*WEIGHTS.items())
+    for kind in rng.choices(kinds, weights, k=count):
+        guild = rng.choice(state)
+        guild_id = guild['id']
+        if kind == 'MESSAGE_CREATE' or (kind in ('MESSAGE_UPDATE', 'MESSAGE_DELETE', 'MESSAGE_DELETE_BULK') and not guild['messages']):
+            member = rng.choice(guild['members'])
+            message = {'id': str(snowflake()), 'channel_id': rng.choice(guild['text'])['id'], 'guild_id': guild_id,
+                       'author': member['user'], 'content': _text(rng),
+                       'attachments': [{'filename': 'image.png'}] if rng.random() < 0.05 else []}
+            guild['messages'].append(message)
+            yield {'t': 'MESSAGE_CREATE', 'd': message}
+        elif kind == 'MESSAGE_UPDATE':
+            message = rng.choice(guild['messages'])
+            message = dict(message, content=_text(rng))
+            yield {'t': kind, 'd': message}
+        elif kind == 'MESSAGE_DELETE':
+            message = guild['messages'].pop()
+            yield {'t': kind, 'd': {'id': message['id'], 'channel_id': message['channel_id'], 'guild_id': guild_id}}
+        elif kind == 'MESSAGE_DELETE_BULK':
+            purged = [guild['messages'].pop() for _ in range(min(len(guild['messages']), rng.randint(5, 50)))]
+            yield {'t': kind, 'd': {'ids': [message['id'] for message in purged], 'channel_id': purged[0]['channel_id'], 'guild_id': guild_id}}
+        elif kind == 'GUILD_MEMBER_UPDATE':
+            member = rng.choice(guild['members'])
+            if rng.random() < 0.5:
+                member['nick'] = _text(rng, 1, 2) if rng.random() < 0.8 else None
+            else:
+                member['roles'] = [role['id'] for role in rng.sample(guild['roles'][1:], rng.randint(0, 4))]
+            yield {'t': kind, 'd': dict(member, guild_id=guild_id)}
+        elif kind == 'VOICE_STATE_UPDATE':
+            member = rng.choice(guild['members'])
+            user_id = member['user']['id']
+            channel = None if user_id in guild['in_voice'] and rng.random() < 0.4 else rng.choice(guild['voice'])['id']
+            guild['in_voice'][user_id] = channel
+            yield {'t': kind, 'd': {'guild_id': guild_id, 'channel_id': channel, 'user_id': user_id, 'member': member}}
+        elif kind == 'GUILD_MEMBER_ADD':
+            member = {'user': _user(rng), 'nick': None, 'roles': [], 'joined_at': '2024-01-01T00:00:00+00:00'}
+            guild['members'].append(member)
+            yield {'t': kind, 'd': dict(member, guild_id=guild_id)}
+        elif kind == 'GUILD_MEMBER_REMOVE':
+            member = guild['members'].pop(rng.randrange(len(guild['members'])))
+            yield {'t': kind, 'd': {'guild_id': guild_id, 'user': member['user']}}
+        elif kind == 'CHANNEL_CREATE':
+            channel = {'id': str(snowflake()), 'name': f'new-{rng.randint(0, 999)}', 'type': 0, 'guild_id': guild_id}
+            guild['text'].append(channel)
+            yield {'t': kind, 'd': channel}
+        elif len(guild['text']) > 1:  # CHANNEL_DELETE
+            channel = guild['text'].pop()
+            yield {'t': kind, 'd': dict(channel, guild_id=guild_id)}
+
+def load_events(path):
+    """Recorded gateway events, one {'t', 'd'} JSON object per line, optionally gzipped
+
+    A directory (like the bot's GATEWAY_RECORD captures) is read file by file in name order.
+    """
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(('.jsonl', '.jsonl.gz')):
+                yield from load_events(os.path.join(path, name))
+        return
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        except (EOFError, json.JSONDecodeError):
+            pass  # Capture cut short by a crash, keep what was written
+
+# =================================
+# REPLAY
+# =================================
+
+def prepare(events):
+    """Convert the whole stream up front, so conversion is not part of the measurement"""
+    world = World()
+    calls = []
+    skipped = 0
+    for event in events:
+        call = world.apply(event)
+        if call is None:
+            skipped += 1
+        else:
+            calls.append(call)
+    return world, calls, skipped
+
+def make_bot(world):
+    """A SecureBot that logs every event of every server into a LogSink"""
+    from secure_main import SecureBot
+    bot = SecureBot()
+    sink = LogSink()
+    bot.log_dispatcher = sink
+    bot.audit_archive = sink
+    bot.get_user = world.get_user
+    for guild in world.guilds.values():
+        config = GuildLogConfig(LOG_CHANNEL_ID)
+        bot.log_channels[guild.id] = config
+        bot.log_masks[guild.id] = config.events
+        bot.member_stats.seed(guild)
+    return bot, sink
+
+async def replay(bot, calls, rate=0.0, dispatch=False):
+    """Run every call through the bot, returns per-handler [count, seconds] and the max lateness"""
+    per_handler = collections.defaultdict(lambda: [0, 0.0])
+    latest = 0.0
+    started = time.perf_counter()
+    for i, (name, args) in enumerate(calls):
+        if rate:
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                latest = max(latest, -delay)
+        handler = getattr(bot, name)
+        call_started = time.perf_counter()
+        if dispatch:
+            await bot._run_event(handler, name, *args)
+        else:
+            await handler(*args)
+        entry = per_handler[name]
+        entry[0] += 1
+        entry[1] += time.perf_counter() - call_started
+    return per_handler, latest
+
+async def run_pass(world, calls, rate, dispatch, trace_memory):
+    bot, sink = make_bot(world)
+    if trace_memory:
+        tracemalloc.start()
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    per_handler, latest = await replay(bot, calls, rate, dispatch)
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {'per_handler': per_handler, 'latest': latest, 'wall': wall, 'cpu': cpu, 'peak': peak, 'sink': sink, 'bot': bot}
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--input', help="recorded events (.jsonl or .jsonl.gz, or a directory of them) instead of a synthetic stream")
+    parser.add_argument('--events', type=int, default=50000, help="synthetic events to generate")
+    parser.add_argument('--guilds', type=int, default=20, help="synthetic servers")
+    parser.add_argument('--members', type=int, default=200, help="members per synthetic server")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--rate', type=float, default=0.0, help="events per second to pace at, 0 for as fast as possible")
+    parser.add_argument('--dispatch', action='store_true', help="call handlers through SecureBot._run_event")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    options = parser.parse_args()
+
+    events = load_events(options.input) if options.input else synthetic_events(options.events, options.guilds, options.members, options.seed)
+    world, calls, skipped = prepare(events)
+    print(f"{len(calls):,} events to replay in {len(world.guilds)} servers ({skipped:,} setup or unsupported payloads skipped)")
+    if not calls:
+        return 1
+
+    result = asyncio.run(run_pass(world, calls, options.rate, options.dispatch, trace_memory=False))
+    handled = len(calls)
+    handler_seconds = sum(seconds for _, seconds in result['per_handler'].values())
+    print(f"throughput: {handled / result['wall']:,.0f} events/s wall, {handled / handler_seconds:,.0f} events/s in handlers")
+    print(f"cpu: {result['cpu'] / handled * 1e6:.1f} µs/event")
+    if options.rate:
+        print(f"paced at {options.rate:,.0f}/s, fell behind by up to {result['latest'] * 1000:.1f} ms")
+
+    print(f"\n{'handler':<28} {'events':>9} {'µs/event':>9} {'share':>6}")
+    for name, (count, seconds) in sorted(result['per_handler'].items(), key=lambda item: -item[1][1]):
+        print(f"{name:<28} {count:>9,} {seconds / count * 1e6:>9.1f} {seconds / handler_seconds:>6.1%}")
+
+    sink = result['sink']
+    print(f"\nlog embeds: {sum(sink.embeds.values()):,} ({sink.payload_bytes / 1024 / 1024:.1f} MB serialized), archive records: {sink.records:,}")
+    cache = result['bot'].message_cache.stats()
+    print(f"message cache: {cache['messages']:,} messages, {cache['bytes'] / 1024 / 1024:.1f} MB, hit rate {cache['hit_rate']:.0%}")
+
+    if not options.no_memory:
+        # A separate pass, tracemalloc slows everything down too much to time the first one
+        traced = asyncio.run(run_pass(world, calls, 0.0, options.dispatch, trace_memory=True))
+        print(f"peak traced memory during replay: {traced['peak'] / 1024 / 1024:.1f} MB")
+    rss = peak_rss_mb()
+    if rss is not None:
+        print(f"peak RSS: {rss:.0f} MB")
+    return 0
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,163 @@
+"""
+Benchmark: log delivery and moderation fan-out against a local mock of Discord's REST API
+SecureBot logs in to benchmarks/mock_discord.py and its real dispatcher, scheduler, spool
+and webhook paths deliver the events, so 429s, Retry-After and 5xx bursts are handled by
+the same code as in production. Reports delivered events per second and delivery delay.
+
+Run from the repository root:
+    python benchmarks/rest_load.py                       # every scenario
+    python benchmarks/rest_load.py --scenario throttled
+    python benchmarks/rest_load.py --events 5000 --guilds 20 --rate 500
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Spool, archive and config files of the benchmark bot stay out of the real data directory
+os.environ['BOT_DATA_DIR'] = tempfile.mkdtemp(prefix='rest-load-')
+
+import discord
+
+from fakes import snowflake
+from guild_config import GuildLogConfig
+from log_events import LogEvent
+from mock_discord import MockDiscord, point_discord_py_at
+
+# name -> (description, MockDiscord settings, webhook mode)
+SCENARIOS = {
+    'steady': ("channel sends within Discord's limits", {}, False),
+    'throttled': ("message buckets of 2 per 5s, far below the bot's own budget", {'limits': {'messages': (2, 5.0)}}, False),
+    'outage': ("5xx bursts, failed batches go through the spool", {'error_rate': 0.3, 'error_burst': (3.0, 0.7)}, False),
+    'webhook': ("webhook delivery", {}, True),
+    'global_limit': ("global limit of 10 requests/s", {'global_limit': 10}, False)
+}
+
+def percentile(values, point):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * point / 100))] if values else 0.0
+
+async def start_bot(mock):
+    """A SecureBot logged in to the mock, with storage and log delivery running"""
+    from secure_main import SecureBot
+    point_discord_py_at(mock.url)
+    bot = SecureBot()
+
+    async def skip_sync():
+        pass  # The mock has no application command routes
+    bot.sync_commands = skip_sync
+    # No gateway connection, so no channel cache: send to log channels by ID
+    bot.get_channel = bot.get_partial_messageable
+    await bot.login('x' * 72)  # Runs setup_hook
+    return bot
+
+def configure_logging(bot, guilds, webhook):
+    guild_ids = []
+    for _ in range(guilds):
+        guild_id = snowflake()
+        webhook_url = f"https://discord.com/api/webhooks/{snowflake()}/{'t' * 68}" if webhook else None
+        bot.log_channels[guild_id] = GuildLogConfig(snowflake(), webhook_url=webhook_url)
+        bot.log_masks[guild_id] = bot.log_channels[guild_id].events
+        guild_ids.append(guild_id)
+    return guild_ids
+
+def delivered_at(mock):
+    """Receive time per event sequence number, read back from the embed footers"""
+    times = {}
+    for received, route, _, payload in mock.received:
+        if route not in ('messages', 'webhook') or not payload:
+            continue
+        for embed in payload.get('embeds') or ():
+            footer = (embed.get('footer') or {}).get('text', '')
+            if footer.startswith('seq '):
+                times.setdefault(int(footer[4:]), received)
+    return times
+
+async def log_scenario(name, events, guilds, rate, timeout):
+    description, settings, webhook = SCENARIOS[name]
+    mock = MockDiscord(**settings)
+    await mock.start()
+    bot = await start_bot(mock)
+    guild_ids = configure_logging(bot, guilds, webhook)
+
+    sent_at = []
+    started = time.perf_counter()
+    for seq in range(events):
+        if rate:
+            delay = started + seq / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        embed = discord.Embed(title="Message Sent", description=f"benchmark message {seq}", color=discord.Color.blue())
+        embed.set_footer(text=f"seq {seq}")
+        sent_at.append(time.perf_counter())
+        await bot.log_event(guild_ids[seq % guilds], embed, LogEvent.MESSAGE_SEND)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        times = delivered_at(mock)
+        if len(times) >= events:
+            break
+        await asyncio.sleep(0.5)
+    times = delivered_at(mock)
+    dispatcher, spool = bot.log_dispatcher.stats(), bot.log_spool.stats()
+    await bot.close()
+    await mock.close()
+
+    delays = [received - sent_at[seq] for seq, received in times.items()]
+    wall = (max(times.values()) - started) if times else 0.0
+    print(f"\n{name}: {description}")
+    print(f"  delivered {len(times):,}/{events:,} events in {wall:.1f}s "
+          f"({len(times) / wall if wall else 0:,.0f} events/s in {len(mock.received):,} messages)")
+    print(f"  delay p50 {percentile(delays, 50) * 1000:,.0f} ms, p99 {percentile(delays, 99) * 1000:,.0f} ms, "
+          f"max {max(delays, default=0) * 1000:,.0f} ms")
+    print(f"  responses: {format_statuses(mock)}")
+    print(f"  failed batches: {dispatcher['failed']:,} events, spooled {spool['spooled']:,}, replayed {spool['replayed']:,}, "
+          f"dropped {dispatcher['dropped']:,}")
+
+async def fanout_scenario(guilds, timeout):
+    """A cross-server ban through the fan-out executor, like /globalban"""
+    mock = MockDiscord(global_limit=50)
+    await mock.start()
+    bot = await start_bot(mock)
+    guild_ids = [snowflake() for _ in range(guilds)]
+    user_id = snowflake()
+
+    job = bot.fanout.create("Benchmark ban", 'ban', guild_ids,
+                            lambda guild_id: bot.http.ban(user_id, guild_id, reason="rest_load benchmark"))
+    await asyncio.wait_for(bot.fanout.run(job), timeout)
+    await bot.close()
+    await mock.close()
+
+    print(f"\nfanout_ban: one ban in each of {guilds:,} servers")
+    print(f"  {len(job.succeeded):,} succeeded, {len(job.failed):,} failed in {job.elapsed:.1f}s "
+          f"({len(job.succeeded) / job.elapsed if job.elapsed else 0:,.1f} bans/s)")
+    print(f"  responses: {format_statuses(mock)}")
+
+def format_statuses(mock):
+    return ", ".join(f"{status}: {count:,}" for status, count in sorted(mock.statuses.items())) or "none"
+
+async def run(options):
+    names = [options.scenario] if options.scenario else list(SCENARIOS) + ['fanout_ban']
+    for name in names:
+        if name == 'fanout_ban':
+            await fanout_scenario(options.fanout_guilds, options.timeout)
+        else:
+            await log_scenario(name, options.events, options.guilds, options.rate, options.timeout)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--scenario', choices=list(SCENARIOS) + ['fanout_ban'], help="run one scenario instead of all")
+    parser.add_argument('--events', type=int, default=2000, help="log events per scenario")
+    parser.add_argument('--guilds', type=int, default=10, help="servers (and log channels) the events are spread over")
+    parser.add_argument('--rate', type=float, default=200.0, help="log events per second, 0 for all at once")
+    parser.add_argument('--fanout-guilds', type=int, default=200, help="servers in the fan-out ban scenario")
+    parser.add_argument('--timeout', type=float, default=180.0, help="seconds to wait for delivery per scenario")
+    options = parser.parse_args()
+    asyncio.run(run(options))
+
+if __name__ == '__main__':
+    main()
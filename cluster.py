@@ -0,0 +1,344 @@
+"""
+Multi-process cluster mode
+Run `python cluster.py` to spread the bot's shards over several worker processes on this host.
+The launcher also acts as a local IPC hub so owner commands can query every worker.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import secrets
+import signal
+import sys
+
+# Newline-delimited JSON messages, one per line; large /servers replies fit comfortably
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+# Seconds a worker gets to flush logs and disconnect after SIGTERM before it is killed
+WORKER_STOP_TIMEOUT = 30
+
+def parse_shard_ids(text):
+    """Parse "0,1,2" or "0-3" (or a mix like "0-3,8") into a list of shard IDs"""
+    shard_ids = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            shard_ids.extend(range(int(first), int(last) + 1))
+        else:
+            shard_ids.append(int(part))
+    return shard_ids
+
+def split_shards(shard_count, cluster_count):
+    """Contiguous shard ranges, one per worker process"""
+    cluster_count = max(1, min(cluster_count, shard_count))
+    per_cluster, extra = divmod(shard_count, cluster_count)
+    ranges = []
+    start = 0
+    for cluster_id in range(cluster_count):
+        size = per_cluster + (1 if cluster_id < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+async def _send(writer, message):
+    writer.write(json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n')
+    await writer.drain()
+
+# =================================
+# WORKER SIDE
+# =================================
+
+class ClusterClient:
+    """A worker's connection to the launcher's IPC hub
+
+    handlers maps an action name to a coroutine function; every worker runs it when any
+    worker broadcasts that action, and the caller gets all workers' results back.
+    """
+
+    def __init__(self, cluster_id, port, secret, handlers):
+        self.cluster_id = cluster_id
+        self.port = port
+        self.secret = secret
+        self.handlers = handlers
+        self.writer = None
+        self.connected = None
+        self.pending = {}  # request id -> Future for broadcast results
+        self.next_id = 0
+        self.task = None
+
+    def start(self):
+        self.connected = asyncio.Event()
+        self.task = asyncio.create_task(self._connection_loop())
+
+    async def _connection_loop(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', self.port, limit=MAX_MESSAGE_BYTES)
+                await _send(writer, {'op': 'hello', 'cluster': self.cluster_id, 'secret': self.secret})
+                self.writer = writer
+                self.connected.set()
+                logging.info(f"Cluster {self.cluster_id} connected to IPC hub on port {self.port}")
+                await self._read_loop(reader)
+            except (OSError, ConnectionError) as e:
+                logging.warning(f"Cluster IPC connection failed: {e}")
+            except (ValueError, KeyError) as e:
+                # Malformed or oversized message: the stream can't be trusted any more, start over
+                logging.error(f"Bad message on cluster IPC connection, reconnecting: {e}")
+            finally:
+                self.connected.clear()
+                if self.writer:
+                    self.writer.close()
+                self.writer = None
+                for future in self.pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("Cluster IPC connection lost"))
+                self.pending.clear()
+            await asyncio.sleep(5)
+
+    async def _read_loop(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            message = json.loads(line)
+            if message['op'] == 'call':
+                asyncio.create_task(self._handle_call(message))
+            elif message['op'] == 'result':
+                future = self.pending.pop(message['id'], None)
+                if future and not future.done():
+                    future.set_result(message['results'])
+
+    async def _handle_call(self, message):
+        reply = {'op': 'reply', 'id': message['id'], 'cluster': self.cluster_id}
+        handler = self.handlers.get(message['action'])
+        if handler is None:
+            reply['error'] = f"Unknown action {message['action']}"
+        else:
+            try:
+                reply['result'] = await handler(**message.get('args', {}))
+            except Exception as e:
+                logging.error(f"Cluster action {message['action']} failed: {e}")
+                reply['error'] = str(e)
+        if self.writer:
+            await _send(self.writer, reply)
+
+    async def broadcast(self, action, timeout=10.0, **args):
+        """Run an action on every worker, returns a list of {'cluster', 'result' or 'error'}"""
+        await asyncio.wait_for(self.connected.wait(), timeout)
+        self.next_id += 1
+        request_id = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        await _send(self.writer, {
+            'op': 'broadcast', 'id': request_id, 'action': action, 'args': args, 'timeout': timeout
+        })
+        try:
+            return await asyncio.wait_for(future, timeout + 1)
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        if self.writer:
+            self.writer.close()
+
+# =================================
+# LAUNCHER SIDE
+# =================================
+
+class ClusterHub:
+    """Local TCP hub that relays broadcasts between worker processes"""
+
+    def __init__(self, secret):
+        self.secret = secret
+        self.workers = {}  # cluster_id -> StreamWriter
+        self.waiting = {}  # hub call id -> (Future, set of clusters still to reply, results)
+        self.next_id = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, '127.0.0.1', 0, limit=MAX_MESSAGE_BYTES)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _serve(self, reader, writer):
+        cluster_id = None
+        try:
+            hello = json.loads(await reader.readline() or b'{}')
+            if hello.get('op') != 'hello' or not secrets.compare_digest(str(hello.get('secret', '')), self.secret):
+                logging.warning("Rejected cluster IPC connection with a bad handshake")
+                return
+            cluster_id = hello['cluster']
+            self.workers[cluster_id] = writer
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                message = json.loads(line)
+                if message['op'] == 'broadcast':
+                    asyncio.create_task(self._broadcast(writer, message))
+                elif message['op'] == 'reply':
+                    self._collect(message)
+        except (OSError, ConnectionError, ValueError, KeyError) as e:
+            # A malformed message ends this worker's connection, it reconnects on its own
+            logging.warning(f"Cluster IPC connection error: {e!r}")
+        finally:
+            if cluster_id is not None and self.workers.get(cluster_id) is writer:
+                del self.workers[cluster_id]
+            writer.close()
+
+    def _collect(self, message):
+        entry = self.waiting.get(message['id'])
+        if entry is None:
+            return
+        future, remaining, results = entry
+        results.append({key: message[key] for key in ('cluster', 'result', 'error') if key in message})
+        remaining.discard(message['cluster'])
+        if not remaining and not future.done():
+            future.set_result(results)
+
+    async def _broadcast(self, origin, message):
+        self.next_id += 1
+        call_id = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        workers = dict(self.workers)
+        results = []
+        self.waiting[call_id] = (future, set(workers), results)
+        if not workers:
+            future.set_result(results)
+
+        call = {'op': 'call', 'id': call_id, 'action': message['action'], 'args': message.get('args', {})}
+        for writer in workers.values():
+            try:
+                await _send(writer, call)
+            except (OSError, ConnectionError):
+                pass
+
+        try:
+            await asyncio.wait_for(future, message.get('timeout', 10.0))
+        except asyncio.TimeoutError:
+            # Report the workers that did not answer in time instead of failing the whole query
+            _, remaining, _ = self.waiting[call_id]
+            results.extend({'cluster': cluster_id, 'error': "Timed out"} for cluster_id in sorted(remaining))
+        finally:
+            self.waiting.pop(call_id, None)
+
+        try:
+            await _send(origin, {'op': 'result', 'id': message['id'], 'results': sorted(results, key=lambda r: r['cluster'])})
+        except (OSError, ConnectionError):
+            pass
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            for writer in list(self.workers.values()):
+                writer.close()
+            await self.server.wait_closed()
+
+async def recommended_shard_count(token):
+    """Shard count Discord recommends for this bot"""
+    import aiohttp
+    async with aiohttp.ClientSession() as session:
+        async with session.get('https://discord.com/api/v10/gateway/bot',
+                               headers={'Authorization': f'Bot {token}'}) as response:
+            response.raise_for_status()
+            return (await response.json())['shards']
+
+async def run_worker(cluster_id, shard_ids, shard_count, port, secret, stopping):
+    """Run one worker process, restarting it if it exits unexpectedly
+
+    Exit code 0 is a deliberate stop (the owner's /shutdown) and is not restarted.
+    """
+    env = dict(os.environ)
+    env.update({
+        'CLUSTER_ID': str(cluster_id),
+        'SHARD_COUNT': str(shard_count),
+        'SHARD_IDS': ','.join(str(shard_id) for shard_id in shard_ids),
+        'CLUSTER_IPC_PORT': str(port),
+        'CLUSTER_IPC_SECRET': secret
+    })
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'secure_main.py')
+
+    while not stopping.is_set():
+        logging.info(f"Starting cluster {cluster_id} with shards {shard_ids[0]}-{shard_ids[-1]}")
+        process = await asyncio.create_subprocess_exec(sys.executable, script, env=env)
+        try:
+            code = await process.wait()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.terminate()
+                try:
+                    await asyncio.wait_for(process.wait(), WORKER_STOP_TIMEOUT)
+                except asyncio.TimeoutError:
+                    logging.warning(f"Cluster {cluster_id} did not stop within {WORKER_STOP_TIMEOUT}s, killing it")
+                    process.kill()
+                    await process.wait()
+            raise
+        if stopping.is_set():
+            return
+        if code == 0:
+            logging.info(f"Cluster {cluster_id} shut down")
+            return
+        logging.error(f"Cluster {cluster_id} exited with code {code}, restarting in 10 seconds")
+        await asyncio.sleep(10)
+
+async def run_cluster():
+    from security_config import security, env_int, data_path
+    from guild_config import GuildConfigStore
+
+    shard_count = env_int('SHARD_COUNT', 0, minimum=0) or await recommended_shard_count(security.token)
+    cluster_count = env_int('CLUSTER_COUNT', os.cpu_count() or 1, minimum=1)
+    ranges = split_shards(shard_count, cluster_count)
+
+    # Apply schema migrations once here instead of racing in every worker
+    store = GuildConfigStore(data_path('guild_config.db'))
+    store.open()
+    store.close()
+
+    secret = secrets.token_hex(16)
+    hub = ClusterHub(secret)
+    port = await hub.start()
+    logging.info(f"Launching {len(ranges)} clusters for {shard_count} shards, IPC hub on port {port}")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:
+            pass  # Windows, Ctrl+C raises KeyboardInterrupt instead
+
+    workers = [
+        asyncio.create_task(run_worker(cluster_id, shard_ids, shard_count, port, secret, stopping))
+        for cluster_id, shard_ids in enumerate(ranges)
+    ]
+
+    async def all_stopped():
+        await asyncio.gather(*workers, return_exceptions=True)
+        stopping.set()  # Every worker was shut down deliberately, nothing left to run
+
+    watcher = asyncio.create_task(all_stopped())
+    try:
+        await stopping.wait()
+    finally:
+        watcher.cancel()
+        logging.info("Stopping clusters...")
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await hub.close()
+
+def main():
+    try:
+        asyncio.run(run_cluster())
+    except KeyboardInterrupt:
+        logging.info("Cluster shutdown by user")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,62 @@
+"""
+Slash command sync that skips uploads when nothing changed
+The serialized command tree is hashed and compared with the hash stored after the last successful sync
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+def tree_hash(tree, guild=None):
+    """Stable hash of the commands that would be uploaded for a scope"""
+    payload = [command.to_dict(tree) for command in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda command: (command.get('type', 1), command['name']))
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+class CommandSync:
+    """Syncs a command tree only when its hash differs from the stored one"""
+
+    def __init__(self, tree, state_path):
+        self.tree = tree
+        self.state_path = state_path
+
+    def _load(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read {self.state_path}, commands will be synced: {e}")
+            return {}
+
+    def _save(self, state):
+        with open(self.state_path + '.tmp', 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    async def sync(self, guild=None, force=False):
+        """Sync one scope if needed, returns (synced, command count, seconds spent or saved)"""
+        application_id = self.tree.client.application_id
+        scope = f"{application_id}:{guild.id if guild else 'global'}"
+        digest = tree_hash(self.tree, guild)
+        state = self._load()
+        previous = state.get(scope, {})
+
+        if not force and previous.get('hash') == digest:
+            # Report the last real sync's duration as the time saved by skipping it
+            return False, len(self.tree.get_commands(guild=guild)), previous.get('seconds', 0.0)
+
+        started = time.perf_counter()
+        synced = await self.tree.sync(guild=guild)
+        elapsed = time.perf_counter() - started
+
+        state[scope] = {'hash': digest, 'seconds': round(elapsed, 3), 'count': len(synced)}
+        try:
+            self._save(state)
+        except OSError as e:
+            logging.warning(f"Could not save command sync state: {e}")
+        return True, len(synced), elapsed
@@ -0,0 +1,127 @@
+"""
+Fan-out of one owner action across many servers
+Runs the action per server with bounded concurrency and per-server rate budgets,
+reports progress while running and keeps failed servers so the job can be resumed
+"""
+
+import asyncio
+import collections
+import logging
+import secrets
+import time
+
+import discord
+
+from log_dispatcher import SendScheduler
+
+class FanoutJob:
+    """One cross-server action and its outcome per server"""
+
+    def __init__(self, job_id, title, route, guild_ids, action, labels=None):
+        self.id = job_id
+        self.title = title
+        self.route = route  # Rate limit route name, budgets are kept per (route, server)
+        self.guild_ids = list(guild_ids)
+        self.action = action  # Coroutine function called with a guild ID
+        self.labels = labels or {}  # guild_id -> display name for reports
+        self.succeeded = set()
+        self.failed = {}  # guild_id -> reason
+        self.running = False
+        self.started = None
+        self.finished = None
+
+    def remaining(self):
+        """Servers that have not succeeded yet"""
+        return [guild_id for guild_id in self.guild_ids if guild_id not in self.succeeded]
+
+    @property
+    def done(self):
+        return len(self.succeeded) + len(self.failed)
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+def describe_error(error):
+    """Short, user-facing reason for a failed server"""
+    if isinstance(error, discord.Forbidden):
+        return "Missing permissions"
+    if isinstance(error, discord.NotFound):
+        return "Not found"
+    if isinstance(error, discord.HTTPException):
+        return f"HTTP {error.status}: {error.text or 'error'}"[:100]
+    return str(error)[:100] or type(error).__name__
+
+class FanoutExecutor:
+    """Runs FanoutJobs and remembers recent ones for resuming"""
+
+    def __init__(self, concurrency=5, route_rate=1.0, route_burst=5, progress_interval=2.0, max_jobs=20):
+        self.concurrency = concurrency
+        self.progress_interval = progress_interval
+        self.max_jobs = max_jobs
+        # One request in flight per server, plus a token bucket per (route, server)
+        self.scheduler = SendScheduler(route_rate=route_rate, route_burst=route_burst, guild_inflight=1)
+        self.jobs = collections.OrderedDict()
+
+    def create(self, title, route, guild_ids, action, labels=None):
+        """Register a new job, forgetting the oldest finished jobs over the limit"""
+        job = FanoutJob(secrets.token_hex(4), title, route, guild_ids, action, labels)
+        self.jobs[job.id] = job
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            if not self.jobs[job_id].running:
+                del self.jobs[job_id]
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def _run_one(self, job, guild_id, limit):
+        async with limit:
+            try:
+                await self.scheduler.run((job.route, guild_id), guild_id, lambda: job.action(guild_id))
+            except discord.HTTPException as e:
+                job.failed[guild_id] = describe_error(e)
+            except Exception as e:
+                logging.error(f"Fan-out job {job.id} failed for server {guild_id}: {e}")
+                job.failed[guild_id] = describe_error(e)
+            else:
+                job.succeeded.add(guild_id)
+
+    async def _report(self, job, progress):
+        try:
+            await progress(job)
+        except discord.HTTPException as e:
+            logging.warning(f"Could not update progress for fan-out job {job.id}: {e}")
+
+    async def run(self, job, progress=None):
+        """Run the job for every server that has not succeeded yet
+
+        progress(job) is awaited every progress_interval seconds and once at the end.
+        """
+        if job.running:
+            raise RuntimeError(f"Fan-out job {job.id} is already running")
+
+        job.running = True
+        job.failed.clear()
+        job.started = time.monotonic()
+        job.finished = None
+        limit = asyncio.Semaphore(self.concurrency)
+        tasks = {asyncio.create_task(self._run_one(job, guild_id, limit)) for guild_id in job.remaining()}
+        try:
+            while tasks:
+                _, tasks = await asyncio.wait(tasks, timeout=self.progress_interval)
+                if tasks and progress:
+                    await self._report(job, progress)
+        finally:
+            for task in tasks:
+                task.cancel()
+            job.running = False
+            job.finished = time.monotonic()
+
+        if progress:
+            await self._report(job, progress)
+        return job
@@ -0,0 +1,223 @@
+"""
+Opt-in recorder of raw gateway traffic, for reproducing production load offline
+Dispatch payloads are filtered, redacted and written to rolling gzip capture files by a
+background thread, one JSON object per line as read by benchmarks/replay.py --input
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+ACTIVE_SUFFIX = '.jsonl.gz.part'
+CAPTURE_SUFFIX = '.jsonl.gz'
+BATCH_SIZE = 500
+
+def _blank(value):
+    if isinstance(value, str):
+        return 'x' * len(value)  # Same length, so caches and embeds cost the same on replay
+    if isinstance(value, (dict, list)):
+        return type(value)()
+    return value
+
+def redact(value, fields):
+    """Blank out the named fields at any depth of a parsed payload, in place"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in fields:
+                value[key] = _blank(item)
+            elif isinstance(item, (dict, list)):
+                redact(item, fields)
+    elif isinstance(value, list):
+        for item in value:
+            if isinstance(item, (dict, list)):
+                redact(item, fields)
+
+def payload_guild_id(event, data):
+    """Server a dispatch belongs to, or None for DMs and connection events"""
+    if not isinstance(data, dict):
+        return None
+    if event in ('GUILD_CREATE', 'GUILD_UPDATE', 'GUILD_DELETE'):
+        return int(data['id'])
+    guild_id = data.get('guild_id')
+    return int(guild_id) if guild_id else None
+
+class GatewayRecorder:
+    """Rolling capture files of gateway dispatches
+
+    put() runs on the event loop for every gateway message and only queues the raw text;
+    parsing, filtering, redaction and compression happen on the writer thread. If the
+    writer falls behind and the queue is full, messages are dropped and counted instead
+    of slowing the bot down. Files are written as .part and renamed when complete, and
+    the oldest captures are deleted once the directory exceeds max_bytes.
+    """
+
+    def __init__(self, directory, guilds=None, events=None, redact_fields=('content',),
+                 segment_bytes=64 * 1024 * 1024, max_bytes=1024 * 1024 * 1024, queue_size=10000,
+                 compresslevel=3):
+        self.directory = directory
+        self.guilds = set(guilds) if guilds else None
+        self.events = set(events) if events else None
+        self.redact_fields = frozenset(redact_fields)
+        # Raw messages without one of these keys are written without parsing the redaction path
+        self.redact_markers = tuple(f'"{field}"' for field in self.redact_fields)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.compresslevel = compresslevel
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopping = threading.Event()
+        self.thread = None
+        self.file = None
+        self.path = None
+        self.file_bytes = 0
+        self.sequence = 0
+        self.recorded = 0
+        self.filtered = 0
+        self.dropped = 0  # Queue full, counted on the event loop
+        self.errors = 0  # Messages that could not be encoded or written, counted on the writer thread
+        self.bytes_written = 0
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._finish_leftovers()
+        self.thread = threading.Thread(target=self._run, name='gateway-recorder', daemon=True)
+        self.thread.start()
+        logging.info(f"Recording gateway traffic to {self.directory}")
+
+    def put(self, message):
+        """Queue one raw gateway message, called from the event loop"""
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    # =================================
+    # WRITER THREAD
+    # =================================
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                if self.stopping.is_set():
+                    break
+                continue
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.errors += len(batch)
+                logging.error(f"Could not write gateway capture: {e}")
+        self._finish()
+
+    def _encode(self, message, now):
+        """One capture line for a raw message, or None if it is not recorded"""
+        if isinstance(message, bytes):
+            message = message.decode('utf-8')
+        payload = json.loads(message)
+        event = payload.get('t')
+        if payload.get('op') != 0 or not event:
+            return None  # Heartbeats, hello, reconnects
+        if self.events is not None and event not in self.events:
+            return None
+        data = payload.get('d')
+        if self.guilds is not None and payload_guild_id(event, data) not in self.guilds:
+            return None
+        if self.redact_markers and any(marker in message for marker in self.redact_markers):
+            redact(data, self.redact_fields)
+            return json.dumps({'ts': now, 't': event, 's': payload.get('s'), 'd': data}, separators=(',', ':'))
+        # Nothing to redact: keep Discord's own encoding instead of serializing it again
+        return f'{{"ts":{now},' + message.lstrip()[1:]
+
+    def _write(self, batch):
+        now = round(time.time(), 3)
+        lines = []
+        for message in batch:
+            try:
+                line = self._encode(message, now)
+            except Exception as e:
+                # A message the recorder can't handle must not stop the writer thread
+                self.errors += 1
+                logging.warning(f"Could not record gateway message: {e!r}")
+                continue
+            if line is None:
+                self.filtered += 1
+            else:
+                lines.append(line)
+        if not lines:
+            return
+        if self.file is None:
+            self._open()
+        data = ('\n'.join(lines) + '\n').encode('utf-8')
+        self.file.write(data)
+        self.file_bytes += len(data)
+        self.bytes_written += len(data)
+        self.recorded += len(lines)
+        if self.file_bytes >= self.segment_bytes:
+            self._finish()
+
+    def _open(self):
+        self.sequence += 1
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+        self.path = os.path.join(self.directory, f"capture-{stamp}-{self.sequence:04d}{ACTIVE_SUFFIX}")
+        self.file = gzip.open(self.path, 'wb', compresslevel=self.compresslevel)
+        self.file_bytes = 0
+
+    def _finish(self):
+        """Close the active capture so it becomes readable, then apply the size limit"""
+        if self.file is None:
+            return
+        self.file.close()
+        os.replace(self.path, self.path[:-len('.part')])
+        self.file = None
+        self.path = None
+        self._prune()
+
+    def _finish_leftovers(self):
+        # Captures interrupted by a crash are readable up to the last complete block
+        for name in os.listdir(self.directory):
+            if name.endswith(ACTIVE_SUFFIX):
+                path = os.path.join(self.directory, name)
+                os.replace(path, path[:-len('.part')])
+
+    def captures(self):
+        """Completed capture files, oldest first"""
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(CAPTURE_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def _prune(self):
+        paths = self.captures()
+        sizes = [os.path.getsize(path) for path in paths]
+        total = sum(sizes)
+        for path, size in zip(paths, sizes):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def stats(self):
+        """Recording counters for status commands"""
+        return {
+            'recorded': self.recorded,
+            'filtered': self.filtered,
+            'dropped': self.dropped,
+            'queued': self.queue.qsize(),
+            'errors': self.errors,
+            'bytes_written': self.bytes_written
+        }
+
+    async def close(self):
+        """Write what is queued and close the active capture file"""
+        self.stopping.set()
+        if self.thread:
+            await asyncio.get_running_loop().run_in_executor(None, self.thread.join)
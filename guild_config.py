@@ -0,0 +1,146 @@
+"""
+SQLite-backed per-server configuration
+Writes run on a dedicated thread; reads are served from an in-memory snapshot
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from log_events import ALL_EVENTS
+
+SCHEMA_VERSION = 2
+
+class GuildLogConfig:
+    """Logging settings for one server"""
+    __slots__ = ('channel_id', 'webhook_url', 'events', 'retention_days')
+
+    def __init__(self, channel_id, webhook_url=None, events=int(ALL_EVENTS), retention_days=None):
+        self.channel_id = channel_id
+        self.webhook_url = webhook_url
+        self.events = events
+        # Message search retention, None means the bot-wide default
+        self.retention_days = retention_days
+
+    def replace(self, **changes):
+        """Copy of this config with some settings changed"""
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return GuildLogConfig(**values)
+
+class GuildConfigStore:
+    """WAL-mode SQLite store for log configs keyed by integer server ID"""
+
+    def __init__(self, path, legacy_json_path='log_config.json'):
+        self.path = path
+        self.legacy_json_path = legacy_json_path
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='guild-config')
+        self.db = None
+        self.snapshot = {}  # guild_id -> GuildLogConfig
+
+    def open(self):
+        """Open the database, apply the schema, migrate old JSON config and load the snapshot"""
+        # All later access goes through the single executor thread
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self._apply_schema()
+        self._migrate_json()
+
+        rows = self.db.execute('SELECT guild_id, channel_id, webhook_url, events, retention_days FROM log_config')
+        self.snapshot = {row[0]: GuildLogConfig(*row[1:]) for row in rows}
+        logging.info(f"Loaded log config for {len(self.snapshot)} servers")
+
+    def _apply_schema(self):
+        version = self.db.execute('PRAGMA user_version').fetchone()[0]
+        if version < 1:
+            with self.db:
+                self.db.execute('''
+                    CREATE TABLE IF NOT EXISTS log_config (
+                        guild_id INTEGER PRIMARY KEY,
+                        channel_id INTEGER NOT NULL,
+                        webhook_url TEXT,
+                        events INTEGER NOT NULL
+                    )
+                ''')
+                self.db.execute('PRAGMA user_version = 1')
+        if version < 2:
+            with self.db:
+                self.db.execute('ALTER TABLE log_config ADD COLUMN retention_days INTEGER')
+                self.db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _migrate_json(self):
+        """One-time import of the old log_config.json file"""
+        if not self.legacy_json_path or not os.path.exists(self.legacy_json_path):
+            return
+
+        try:
+            with open(self.legacy_json_path, 'r') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not read {self.legacy_json_path} for migration: {e}")
+            return
+
+        rows = []
+        for guild_id, config in legacy.items():
+            # Oldest format stored just the channel ID
+            if not isinstance(config, dict):
+                config = {"channel_id": config}
+            rows.append((
+                int(guild_id),
+                int(config["channel_id"]),
+                config.get("webhook_url"),
+                config.get("events", int(ALL_EVENTS))
+            ))
+
+        with self.db:
+            self.db.executemany(
+                'INSERT OR IGNORE INTO log_config (guild_id, channel_id, webhook_url, events) VALUES (?, ?, ?, ?)',
+                rows
+            )
+        os.replace(self.legacy_json_path, self.legacy_json_path + '.migrated')
+        logging.info(f"Migrated {len(rows)} servers from {self.legacy_json_path}")
+
+    def get(self, guild_id):
+        """Config for a server from the snapshot, or None"""
+        return self.snapshot.get(guild_id)
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def _write(self, guild_id, config):
+        with self.db:
+            self.db.execute(
+                '''INSERT INTO log_config (guild_id, channel_id, webhook_url, events, retention_days) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(guild_id) DO UPDATE SET
+                       channel_id = excluded.channel_id,
+                       webhook_url = excluded.webhook_url,
+                       events = excluded.events,
+                       retention_days = excluded.retention_days''',
+                (guild_id, config.channel_id, config.webhook_url, config.events, config.retention_days)
+            )
+
+    def _delete(self, guild_id):
+        with self.db:
+            self.db.execute('DELETE FROM log_config WHERE guild_id = ?', (guild_id,))
+
+    async def set(self, guild_id, config):
+        """Persist a server's config, then publish it to the snapshot"""
+        await self._run(self._write, guild_id, config)
+        self.snapshot[guild_id] = config
+
+    async def delete(self, guild_id):
+        """Remove a server's config, returns the removed config or None"""
+        await self._run(self._delete, guild_id)
+        return self.snapshot.pop(guild_id, None)
+
+    def close(self):
+        """Wait for pending writes and close the database"""
+        self.executor.shutdown(wait=True)
+        if self.db:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,136 @@
+"""
+Handler latency instrumentation
+Times every event listener and slash command, keeps rolling percentiles per name and
+logs invocations slower than a threshold together with a sample of where they were waiting
+"""
+
+import asyncio
+import collections
+import logging
+import os
+import time
+from array import array
+
+class LatencyWindow:
+    """The most recent durations for one handler in a fixed ring buffer, plus lifetime totals"""
+    __slots__ = ('samples', 'next', 'count', 'total', 'max', 'slow')
+
+    def __init__(self, size):
+        self.samples = array('d', bytes(8 * size))
+        self.next = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+
+    def add(self, seconds):
+        self.samples[self.next] = seconds
+        self.next = (self.next + 1) % len(self.samples)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentiles(self, *points):
+        """Percentiles over the window, sorting happens here rather than on every add"""
+        recent = sorted(self.samples[:min(self.count, len(self.samples))])
+        if not recent:
+            return [0.0 for _ in points]
+        return [recent[min(len(recent) - 1, int(len(recent) * point / 100))] for point in points]
+
+class Span:
+    __slots__ = ('name', 'started', 'task', 'timer', 'sample')
+
+    def __init__(self, name, started, task):
+        self.name = name
+        self.started = started
+        self.task = task
+        self.timer = None
+        self.sample = None  # Formatted stack, taken once the threshold has passed
+
+def _format_stack(task, limit):
+    """Where a suspended task is waiting, innermost frames last and asyncio internals left out
+
+    Task.get_stack() only returns the outermost coroutine's frame, so follow the await chain instead.
+    """
+    frames = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, 'cr_frame', None) or getattr(awaitable, 'gi_frame', None)
+        if frame is None:
+            break
+        if os.sep + 'asyncio' + os.sep not in frame.f_code.co_filename:
+            frames.append(frame)
+        awaitable = getattr(awaitable, 'cr_await', None) or getattr(awaitable, 'gi_yieldfrom', None)
+    return [
+        f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        for frame in frames[-limit:]
+    ]
+
+class Instrumentation:
+    """Timing for event listeners and app commands
+
+    begin() starts a timer that samples the running task's stack if it is still busy after
+    threshold seconds. A handler that blocks the event loop cannot be sampled while it runs;
+    those are reported as blocking when they finish.
+    """
+
+    def __init__(self, threshold=1.0, window=512, stack_depth=6, observe=None):
+        self.threshold = threshold
+        self.window = window
+        self.stack_depth = stack_depth
+        self.observe = observe  # observe(seconds, name), e.g. a metrics histogram
+        self.handlers = {}  # name -> LatencyWindow
+        self.recent_slow = collections.deque(maxlen=20)  # (time, name, seconds, innermost frame)
+
+    def begin(self, name):
+        task = asyncio.current_task()
+        span = Span(name, time.perf_counter(), task)
+        if task is not None and self.threshold:
+            span.timer = asyncio.get_running_loop().call_later(self.threshold, self._sample, span)
+        return span
+
+    def _sample(self, span):
+        if not span.task.done():
+            span.sample = _format_stack(span.task, self.stack_depth)
+
+    def end(self, span):
+        seconds = time.perf_counter() - span.started
+        if span.timer:
+            span.timer.cancel()
+        stats = self.handlers.get(span.name)
+        if stats is None:
+            stats = self.handlers[span.name] = LatencyWindow(self.window)
+        stats.add(seconds)
+        if self.observe:
+            self.observe(seconds, span.name)
+
+        if self.threshold and seconds >= self.threshold:
+            stats.slow += 1
+            if span.sample:
+                where = span.sample[-1]
+                logging.warning(f"Slow handler {span.name} took {seconds:.2f}s, waiting at:\n  " + "\n  ".join(span.sample))
+            else:
+                where = "blocked the event loop"
+                logging.warning(f"Slow handler {span.name} took {seconds:.2f}s and blocked the event loop")
+            self.recent_slow.append((time.time(), span.name, seconds, where))
+        return seconds
+
+    async def run(self, name, awaitable):
+        span = self.begin(name)
+        try:
+            return await awaitable
+        finally:
+            self.end(span)
+
+    def summary(self, limit=10):
+        """Handlers with the worst p95 as dicts, for status commands"""
+        rows = []
+        for name, stats in self.handlers.items():
+            p50, p95, p99 = stats.percentiles(50, 95, 99)
+            rows.append({
+                'name': name, 'count': stats.count, 'slow': stats.slow, 'max': stats.max,
+                'mean': stats.total / stats.count, 'p50': p50, 'p95': p95, 'p99': p99
+            })
+        rows.sort(key=lambda row: row['p95'], reverse=True)
+        return rows[:limit]
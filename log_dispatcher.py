@@ -0,0 +1,261 @@
+"""
+Batched delivery of log embeds
+Groups embeds per log channel into multi-embed messages to stay under rate limits
+"""
+
+import asyncio
+import collections
+import logging
+import time
+
+import discord
+
+from log_events import LogEvent, LOW_PRIORITY_EVENTS
+
+# Discord limits for a single message
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+# What to do with new events once a channel's backlog is full
+BACKLOG_POLICIES = ('drop_oldest', 'drop_low_priority', 'spill')
+
+def is_rejected(error):
+    """True if Discord refused the batch itself, so sending it again cannot succeed
+
+    Rate limits (429) and server errors (5xx) are temporary; any other 4xx, such as an
+    invalid embed, missing permissions or an unknown channel, is permanent.
+    """
+    return isinstance(error, discord.HTTPException) and 400 <= error.status < 500 and error.status != 429
+
+class LogChannelUnavailable(Exception):
+    """Raised when a log channel cannot be reached, so the batch gets spooled"""
+    pass
+
+class TokenBucket:
+    """Simple token bucket used as a per-route send budget"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class SendScheduler:
+    """Hands out per-route send budgets and caps in-flight sends per guild"""
+
+    def __init__(self, route_rate=1.0, route_burst=5, guild_inflight=2):
+        self.route_rate = route_rate
+        self.route_burst = route_burst
+        self.guild_inflight = guild_inflight
+        self.buckets = {}
+        self.guild_slots = {}
+        self.inflight = 0
+
+    async def run(self, route, guild_id, send):
+        """Run send() once the route has budget and the guild has a free slot"""
+        bucket = self.buckets.get(route)
+        if bucket is None:
+            bucket = self.buckets[route] = TokenBucket(self.route_rate, self.route_burst)
+        slots = self.guild_slots.get(guild_id)
+        if slots is None:
+            slots = self.guild_slots[guild_id] = asyncio.Semaphore(self.guild_inflight)
+
+        async with slots:
+            await bucket.acquire()
+            self.inflight += 1
+            try:
+                return await send()
+            finally:
+                self.inflight -= 1
+
+class _ChannelQueue:
+    """Backlog of (guild_id, embed, event) items for one log channel"""
+
+    def __init__(self):
+        self.items = collections.deque()
+        self.ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, item):
+        self.items.append(item)
+        self.ready.set()
+
+    async def wait(self, timeout=None):
+        """Wait until woken by a new item or close(), returns True if items are queued"""
+        if self.items:
+            return True
+        self.ready.clear()
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return bool(self.items)
+
+class LogDispatcher:
+    """Per-channel log queues that coalesce embeds into batched sends"""
+
+    def __init__(self, send, scheduler=None, max_latency=2.0, queue_depth=1000,
+                 policy='drop_low_priority', spool=None):
+        # send(guild_id, channel_id, embeds) performs the actual REST call
+        self.send = send
+        self.scheduler = scheduler or SendScheduler()
+        self.max_latency = max_latency
+        self.queue_depth = queue_depth
+        self.policy = policy
+        # LogSpool for failed batches and spilled backlog, optional
+        self.spool = spool
+        self.queues = {}
+        self.workers = {}
+        self.closing = False
+        self.sent_messages = 0
+        self.sent_embeds = 0
+        self.failed = 0
+        self.rejected = 0  # Part of failed: refused by Discord, discarded instead of spooled
+        self.drops = collections.Counter()
+        self.spilled = 0
+
+    def enqueue(self, guild_id, channel_id, embed, event=LogEvent.MESSAGE_SEND):
+        """Queue an embed for its log channel, applying the backlog policy when full"""
+        queue = self.queues.get(channel_id)
+        if queue is None:
+            queue = self.queues[channel_id] = _ChannelQueue()
+            self.workers[channel_id] = asyncio.create_task(self._worker(channel_id, queue))
+
+        item = (guild_id, embed, event)
+        if len(queue) >= self.queue_depth and not self._make_room(channel_id, queue, item):
+            return False
+
+        queue.put(item)
+        return True
+
+    def _make_room(self, channel_id, queue, item):
+        """Apply the backlog policy, returns True if the new item should still be queued"""
+        if self.policy == 'spill' and self.spool is not None:
+            # Spill the oldest event so everything queued after it follows it through the spool
+            guild_id, embed, event = queue.items.popleft()
+            if self.spool.add(guild_id, channel_id, [event], [embed]):
+                self.spilled += 1
+            else:
+                self.drops[event.name.lower()] += 1
+            return True
+
+        if self.policy == 'drop_low_priority':
+            for index, queued in enumerate(queue.items):
+                if queued[2] & LOW_PRIORITY_EVENTS:
+                    del queue.items[index]
+                    self.drops[queued[2].name.lower()] += 1
+                    return True
+            if item[2] & LOW_PRIORITY_EVENTS:
+                self.drops[item[2].name.lower()] += 1
+                return False
+
+        dropped = queue.items.popleft()
+        self.drops[dropped[2].name.lower()] += 1
+        return True
+
+    def queue_depth_for(self, channel_id):
+        """Number of embeds waiting for one log channel"""
+        queue = self.queues.get(channel_id)
+        return len(queue) if queue else 0
+
+    def stats(self):
+        """Queue depth and drop counters for status commands"""
+        depths = [len(queue) for queue in self.queues.values()]
+        return {
+            'queued': sum(depths),
+            'deepest': max(depths, default=0),
+            'channels': len(self.queues),
+            'inflight': self.scheduler.inflight,
+            'sent_messages': self.sent_messages,
+            'sent_embeds': self.sent_embeds,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'dropped': sum(self.drops.values()),
+            'drops': dict(self.drops),
+            'spilled': self.spilled
+        }
+
+    async def _worker(self, channel_id, queue):
+        """Collect embeds until the batch is full or the deadline passes, then send"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            if not queue.items:
+                if self.closing:
+                    return
+                await queue.wait()
+                continue
+
+            guild_id, embed, event = queue.items.popleft()
+            batch = [embed]
+            events = [event]
+            size = len(embed)
+            deadline = loop.time() + self.max_latency
+
+            while len(batch) < MAX_EMBEDS_PER_MESSAGE:
+                if not queue.items:
+                    timeout = deadline - loop.time()
+                    if self.closing or timeout <= 0 or not await queue.wait(timeout):
+                        break
+
+                # Keep the batch to a single guild and under the message size limit
+                next_guild_id, next_embed, next_event = queue.items[0]
+                if next_guild_id != guild_id or size + len(next_embed) > MAX_EMBED_CHARS_PER_MESSAGE:
+                    break
+                queue.items.popleft()
+                batch.append(next_embed)
+                events.append(next_event)
+                size += len(next_embed)
+
+            await self._flush(guild_id, channel_id, batch, events)
+
+    async def deliver(self, guild_id, channel_id, embeds):
+        """Send embeds as one message within the scheduler's budgets"""
+        await self.scheduler.run(channel_id, guild_id, lambda: self.send(guild_id, channel_id, embeds))
+        self.sent_messages += 1
+        self.sent_embeds += len(embeds)
+
+    async def _flush(self, guild_id, channel_id, batch, events):
+        """Send one batch, spooling it if the channel is backlogged or the send fails"""
+        # Older spooled events for this channel must be delivered first
+        if self.spool is not None and self.spool.has_backlog(channel_id):
+            self.spool.add(guild_id, channel_id, events, batch)
+            return
+
+        try:
+            await self.deliver(guild_id, channel_id, batch)
+        except Exception as e:
+            self.failed += len(batch)
+            if is_rejected(e):
+                # Spooled, it would be retried forever and hold up every later event for the channel
+                self.rejected += len(batch)
+                logging.warning(f"Discord rejected {len(batch)} log events for channel {channel_id}, discarding them: {e}")
+                return
+            logging.warning(f"Failed to deliver {len(batch)} log events to channel {channel_id}: {e}")
+            if self.spool is not None:
+                self.spool.add(guild_id, channel_id, events, batch)
+
+    async def close(self):
+        """Deliver whatever is still queued and stop the workers"""
+        self.closing = True
+        for queue in self.queues.values():
+            queue.ready.set()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.workers.clear()
+        self.queues.clear()
@@ -0,0 +1,153 @@
+"""
+Precomputed embed templates for the logging handlers
+Each event type's title, colour and field layout is built once; handlers only supply the values
+"""
+
+import collections
+from datetime import datetime, timezone
+
+import discord
+
+class EmbedTemplate:
+    """Embed skeleton for one kind of log event"""
+    __slots__ = ('title', 'colour', 'fields')
+
+    def __init__(self, title, color, fields):
+        self.title = title
+        # One shared Colour instead of converting the int for every embed
+        self.colour = discord.Colour(color)
+        # (name, inline) for each field, in display order
+        self.fields = tuple(fields)
+
+    def build(self, *values, description=None, thumbnail=None):
+        """New embed with one value per template field, fields whose value is None are left out"""
+        embed = discord.Embed(
+            title=self.title,
+            colour=self.colour,
+            description=description or None,
+            timestamp=datetime.now(timezone.utc)
+        )
+        for (name, inline), value in zip(self.fields, values):
+            if value is not None:
+                embed.add_field(name=name, value=value, inline=inline)
+        if thumbnail:
+            embed.set_thumbnail(url=thumbnail)
+        return embed
+
+MESSAGE_SENT = EmbedTemplate("📝 Message Sent", 0x00ff00, [
+    ("👤 User", True),
+    ("📁 Channel", True),
+    ("🆔 Message ID", True),
+    ("💬 Content", False),
+    ("📎 Attachments", False)
+])
+
+MESSAGE_DELETED = EmbedTemplate("🗑️ Message Deleted", 0xff4444, [
+    ("👤 User", True),
+    ("📁 Channel", True),
+    ("🆔 Message ID", True),
+    ("💬 Deleted Content", False),
+    ("📅 Original Time", True),
+    ("📎 Attachments", False)
+])
+
+MESSAGES_BULK_DELETED = EmbedTemplate("🗑️ Messages Bulk Deleted", 0xff4444, [
+    ("📁 Channel", True),
+    ("🔢 Messages", True),
+    ("💾 Cached", True)
+])
+
+MESSAGE_EDITED = EmbedTemplate("✏️ Message Edited", 0xffaa00, [
+    ("👤 User", True),
+    ("📁 Channel", True),
+    ("🆔 Message ID", True),
+    ("📝 Before", False),
+    ("📝 After", False),
+    ("🔗 Jump to Message", True)
+])
+
+MEMBER_JOINED = EmbedTemplate("📥 Member Joined", 0x00ff00, [
+    ("👤 User", True),
+    ("🆔 User ID", True),
+    ("📅 Account Created", True),
+    ("👥 Member Count", True),
+    ("⏰ Account Age", True)
+])
+
+MEMBER_LEFT = EmbedTemplate("📤 Member Left", 0xff4444, [
+    ("👤 User", True),
+    ("🆔 User ID", True),
+    ("📅 Joined Server", True),
+    ("👥 Member Count", True),
+    ("⏰ Time in Server", True),
+    ("🎭 Roles", False)
+])
+
+MEMBER_UPDATED = EmbedTemplate("👤 Member Updated", 0x0099ff, [
+    ("👤 User", True),
+    ("🔄 Changes", False)
+])
+
+CHANNEL_CREATED = EmbedTemplate("📁 Channel Created", 0x00ff00, [
+    ("📁 Channel", True),
+    ("🆔 Channel ID", True),
+    ("📂 Type", True)
+])
+
+CHANNEL_DELETED = EmbedTemplate("🗑️ Channel Deleted", 0xff4444, [
+    ("📁 Channel", True),
+    ("🆔 Channel ID", True),
+    ("📂 Type", True)
+])
+
+VOICE_JOINED = EmbedTemplate("🔊 Voice Channel Joined", 0x00ff00, [
+    ("👤 User", True),
+    ("🔊 Channel", True)
+])
+
+VOICE_LEFT = EmbedTemplate("🔇 Voice Channel Left", 0xff4444, [
+    ("👤 User", True),
+    ("🔊 Channel", True)
+])
+
+VOICE_MOVED = EmbedTemplate("🔄 Voice Channel Moved", 0x0099ff, [
+    ("👤 User", True),
+    ("🔊 From", True),
+    ("🔊 To", True)
+])
+
+class AuthorCache:
+    """LRU of formatted user labels and avatar URLs, invalidated when a user changes"""
+
+    def __init__(self, size=4096):
+        self.size = size
+        self.entries = collections.OrderedDict()  # user_id -> (label, avatar_url)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user):
+        """Mention plus name and the global avatar URL for a user or member"""
+        entry = self.entries.get(user.id)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(user.id)
+            return entry
+
+        self.misses += 1
+        # Global avatar rather than a per-server one, so one entry is valid in every server
+        avatar = user.avatar or user.default_avatar
+        entry = self.entries[user.id] = (f"{user.mention} ({user})", avatar.url)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, user_id):
+        """Forget a user after a name or avatar change"""
+        self.entries.pop(user_id, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'users': len(self.entries),
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
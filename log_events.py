@@ -0,0 +1,38 @@
+"""
+Log event types shared by the logging handlers and the log dispatcher
+"""
+
+import enum
+
+class LogEvent(enum.IntFlag):
+    """Event types that can be sent to a log channel"""
+    MESSAGE_SEND = 1 << 0
+    MESSAGE_DELETE = 1 << 1
+    MESSAGE_EDIT = 1 << 2
+    MEMBER_JOIN = 1 << 3
+    MEMBER_REMOVE = 1 << 4
+    MEMBER_UPDATE = 1 << 5
+    CHANNEL_CREATE = 1 << 6
+    CHANNEL_DELETE = 1 << 7
+    VOICE = 1 << 8
+
+# High-volume events that are shed first when a log channel falls behind
+LOW_PRIORITY_EVENTS = LogEvent.MESSAGE_SEND | LogEvent.VOICE
+
+ALL_EVENTS = LogEvent(sum(LogEvent))
+
+# Names shown in /logevents and accepted by /logevent
+EVENT_LABELS = {
+    LogEvent.MESSAGE_SEND: "Messages sent",
+    LogEvent.MESSAGE_DELETE: "Messages deleted",
+    LogEvent.MESSAGE_EDIT: "Messages edited",
+    LogEvent.MEMBER_JOIN: "Member joins",
+    LogEvent.MEMBER_REMOVE: "Member leaves",
+    LogEvent.MEMBER_UPDATE: "Nickname and role changes",
+    LogEvent.CHANNEL_CREATE: "Channels created",
+    LogEvent.CHANNEL_DELETE: "Channels deleted",
+    LogEvent.VOICE: "Voice activity"
+}
+
+# Events that need message content after the fact
+CACHED_EVENTS = LogEvent.MESSAGE_DELETE | LogEvent.MESSAGE_EDIT
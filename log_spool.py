@@ -0,0 +1,343 @@
+"""
+Durable on-disk spool for log events that could not be delivered
+Append-only segment files per log channel, replayed in order once the channel is reachable
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import discord
+
+from log_dispatcher import MAX_EMBEDS_PER_MESSAGE, MAX_EMBED_CHARS_PER_MESSAGE, is_rejected
+
+SEGMENT_SUFFIX = '.jsonl'
+CURSOR_FILE = 'cursor'
+
+class LogSpool:
+    """Append-only, segmented spool of undelivered log batches"""
+
+    def __init__(self, directory, segment_bytes=4 * 1024 * 1024, max_bytes=256 * 1024 * 1024,
+                 flush_interval=0.5, is_current=None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        # is_current(guild_id, channel_id) says whether a channel is still a server's log channel
+        self.is_current = is_current
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='log-spool')
+        self.buffers = {}  # channel_id -> list of encoded lines waiting for the next fsync
+        self.pending = {}  # channel_id -> bytes spooled but not yet replayed
+        self.retry_at = {}
+        self.backoff = {}
+        self.wakeup = None
+        self.flush_lock = None
+        self.tasks = []
+        self.closed = False
+        self.spooled = 0
+        self.replayed = 0
+        self.discarded = 0
+        self.replay_seconds = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Pick up spool files left over from a previous run"""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.isdigit() or not os.path.isdir(path):
+                continue
+            size = self._channel_backlog_bytes(int(name))
+            if size:
+                self.pending[int(name)] = size
+        if self.pending:
+            logging.info(f"Log spool has {sum(self.pending.values()):,} bytes pending for {len(self.pending)} channels")
+
+    def _channel_dir(self, channel_id):
+        return os.path.join(self.directory, str(channel_id))
+
+    def _segments(self, channel_id):
+        """Segment file names for a channel, oldest first"""
+        try:
+            names = os.listdir(self._channel_dir(channel_id))
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names if name.endswith(SEGMENT_SUFFIX))
+
+    def _read_cursor(self, channel_id):
+        try:
+            with open(os.path.join(self._channel_dir(channel_id), CURSOR_FILE), 'r') as f:
+                segment, offset = f.read().split()
+                return segment, int(offset)
+        except (FileNotFoundError, ValueError):
+            return None, 0
+
+    def _write_cursor(self, channel_id, segment, offset):
+        path = os.path.join(self._channel_dir(channel_id), CURSOR_FILE)
+        with open(path + '.tmp', 'w') as f:
+            f.write(f"{segment} {offset}")
+        os.replace(path + '.tmp', path)
+
+    def _channel_backlog_bytes(self, channel_id):
+        segment, offset = self._read_cursor(channel_id)
+        total = 0
+        for name in self._segments(channel_id):
+            size = os.path.getsize(os.path.join(self._channel_dir(channel_id), name))
+            total += size - offset if name == segment else size
+        return total
+
+    # =================================
+    # WRITING
+    # =================================
+
+    def has_backlog(self, channel_id):
+        """True while a channel has spooled events, new events must queue behind them"""
+        return channel_id in self.pending or channel_id in self.buffers
+
+    def add(self, guild_id, channel_id, events, embeds):
+        """Spool one undelivered batch, returns False if the spool is full"""
+        if sum(self.pending.values()) >= self.max_bytes:
+            self.discarded += len(embeds)
+            return False
+
+        record = {
+            'time': datetime.now(timezone.utc).isoformat(),
+            'guild_id': guild_id,
+            'channel_id': channel_id,
+            'events': [event.name for event in events],
+            'embeds': [embed.to_dict() for embed in embeds]
+        }
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+        self.buffers.setdefault(channel_id, []).append(line)
+        self.pending[channel_id] = self.pending.get(channel_id, 0) + len(line)
+        self.spooled += len(embeds)
+        return True
+
+    def _write_segments(self, buffers):
+        """Append buffered lines to each channel's newest segment with one fsync per file"""
+        for channel_id, lines in buffers.items():
+            channel_dir = self._channel_dir(channel_id)
+            os.makedirs(channel_dir, exist_ok=True)
+            segments = self._segments(channel_id)
+            name = segments[-1] if segments else f"{1:010d}{SEGMENT_SUFFIX}"
+            path = os.path.join(channel_dir, name)
+            if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+                name = f"{int(name[:-len(SEGMENT_SUFFIX)]) + 1:010d}{SEGMENT_SUFFIX}"
+                path = os.path.join(channel_dir, name)
+
+            with open(path, 'ab') as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+    async def flush(self):
+        """Write everything buffered so far to disk, returns False if the write failed"""
+        if not self.buffers:
+            return True
+        async with self.flush_lock:
+            buffers, self.buffers = self.buffers, {}
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self.executor, self._write_segments, buffers)
+            except OSError as e:
+                logging.error(f"Failed to write log spool: {e}")
+                for channel_id, lines in buffers.items():
+                    self.buffers.setdefault(channel_id, [])[:0] = lines
+                return False
+        self.wakeup.set()
+        return True
+
+    # =================================
+    # REPLAY
+    # =================================
+
+    def _read_batch(self, channel_id, limit):
+        """Read up to limit records after the cursor as (segment, end_offset, record)"""
+        segment, offset = self._read_cursor(channel_id)
+        segments = self._segments(channel_id)
+        if segment not in segments:
+            segment, offset = (segments[0], 0) if segments else (None, 0)
+
+        records = []
+        while segment and len(records) < limit:
+            path = os.path.join(self._channel_dir(channel_id), segment)
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # Torn write from a crash, ignore the partial line
+                    offset += len(line)
+                    try:
+                        records.append((segment, offset, json.loads(line)))
+                    except ValueError:
+                        logging.warning(f"Skipping corrupt record in log spool segment {path}")
+                        continue
+                    if len(records) >= limit:
+                        break
+
+            if len(records) >= limit:
+                break
+            # Segment fully read, move on to the next one
+            index = segments.index(segment)
+            if index + 1 >= len(segments):
+                break
+            segment, offset = segments[index + 1], 0
+        return records
+
+    def _commit(self, channel_id, segment, offset):
+        """Advance the cursor and delete segments that have been fully replayed"""
+        self._write_cursor(channel_id, segment, offset)
+        for name in self._segments(channel_id):
+            if name >= segment:
+                break
+            os.remove(os.path.join(self._channel_dir(channel_id), name))
+
+    def _clear(self, channel_id):
+        """Remove all spool files for a channel"""
+        channel_dir = self._channel_dir(channel_id)
+        if not os.path.isdir(channel_dir):
+            return
+        for name in os.listdir(channel_dir):
+            os.remove(os.path.join(channel_dir, name))
+        os.rmdir(channel_dir)
+
+    def _clear_if_drained(self, channel_id):
+        """Remove a channel's spool files only if every record has been replayed"""
+        if self._read_batch(channel_id, 1):
+            return False
+        self._clear(channel_id)
+        return True
+
+    async def _finish_channel(self, channel_id):
+        """Drop a drained channel's backlog flag, unless new events arrived meanwhile"""
+        loop = asyncio.get_running_loop()
+        async with self.flush_lock:
+            drained = await loop.run_in_executor(self.executor, self._clear_if_drained, channel_id)
+            if drained and channel_id not in self.buffers:
+                self.pending.pop(channel_id, None)
+                return True
+        return False
+
+    async def _replay_channel(self, channel_id, send):
+        """Replay one channel's backlog in order, returns False if delivery failed"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            records = await loop.run_in_executor(self.executor, self._read_batch, channel_id, 50)
+            if not records:
+                if await self._finish_channel(channel_id):
+                    return True
+                # New events are still buffered; if they can't be written, back off like a failed send
+                if not await self.flush():
+                    return False
+                continue
+
+            guild_id = records[0][2]['guild_id']
+            if self.is_current and not self.is_current(guild_id, channel_id):
+                logging.warning(f"Discarding log spool for channel {channel_id}, it is no longer a log channel")
+                async with self.flush_lock:
+                    await loop.run_in_executor(self.executor, self._clear, channel_id)
+                    self.buffers.pop(channel_id, None)
+                    self.pending.pop(channel_id, None)
+                self.discarded += sum(len(record['embeds']) for _, _, record in records)
+                return True
+
+            # Merge consecutive records into full-size messages, keeping their order
+            index = 0
+            while index < len(records):
+                embeds = []
+                size = 0
+                segment = offset = None
+                while index < len(records):
+                    record_embeds = [discord.Embed.from_dict(data) for data in records[index][2]['embeds']]
+                    record_size = sum(len(embed) for embed in record_embeds)
+                    if embeds and (len(embeds) + len(record_embeds) > MAX_EMBEDS_PER_MESSAGE
+                                   or size + record_size > MAX_EMBED_CHARS_PER_MESSAGE):
+                        break
+                    embeds.extend(record_embeds)
+                    size += record_size
+                    segment, offset = records[index][0], records[index][1]
+                    index += 1
+
+                try:
+                    await send(guild_id, channel_id, embeds)
+                except Exception as e:
+                    if not is_rejected(e):
+                        logging.info(f"Log spool replay for channel {channel_id} paused: {e}")
+                        return False
+                    # Retrying a batch Discord refused would block the channel's backlog for good
+                    logging.warning(f"Discarding {len(embeds)} spooled log events for channel {channel_id}, Discord rejected them: {e}")
+                    self.discarded += len(embeds)
+                else:
+                    self.replayed += len(embeds)
+
+                await loop.run_in_executor(self.executor, self._commit, channel_id, segment, offset)
+                self.pending[channel_id] = await loop.run_in_executor(
+                    self.executor, self._channel_backlog_bytes, channel_id
+                )
+
+    async def _replay_loop(self, send):
+        """Background task that drains every channel's backlog"""
+        while not self.closed:
+            now = time.monotonic()
+            ready = [channel_id for channel_id in self.pending if self.retry_at.get(channel_id, 0) <= now]
+            if not ready:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), 5)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            started = time.monotonic()
+            for channel_id in ready:
+                if await self._replay_channel(channel_id, send):
+                    self.backoff.pop(channel_id, None)
+                    self.retry_at.pop(channel_id, None)
+                else:
+                    # Exponential backoff per channel, capped at 5 minutes
+                    delay = min(self.backoff.get(channel_id, 5) * 2, 300)
+                    self.backoff[channel_id] = delay
+                    self.retry_at[channel_id] = time.monotonic() + delay
+            self.replay_seconds += time.monotonic() - started
+            await asyncio.sleep(1)
+
+    async def _flush_loop(self):
+        while not self.closed:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self, send):
+        """Start the background flush and replay tasks"""
+        self.wakeup = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self.tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._replay_loop(send))
+        ]
+
+    def stats(self):
+        """Spool size and replay throughput for status commands"""
+        return {
+            'pending_bytes': sum(self.pending.values()),
+            'channels': len(self.pending),
+            'spooled': self.spooled,
+            'replayed': self.replayed,
+            'discarded': self.discarded,
+            'replay_rate': self.replayed / self.replay_seconds if self.replay_seconds else 0.0
+        }
+
+    async def close(self):
+        """Stop the background tasks and persist anything still buffered"""
+        self.closed = True
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.flush_lock:
+            await self.flush()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,109 @@
+"""
+Event loop lag monitor and loop selection
+Measures how late the event loop runs scheduled callbacks and, from a watchdog thread,
+reports what the loop is stuck on while a blocking call is still running
+"""
+
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+
+def use_event_loop(name):
+    """Select the event loop implementation before the bot starts, returns the one in use
+
+    'uvloop' is optional (pip install uvloop, not available on Windows); anything else,
+    or uvloop failing to import, keeps the default asyncio loop.
+    """
+    if name != 'uvloop':
+        return 'asyncio'
+    try:
+        import uvloop
+    except ImportError:
+        logging.warning("EVENT_LOOP=uvloop but uvloop is not installed, using asyncio")
+        return 'asyncio'
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return 'uvloop'
+
+class LoopMonitor:
+    """Samples scheduling delay every interval seconds
+
+    Lag is how much later than requested a sleep(interval) wakes up. A watchdog thread checks
+    that samples keep arriving; if none has for warn_after seconds, the loop is blocked right
+    now and the loop thread's current stack is logged, well before Discord drops the
+    connection for missed heartbeats.
+    """
+
+    def __init__(self, interval=0.25, warn_after=1.0, window=1200, observe=None):
+        self.interval = interval
+        self.warn_after = warn_after
+        self.observe = observe  # observe(seconds), e.g. a metrics histogram
+        self.recent = collections.deque(maxlen=window)
+        self.samples = 0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.last_tick = time.monotonic()
+        self.stall_reported = False
+        self.loop_thread = None
+        self.task = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        """Start sampling, must be called from the running loop"""
+        self.loop_thread = threading.get_ident()
+        self.last_tick = time.monotonic()
+        self.task = asyncio.create_task(self._sample())
+        threading.Thread(target=self._watch, name='loop-watchdog', daemon=True).start()
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.last_tick = time.monotonic()
+            self.samples += 1
+            self.recent.append(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if self.observe:
+                self.observe(lag)
+            if self.stall_reported:
+                logging.warning(f"Event loop recovered after being blocked for {lag:.2f}s")
+                self.stall_reported = False
+            elif lag >= self.warn_after:
+                self.stalls += 1
+                logging.warning(f"Event loop was blocked for {lag:.2f}s")
+
+    def _watch(self):
+        while not self.stopping.wait(self.interval):
+            stalled = time.monotonic() - self.last_tick - self.interval
+            if stalled < self.warn_after or self.stall_reported:
+                continue
+            self.stall_reported = True
+            self.stalls += 1
+            frame = sys._current_frames().get(self.loop_thread)
+            stack = "".join(traceback.format_stack(frame)[-6:]) if frame else "  (no stack)\n"
+            logging.warning(f"Event loop blocked for {stalled:.1f}s so far, gateway heartbeats are delayed. Running:\n{stack}")
+
+    def stats(self):
+        """Lag percentiles over the recent window, for status commands"""
+        recent = sorted(self.recent)
+        def percentile(point):
+            return recent[min(len(recent) - 1, int(len(recent) * point / 100))] if recent else 0.0
+        return {
+            'samples': self.samples,
+            'p50': percentile(50),
+            'p99': percentile(99),
+            'max': self.max_lag,
+            'stalls': self.stalls
+        }
+
+    async def close(self):
+        self.stopping.set()
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
@@ -0,0 +1,134 @@
+"""
+Member cache profiles
+Trades member cache completeness for memory: full caching, lazy on-demand chunking, or no member cache
+"""
+
+import asyncio
+import logging
+import sys
+import time
+
+import discord
+from discord.state import ConnectionState
+
+# full:    every member cached, all servers chunked at startup (the old behaviour)
+# lazy:    members cached once a server is chunked; small servers are chunked after startup,
+#          large ones only when a command needs their member list
+# minimal: no member cache; commands fall back to counts from the API
+CACHE_PROFILES = ('full', 'lazy', 'minimal')
+
+def member_cache_options(profile):
+    """Client keyword arguments for a cache profile"""
+    if profile == 'minimal':
+        return {'member_cache_flags': discord.MemberCacheFlags.none(), 'chunk_guilds_at_startup': False}
+    if profile == 'lazy':
+        return {'member_cache_flags': discord.MemberCacheFlags.all(), 'chunk_guilds_at_startup': False}
+    return {'member_cache_flags': discord.MemberCacheFlags.all(), 'chunk_guilds_at_startup': True}
+
+class MemberChunker:
+    """Requests member lists on demand, at most one request per server at a time"""
+
+    def __init__(self, profile, startup_threshold=1000, on_chunked=None):
+        self.profile = profile
+        # In lazy mode, servers up to this many members are chunked in the background after startup
+        self.startup_threshold = startup_threshold
+        # on_chunked(guild) is called after a server's member list has been loaded
+        self.on_chunked = on_chunked
+        self.locks = {}
+        self.chunked = 0
+        self.chunk_seconds = 0.0
+        self.task = None
+
+    @property
+    def enabled(self):
+        return self.profile != 'minimal'
+
+    async def ensure(self, guild):
+        """Make sure a server's members are cached, returns False if the profile has no member cache"""
+        if guild.chunked:
+            return True
+        if not self.enabled:
+            return False
+
+        lock = self.locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            if guild.chunked:
+                return True
+            started = time.perf_counter()
+            await guild.chunk(cache=True)
+            elapsed = time.perf_counter() - started
+            self.chunked += 1
+            self.chunk_seconds += elapsed
+            logging.info(f"Chunked {guild.member_count:,} members of {guild.name} in {elapsed:.1f}s")
+        self.locks.pop(guild.id, None)
+        if self.on_chunked:
+            self.on_chunked(guild)
+        return True
+
+    async def _chunk_small_guilds(self, guilds):
+        for guild in sorted(guilds, key=lambda guild: guild.member_count or 0):
+            if (guild.member_count or 0) > self.startup_threshold:
+                break
+            try:
+                await self.ensure(guild)
+            except (asyncio.TimeoutError, discord.HTTPException) as e:
+                logging.warning(f"Could not chunk {guild.name}: {e}")
+
+    def start(self, guilds):
+        """Background chunking of small servers in lazy mode"""
+        if self.profile == 'lazy' and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self._chunk_small_guilds(list(guilds)))
+
+# =================================
+# MEMORY REPORT
+# =================================
+
+# Objects shared by every member, counted once for the whole bot rather than per member
+_SHARED_TYPES = (discord.Guild, ConnectionState, type)
+
+def _deep_size(obj, seen):
+    """Size of an object and everything it references, skipping objects already counted"""
+    if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key, seen) + _deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if hasattr(obj, name):
+                size += _deep_size(getattr(obj, name), seen)
+    return size
+
+def guild_member_bytes(guild, sample_size=100):
+    """Estimated memory used by a server's cached members, measured on an even sample"""
+    members = guild.members
+    if not members:
+        return 0
+    step = max(1, len(members) // sample_size)
+    sample = members[::step][:sample_size]
+    seen = set()
+    sampled = sum(_deep_size(member, seen) for member in sample)
+    return int(sampled / len(sample) * len(members))
+
+async def memory_report(guilds, sample_size=100):
+    """Per-server cache use as dicts, largest first
+
+    Yields to the event loop after every server, so measuring a large shard does not hold
+    up gateway heartbeats.
+    """
+    report = []
+    for guild in list(guilds):
+        report.append({
+            'id': guild.id,
+            'name': guild.name,
+            'members': guild.member_count or 0,
+            'cached': len(guild.members),
+            'chunked': guild.chunked,
+            'bytes': guild_member_bytes(guild, sample_size)
+        })
+        await asyncio.sleep(0)
+    report.sort(key=lambda entry: entry['bytes'], reverse=True)
+    return report
@@ -0,0 +1,82 @@
+"""
+Incrementally maintained member statistics
+Per-server counters seeded once from the member cache, then updated from gateway events
+"""
+
+import discord
+
+class MemberCounts:
+    """Member totals for one server, or for all servers together"""
+    __slots__ = ('total', 'bots', 'online', 'complete')
+
+    def __init__(self, total=0, bots=0, online=0, complete=True):
+        self.total = total
+        self.bots = bots
+        self.online = online
+        # False when seeded before the member list was chunked, bots and online are then partial
+        self.complete = complete
+
+    @property
+    def humans(self):
+        return self.total - self.bots
+
+class MemberStats:
+    """Member counts per server plus a bot-wide aggregate, all O(1) to read"""
+
+    def __init__(self):
+        self.guilds = {}  # guild_id -> MemberCounts
+        self.totals = MemberCounts()
+
+    def _apply(self, counts, total=0, bots=0, online=0):
+        counts.total += total
+        counts.bots += bots
+        counts.online += online
+        self.totals.total += total
+        self.totals.bots += bots
+        self.totals.online += online
+
+    def seed(self, guild):
+        """Count a server's members from scratch, replacing any previous counts"""
+        self.remove_guild(guild.id)
+        bots = online = 0
+        for member in guild.members:
+            if member.bot:
+                bots += 1
+            if member.status != discord.Status.offline:
+                online += 1
+        # member_count comes from the gateway and is right even before the member list is chunked
+        total = guild.member_count or len(guild.members)
+        counts = self.guilds[guild.id] = MemberCounts(complete=guild.chunked)
+        self._apply(counts, total, bots, online)
+        return counts
+
+    def get(self, guild):
+        """Counts for a server, seeding them on first use"""
+        counts = self.guilds.get(guild.id)
+        if counts is None:
+            counts = self.seed(guild)
+        return counts
+
+    def remove_guild(self, guild_id):
+        counts = self.guilds.pop(guild_id, None)
+        if counts is not None:
+            self._apply(counts, -counts.total, -counts.bots, -counts.online)
+
+    def member_joined(self, member):
+        counts = self.guilds.get(member.guild.id)
+        if counts is not None:
+            self._apply(counts, 1, int(member.bot), int(member.status != discord.Status.offline))
+
+    def member_left(self, member):
+        counts = self.guilds.get(member.guild.id)
+        if counts is not None:
+            self._apply(counts, -1, -int(member.bot), -int(member.status != discord.Status.offline))
+
+    def presence_changed(self, before, after):
+        counts = self.guilds.get(after.guild.id)
+        if counts is None:
+            return
+        was_online = before.status != discord.Status.offline
+        is_online = after.status != discord.Status.offline
+        if was_online != is_online:
+            self._apply(counts, online=1 if is_online else -1)
@@ -0,0 +1,76 @@
+"""
+Reverse membership index: user ID -> IDs of the servers they share with the bot
+Each user's servers are kept as a sorted array of 64-bit integers to keep memory low
+"""
+
+import asyncio
+import bisect
+import sys
+from array import array
+
+class MembershipIndex:
+    """Which servers each user is a member of"""
+
+    def __init__(self):
+        self.users = {}  # user_id -> sorted array('Q') of guild IDs
+
+    def add(self, user_id, guild_id):
+        guild_ids = self.users.get(user_id)
+        if guild_ids is None:
+            self.users[user_id] = array('Q', (guild_id,))
+            return
+        position = bisect.bisect_left(guild_ids, guild_id)
+        if position == len(guild_ids) or guild_ids[position] != guild_id:
+            guild_ids.insert(position, guild_id)
+
+    def remove(self, user_id, guild_id):
+        guild_ids = self.users.get(user_id)
+        if guild_ids is None:
+            return
+        position = bisect.bisect_left(guild_ids, guild_id)
+        if position < len(guild_ids) and guild_ids[position] == guild_id:
+            del guild_ids[position]
+            if not guild_ids:
+                del self.users[user_id]
+
+    def add_guild(self, guild):
+        """Index every cached member of a server (after it has been chunked)"""
+        for member in guild.members:
+            self.add(member.id, guild.id)
+
+    def remove_guild(self, guild):
+        """Forget a server the bot has left"""
+        for member in guild.members:
+            self.remove(member.id, guild.id)
+
+    async def drop_guilds(self, guild_ids, batch_size=10000):
+        """Forget servers whose old member lists are no longer known
+
+        Goes over every user instead of a server's members, yielding to the event loop
+        every batch_size users
+        """
+        guild_ids = set(guild_ids)
+        if not guild_ids:
+            return
+        for count, user_id in enumerate(list(self.users), 1):
+            user_guilds = self.users.get(user_id)
+            if user_guilds is not None:
+                for guild_id in guild_ids.intersection(user_guilds):
+                    self.remove(user_id, guild_id)
+            if count % batch_size == 0:
+                await asyncio.sleep(0)
+
+    def clear(self):
+        self.users.clear()
+
+    def guilds_for(self, user_id):
+        """IDs of the servers a user shares with the bot, in ascending order"""
+        return list(self.users.get(user_id, ()))
+
+    def stats(self):
+        """Index size for status commands"""
+        return {
+            'users': len(self.users),
+            'entries': sum(len(guild_ids) for guild_ids in self.users.values()),
+            'bytes': sum(sys.getsizeof(guild_ids) for guild_ids in self.users.values())
+        }
@@ -0,0 +1,127 @@
+"""
+Compact message cache for delete/edit logging
+Keeps only the fields the loggers need, with per-server LRU eviction under a byte budget
+"""
+
+import collections
+import sys
+
+# Content longer than this is never shown in a log embed
+MAX_CACHED_CONTENT = 1000
+
+class CachedMessage:
+    """The parts of a message needed to log its deletion or edit"""
+    __slots__ = ('id', 'author_id', 'channel_id', 'content', 'attachments', 'created_at')
+
+    def __init__(self, id, author_id, channel_id, content, attachments, created_at):
+        self.id = id
+        self.author_id = author_id
+        self.channel_id = channel_id
+        self.content = content
+        self.attachments = attachments
+        self.created_at = created_at
+
+    @classmethod
+    def from_message(cls, message):
+        return cls(
+            message.id,
+            message.author.id,
+            message.channel.id,
+            message.content[:MAX_CACHED_CONTENT],
+            tuple(att.filename for att in message.attachments),
+            message.created_at.timestamp()
+        )
+
+    def size(self):
+        """Approximate memory used by this record in bytes"""
+        size = _RECORD_OVERHEAD + sys.getsizeof(self.content)
+        for name in self.attachments:
+            size += sys.getsizeof(name)
+        return size
+
+# Record object, its int/float fields, the attachments tuple and the LRU entry
+_RECORD_OVERHEAD = (
+    sys.getsizeof(CachedMessage(0, 0, 0, '', (), 0.0))
+    + 3 * sys.getsizeof(2 ** 62) + sys.getsizeof(0.0) + sys.getsizeof(())
+    + 100
+)
+
+class MessageCache:
+    """Per-server LRU of CachedMessage records bounded by a byte budget"""
+
+    def __init__(self, guild_budget=2 * 1024 * 1024):
+        self.guild_budget = guild_budget
+        self.guilds = {}  # guild_id -> OrderedDict(message_id -> CachedMessage)
+        self.guild_bytes = collections.Counter()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def add(self, guild_id, message):
+        """Cache a new message, evicting the least recently used ones over budget"""
+        record = CachedMessage.from_message(message)
+        messages = self.guilds.get(guild_id)
+        if messages is None:
+            messages = self.guilds[guild_id] = collections.OrderedDict()
+
+        messages[record.id] = record
+        self.guild_bytes[guild_id] += record.size()
+        while self.guild_bytes[guild_id] > self.guild_budget and messages:
+            _, evicted = messages.popitem(last=False)
+            self.guild_bytes[guild_id] -= evicted.size()
+            self.evictions += 1
+
+    def get(self, guild_id, message_id):
+        """Look up a message and mark it as recently used"""
+        messages = self.guilds.get(guild_id)
+        record = messages.get(message_id) if messages else None
+        if record is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        messages.move_to_end(message_id)
+        return record
+
+    def pop(self, guild_id, message_id):
+        """Remove and return a message (used when it is deleted)"""
+        messages = self.guilds.get(guild_id)
+        record = messages.pop(message_id, None) if messages else None
+        if record is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.guild_bytes[guild_id] -= record.size()
+        return record
+
+    def update_content(self, record, guild_id, content):
+        """Replace the cached content after an edit
+
+        Records that are not stored here, like ones built from discord.py's message cache,
+        are left alone so the server's byte count only covers what is actually cached.
+        """
+        messages = self.guilds.get(guild_id)
+        if messages is None or messages.get(record.id) is not record:
+            return
+        old_size = record.size()
+        record.content = content[:MAX_CACHED_CONTENT]
+        self.guild_bytes[guild_id] += record.size() - old_size
+
+    def remove_guild(self, guild_id):
+        """Drop everything cached for a server"""
+        self.guilds.pop(guild_id, None)
+        self.guild_bytes.pop(guild_id, None)
+
+    def stats(self):
+        """Hit rate and memory use for status commands"""
+        lookups = self.hits + self.misses
+        return {
+            'messages': sum(len(messages) for messages in self.guilds.values()),
+            'guilds': len(self.guilds),
+            'bytes': sum(self.guild_bytes.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions
+        }
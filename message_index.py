@@ -0,0 +1,152 @@
+"""
+Full-text search over logged message content
+SQLite FTS5 index fed in batches from the audit archive, written on its own thread
+"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from log_events import LogEvent
+
+# Archived events whose content is worth indexing
+INDEXED_EVENTS = {
+    LogEvent.MESSAGE_SEND.name,
+    LogEvent.MESSAGE_EDIT.name,
+    LogEvent.MESSAGE_DELETE.name
+}
+
+class MessageIndex:
+    """Incremental FTS5 index of message content with per-server retention"""
+
+    def __init__(self, path, default_retention_days=30, retention_for=None):
+        self.path = path
+        self.default_retention_days = default_retention_days
+        # retention_for(guild_id) returns a server's retention in days, or None for the default
+        self.retention_for = retention_for
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='message-index')
+        self.db = None
+        self.task = None
+        self.indexed = 0
+        self.pruned = 0
+
+    def open(self):
+        """Open the database and create the index tables"""
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        with self.db:
+            self.db.execute('''
+                CREATE TABLE IF NOT EXISTS message_meta (
+                    id INTEGER PRIMARY KEY,
+                    guild_id INTEGER NOT NULL,
+                    channel_id INTEGER,
+                    author_id INTEGER,
+                    message_id INTEGER,
+                    event TEXT NOT NULL,
+                    ts REAL NOT NULL
+                )
+            ''')
+            self.db.execute('CREATE INDEX IF NOT EXISTS message_meta_guild_ts ON message_meta (guild_id, ts)')
+            self.db.execute('CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(content)')
+
+    def add_records(self, records):
+        """Queue archived records for indexing, safe to call from any thread"""
+        rows = [
+            record for record in records
+            if record['e'] in INDEXED_EVENTS and record['d'].get('content')
+        ]
+        if rows:
+            self.executor.submit(self._index, rows)
+
+    def _index(self, records):
+        """Insert one batch in a single transaction"""
+        try:
+            with self.db:
+                for record in records:
+                    data = record['d']
+                    cursor = self.db.execute(
+                        'INSERT INTO message_meta (guild_id, channel_id, author_id, message_id, event, ts) VALUES (?, ?, ?, ?, ?, ?)',
+                        (record['g'], data.get('channel_id'), record['u'], data.get('message_id'), record['e'], record['t'])
+                    )
+                    self.db.execute('INSERT INTO message_fts (rowid, content) VALUES (?, ?)', (cursor.lastrowid, data['content']))
+            self.indexed += len(records)
+        except sqlite3.Error as e:
+            logging.error(f"Failed to index {len(records)} messages: {e}")
+
+    def _search(self, guild_id, query, limit, offset):
+        if not query.strip():
+            return [], 0
+        # Search for the text as a phrase so user input can't break FTS query syntax
+        phrase = '"' + query.replace('"', '""') + '"'
+        total = self.db.execute(
+            '''SELECT COUNT(*) FROM message_fts f JOIN message_meta m ON m.id = f.rowid
+               WHERE message_fts MATCH ? AND m.guild_id = ?''',
+            (phrase, guild_id)
+        ).fetchone()[0]
+        rows = self.db.execute(
+            '''SELECT m.author_id, m.channel_id, m.message_id, m.event, m.ts,
+                      snippet(message_fts, 0, '**', '**', '…', 16)
+               FROM message_fts f JOIN message_meta m ON m.id = f.rowid
+               WHERE message_fts MATCH ? AND m.guild_id = ?
+               ORDER BY m.ts DESC LIMIT ? OFFSET ?''',
+            (phrase, guild_id, limit, offset)
+        ).fetchall()
+        return rows, total
+
+    async def search(self, guild_id, query, limit=10, offset=0):
+        """Matching messages newest first as (rows, total matches)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._search, guild_id, query, limit, offset)
+
+    def _prune(self):
+        """Delete entries older than each server's retention period"""
+        now = time.time()
+        guild_ids = [row[0] for row in self.db.execute('SELECT DISTINCT guild_id FROM message_meta')]
+        removed = 0
+        with self.db:
+            for guild_id in guild_ids:
+                days = self.retention_for(guild_id) if self.retention_for else None
+                cutoff = now - (days or self.default_retention_days) * 86400
+                self.db.execute(
+                    'DELETE FROM message_fts WHERE rowid IN (SELECT id FROM message_meta WHERE guild_id = ? AND ts < ?)',
+                    (guild_id, cutoff)
+                )
+                removed += self.db.execute(
+                    'DELETE FROM message_meta WHERE guild_id = ? AND ts < ?', (guild_id, cutoff)
+                ).rowcount
+        self.pruned += removed
+        return removed
+
+    async def prune(self):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._prune)
+
+    async def _prune_loop(self, interval):
+        while True:
+            try:
+                removed = await self.prune()
+                if removed:
+                    logging.info(f"Pruned {removed:,} messages from the search index")
+            except sqlite3.Error as e:
+                logging.error(f"Failed to prune search index: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self, prune_interval=3600):
+        """Start the periodic retention pruning task"""
+        self.task = asyncio.create_task(self._prune_loop(prune_interval))
+
+    def stats(self):
+        return {'indexed': self.indexed, 'pruned': self.pruned}
+
+    async def close(self):
+        """Stop pruning, finish queued batches and close the database"""
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+        if self.db:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,204 @@
+"""
+Prometheus-style metrics
+Counters and histograms kept in process and served as plain text over a local aiohttp endpoint
+"""
+
+import logging
+import re
+import time
+
+import aiohttp
+from aiohttp import web
+
+# Upper bounds in seconds, suited to event handlers and REST calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic count per label combination"""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self.values = {}  # label values tuple -> count
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, _labels(self.label_names, labels), value
+
+class Histogram:
+    """Bucketed observations per label combination"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self.buckets = buckets
+        self.values = {}  # label values tuple -> [bucket counts..., sum, count]
+
+    def observe(self, value, *labels):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[i] += 1
+                break
+        entry[-2] += value
+        entry[-1] += 1
+
+    def samples(self):
+        for labels, entry in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                yield self.name + '_bucket', _labels(self.label_names, labels, f'le="{bound}"'), cumulative
+            yield self.name + '_bucket', _labels(self.label_names, labels, 'le="+Inf"'), entry[-1]
+            yield self.name + '_sum', _labels(self.label_names, labels), entry[-2]
+            yield self.name + '_count', _labels(self.label_names, labels), entry[-1]
+
+class Gauge:
+    """Current values read at scrape time, collect() returns (label values tuple, value) pairs"""
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels=(), collect=None):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in self.collect():
+            if value is not None:
+                yield self.name, _labels(self.label_names, labels), value
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                logging.warning(f"Could not collect metric {metric.name}: {e}")
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{name}{labels} {_number(value)}' for name, labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+# =================================
+# REST ROUTES
+# =================================
+
+_API_PREFIX = re.compile(r'^/api(?:/v\d+)?')
+_SNOWFLAKE = re.compile(r'^\d{15,25}$')
+
+def route_template(method, url):
+    """'POST /channels/:id/messages' from a request URL, so IDs and tokens do not become labels"""
+    path = _API_PREFIX.sub('', url.path)
+    parts = path.split('/')
+    for i, part in enumerate(parts):
+        previous = parts[i - 1] if i else ''
+        if _SNOWFLAKE.match(part):
+            parts[i] = ':id'
+        elif i >= 2 and parts[i - 2] in ('webhooks', 'interactions') and previous == ':id':
+            parts[i] = ':token'
+        elif previous == 'reactions':
+            parts[i] = ':emoji'
+    return f'{method} {"/".join(parts)}'
+
+# =================================
+# BOT METRICS
+# =================================
+
+class BotMetrics:
+    """The bot's metrics: gateway events, handler latency and REST calls, plus gauges added by the bot"""
+
+    def __init__(self):
+        self.registry = Registry()
+        self.gateway_events = self.registry.register(Counter(
+            'discord_gateway_events_total', 'Gateway dispatch events received', ('event',)
+        ))
+        self.handler_seconds = self.registry.register(Histogram(
+            'discord_handler_seconds', 'Time spent in event handlers and slash commands', ('event',)
+        ))
+        self.handler_errors = self.registry.register(Counter(
+            'discord_handler_errors_total', 'Event handlers that raised', ('event',)
+        ))
+        self.rest_requests = self.registry.register(Counter(
+            'discord_rest_requests_total', 'HTTP requests to Discord by route and status', ('route', 'status')
+        ))
+        self.rest_seconds = self.registry.register(Histogram(
+            'discord_rest_seconds', 'HTTP request latency to Discord by route', ('route',)
+        ))
+        self.loop_lag = self.registry.register(Histogram(
+            'discord_event_loop_lag_seconds', 'How late the event loop ran scheduled callbacks'
+        ))
+        self.server = None
+
+    def gauge(self, name, help_text, collect, labels=()):
+        """Register a gauge, collect() returns (label values tuple, value) pairs"""
+        return self.registry.register(Gauge(name, help_text, labels, collect))
+
+    def trace_config(self):
+        """aiohttp TraceConfig that records every HTTP request made by a session"""
+        async def on_request_start(session, context, params):
+            context.started = time.perf_counter()
+
+        async def on_request_end(session, context, params):
+            route = route_template(params.method, params.url)
+            self.rest_requests.inc(route, str(params.response.status))
+            self.rest_seconds.observe(time.perf_counter() - context.started, route)
+
+        async def on_request_exception(session, context, params):
+            self.rest_requests.inc(route_template(params.method, params.url), 'error')
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    async def _handle(self, request):
+        return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8')
+
+    async def start(self, host, port):
+        """Serve /metrics, meant for a local scraper so it binds to localhost by default"""
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self.server = web.AppRunner(app, access_log=None)
+        await self.server.setup()
+        await web.TCPSite(self.server, host, port).start()
+        logging.info(f"Metrics available on http://{host}:{port}/metrics")
+
+    async def close(self):
+        if self.server:
+            await self.server.cleanup()
+            self.server = None
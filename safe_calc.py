@@ -0,0 +1,180 @@
+"""
+Sandboxed calculator for /calc
+Expressions are parsed into an AST and evaluated with limits on size, exponents and operand
+magnitude. Anything beyond simple arithmetic runs in a small process pool with a hard timeout,
+so user input can never block the event loop.
+"""
+
+import ast
+import asyncio
+import concurrent.futures
+import logging
+import math
+import operator
+from collections import OrderedDict
+
+MAX_LENGTH = 200
+MAX_NODES = 100
+MAX_EXPONENT = 10000
+# Integer operands and results are capped at this many bits (about 300 decimal digits)
+MAX_BITS = 1024
+# Expressions up to this many nodes without ** are evaluated inline, the rest in the pool
+INLINE_NODES = 25
+
+class CalcError(Exception):
+    """An expression that is invalid or too expensive, the message is shown to the user"""
+    pass
+
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow
+}
+_UNARY = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg
+}
+
+def parse(expression):
+    """Parse and validate an expression, returns (AST, needs the process pool)"""
+    if len(expression) > MAX_LENGTH:
+        raise CalcError(f"Expression too long! Maximum is {MAX_LENGTH} characters")
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except (SyntaxError, ValueError, RecursionError):
+        raise CalcError("Invalid mathematical expression!")
+
+    nodes = 0
+    heavy = False
+    for node in ast.walk(tree.body):
+        nodes += 1
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            heavy = heavy or isinstance(node.op, ast.Pow)
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+            pass
+        elif isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            pass
+        elif isinstance(node, (ast.operator, ast.unaryop)):
+            pass
+        else:
+            raise CalcError("Only numbers, + - * / // % ** and parentheses are allowed!")
+    if nodes > MAX_NODES:
+        raise CalcError("Expression too complex!")
+    return tree.body, heavy or nodes > INLINE_NODES
+
+def _check_int(value):
+    if isinstance(value, int) and value.bit_length() > MAX_BITS:
+        raise CalcError("Result too large!")
+    return value
+
+def _evaluate(node):
+    if isinstance(node, ast.Constant):
+        return _check_int(node.value)
+    if isinstance(node, ast.UnaryOp):
+        return _UNARY[type(node.op)](_evaluate(node.operand))
+
+    left = _evaluate(node.left)
+    right = _evaluate(node.right)
+    op = type(node.op)
+    # Estimate integer sizes before computing them, a single ** or * can take minutes otherwise
+    if op is ast.Pow:
+        if abs(right) > MAX_EXPONENT:
+            raise CalcError(f"Exponent too large! Maximum is {MAX_EXPONENT:,}")
+        if isinstance(left, int) and isinstance(right, int) and right > 0 and abs(left) > 1:
+            # |left| >= 2 ** (bits - 1), so this is a lower bound on the result's size
+            if (left.bit_length() - 1) * right > MAX_BITS:
+                raise CalcError("Result too large!")
+    elif op is ast.Mult and isinstance(left, int) and isinstance(right, int):
+        if left.bit_length() + right.bit_length() > MAX_BITS + 1:
+            raise CalcError("Result too large!")
+    return _check_int(_BINARY[op](left, right))
+
+def evaluate(node):
+    """Evaluate a validated AST, raises CalcError or ZeroDivisionError"""
+    try:
+        result = _evaluate(node)
+    except OverflowError:
+        raise CalcError("Result too large!")
+    if isinstance(result, complex):
+        # A negative number to a fractional power
+        raise CalcError("Result is not a real number!")
+    if isinstance(result, float) and not math.isfinite(result):
+        raise CalcError("Result too large!")
+    return result
+
+def _evaluate_text(expression):
+    """Process pool entry point, the AST is rebuilt there since it does not pickle"""
+    node, _ = parse(expression)
+    return evaluate(node)
+
+class Calculator:
+    """Evaluates expressions off the event loop where needed and caches the results"""
+
+    def __init__(self, workers=2, timeout=2.0, cache_size=512):
+        self.workers = workers
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # expression -> result or CalcError
+        self.pool = None
+        self.timeouts = 0
+
+    def _remember(self, expression, outcome):
+        self.cache[expression] = outcome
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _kill_pool(self):
+        """Stop a pool whose worker is stuck, a running calculation cannot be cancelled any other way"""
+        pool, self.pool = self.pool, None
+        if pool is None:
+            return
+        terminate = getattr(pool, 'terminate_workers', None)  # Python 3.14+
+        if terminate:
+            terminate()
+        else:
+            # Private attribute before 3.14, tolerate it changing or going away
+            for process in list((getattr(pool, '_processes', None) or {}).values()):
+                process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_in_pool(self, expression):
+        if self.pool is None:
+            self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        future = asyncio.get_running_loop().run_in_executor(self.pool, _evaluate_text, expression)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logging.warning(f"Calculation timed out after {self.timeout}s: {expression!r}")
+            self._kill_pool()
+            raise CalcError("Calculation took too long!")
+
+    async def calculate(self, expression):
+        """Result of an expression, raises CalcError or ZeroDivisionError"""
+        expression = expression.replace(' ', '')
+        outcome = self.cache.get(expression)
+        if outcome is None:
+            try:
+                node, heavy = parse(expression)
+                outcome = await self._run_in_pool(expression) if heavy else evaluate(node)
+            except (CalcError, ZeroDivisionError) as e:
+                outcome = e  # Failures are cached too, a timed out expression is not retried
+            except concurrent.futures.process.BrokenProcessPool:
+                # Another calculation timed out and took the pool down while this one was queued
+                raise CalcError("Calculation was interrupted, please try again")
+            self._remember(expression, outcome)
+        else:
+            self.cache.move_to_end(expression)
+
+        if isinstance(outcome, Exception):
+            raise type(outcome)(*outcome.args)
+        return outcome
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
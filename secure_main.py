@@ -1,14 +1,39 @@
+# Started before the imports below so the startup profile includes them
+from startup_profiler import StartupProfiler
+profiler = StartupProfiler()
+
 import discord
 from discord import app_commands
 from discord.ext import commands
 import os
 import asyncio
 import logging
+import math
 import random
+import time
 from datetime import datetime, timezone, timedelta
-import pytz
-import json
-from security_config import security, SecurityError
+import aiohttp
+from security_config import security, SecurityError, env_int, env_float, data_path, worker_data_path, load_environment, setup_logging
+from log_dispatcher import LogDispatcher, SendScheduler, BACKLOG_POLICIES, LogChannelUnavailable
+from log_spool import LogSpool
+from audit_archive import AuditArchive
+from message_index import MessageIndex
+from log_events import LogEvent, ALL_EVENTS, EVENT_LABELS, CACHED_EVENTS
+from guild_config import GuildConfigStore, GuildLogConfig
+from message_cache import MessageCache, CachedMessage, MAX_CACHED_CONTENT
+import log_embeds
+import timezones
+from safe_calc import Calculator, CalcError
+from member_stats import MemberStats
+from membership_index import MembershipIndex
+from fanout import FanoutExecutor
+from cluster import ClusterClient, parse_shard_ids
+from command_sync import CommandSync
+from metrics import BotMetrics
+from instrumentation import Instrumentation
+from loop_monitor import LoopMonitor, use_event_loop
+from gateway_recorder import GatewayRecorder
+from member_cache import CACHE_PROFILES, MemberChunker, member_cache_options, memory_report
 
 # Bot configuration with security
 intents = discord.Intents.default()
@@ -18,34 +43,329 @@ intents.guilds = True
 intents.guild_messages = True
 intents.dm_messages = True
 
-class SecureBot(commands.Bot):
+class InstrumentedTree(app_commands.CommandTree):
+    """Command tree that times every slash command and autocomplete"""
+    
+    async def _call(self, interaction):
+        command = interaction.command
+        name = f"/{command.qualified_name}" if command else "unknown command"
+        if interaction.type == discord.InteractionType.autocomplete:
+            name = f"autocomplete {name}"
+        await self.client.instrumentation.run(name, super()._call(interaction))
+
+def create_gateway_recorder():
+    """Gateway recorder from environment settings, None unless GATEWAY_RECORD is enabled"""
+    if os.getenv('GATEWAY_RECORD', '').lower() not in ('1', 'true', 'yes'):
+        return None
+    guilds = [int(part) for part in os.getenv('GATEWAY_RECORD_GUILDS', '').split(',') if part.strip()]
+    events = [part.strip().upper() for part in os.getenv('GATEWAY_RECORD_EVENTS', '').split(',') if part.strip()]
+    redact = [part.strip() for part in os.getenv('GATEWAY_RECORD_REDACT', 'content').split(',') if part.strip()]
+    return GatewayRecorder(
+        worker_data_path('captures'),
+        guilds=guilds,
+        events=events,
+        redact_fields=redact,
+        segment_bytes=env_int('GATEWAY_RECORD_SEGMENT_BYTES', 64 * 1024 * 1024, minimum=4096),
+        max_bytes=env_int('GATEWAY_RECORD_MAX_BYTES', 1024 * 1024 * 1024, minimum=0),
+        queue_size=env_int('GATEWAY_RECORD_QUEUE', 10000, minimum=100)
+    )
+
+class SecureBot(commands.AutoShardedBot):
     def __init__(self):
-        super().__init__(command_prefix='!', intents=intents)
+        load_environment()  # Settings below may come from .env
+        # Without SHARD_COUNT Discord picks the shard count; cluster.py sets both for each worker
+        shard_ids = os.getenv('SHARD_IDS')
+        cache_profile = os.getenv('MEMBER_CACHE_PROFILE', 'full').lower()
+        if cache_profile not in CACHE_PROFILES:
+            logging.warning(f"Unknown MEMBER_CACHE_PROFILE '{cache_profile}', using 'full'")
+            cache_profile = 'full'
+        self.metrics = BotMetrics()
+        self.instrumentation = Instrumentation(
+            threshold=env_float('SLOW_HANDLER_SECONDS', 1.0, minimum=0.0),
+            observe=self.metrics.handler_seconds.observe
+        )
+        self.loop_monitor = LoopMonitor(
+            warn_after=env_float('LOOP_LAG_WARN_SECONDS', 1.0, minimum=0.05),
+            observe=self.metrics.loop_lag.observe
+        )
+        self.event_loop = 'asyncio'  # Set by main() when uvloop is selected
+        self.gateway_recorder = create_gateway_recorder()
+        super().__init__(
+            command_prefix='!',
+            intents=intents,
+            shard_count=env_int('SHARD_COUNT', 0, minimum=0) or None,
+            shard_ids=parse_shard_ids(shard_ids) if shard_ids else None,
+            http_trace=self.metrics.trace_config(),
+            tree_cls=InstrumentedTree,
+            # Raw gateway messages are only surfaced while recording
+            enable_debug_events=self.gateway_recorder is not None,
+            **member_cache_options(cache_profile)
+        )
         self.security = security
+        self.cluster_id = env_int('CLUSTER_ID', 0, minimum=0) if os.getenv('CLUSTER_ID') else None
+        self.cluster = None  # IPC connection to the other workers when run from cluster.py
+        self.cluster_handlers = {
+            'stats': self.local_stats,
+            'servers': self.local_servers,
+            'mutual_guilds': self.local_mutual_guilds,
+            'memory': self.local_memory
+        }
         self.start_time = datetime.now(timezone.utc)
-        self.log_channels = {}  # Store logging channels per server
-        self.load_log_config()
+        # Databases and spool files are opened in setup_hook (open_storage), not at import
+        self.guild_config = None
+        self.log_channels = {}  # Logging config per server ID
+        self.log_masks = {}
+        self.log_dispatcher = None
+        self.log_spool = None
+        self.audit_archive = None
+        self.message_index = None
+        self.message_cache = MessageCache(guild_budget=env_int('MESSAGE_CACHE_GUILD_BYTES', 2 * 1024 * 1024, minimum=0))
+        self.author_cache = log_embeds.AuthorCache()
+        self.timezone_board = timezones.TimezoneBoard()
+        self.calculator = Calculator(
+            workers=env_int('CALC_WORKERS', 2, minimum=1),
+            timeout=env_float('CALC_TIMEOUT', 2.0, minimum=0.1)
+        )
+        self.member_stats = MemberStats()
+        self.membership_index = MembershipIndex()
+        self.indexed_guilds = set()  # Servers counted and indexed so far, see on_shard_ready
+        self.reseed_tasks = {}  # shard_id -> task recounting the shard's servers
+        self.member_chunker = MemberChunker(
+            cache_profile,
+            startup_threshold=env_int('MEMBER_CHUNK_THRESHOLD', 1000, minimum=0),
+            on_chunked=self.member_list_loaded
+        )
+        self.fanout = FanoutExecutor(concurrency=env_int('FANOUT_CONCURRENCY', 5, minimum=1))
+        self.webhook_session = None  # Dedicated HTTP pool for webhook log delivery
+        self.webhooks = {}
+    
+    def open_storage(self):
+        """Open the config database, log spool, audit archive and search index"""
+        self.guild_config = GuildConfigStore(data_path('guild_config.db'))
+        self.guild_config.open()
+        self.log_channels = self.guild_config.snapshot
+        self.log_masks = {guild_id: config.events for guild_id, config in self.log_channels.items()}
+        self.log_dispatcher = self.create_log_dispatcher()
+        self.audit_archive = AuditArchive(
+            worker_data_path('archive'),
+            segment_seconds=env_int('ARCHIVE_SEGMENT_SECONDS', 3600, minimum=60),
+            retention_days=env_int('ARCHIVE_RETENTION_DAYS', 30, minimum=1)
+        )
+        self.message_index = MessageIndex(
+            worker_data_path('message_index.db'),
+            default_retention_days=env_int('SEARCH_RETENTION_DAYS', 30, minimum=1),
+            retention_for=self.search_retention_days
+        )
+        self.message_index.open()
+        self.audit_archive.listeners.append(self.message_index.add_records)
+    
+    def register_gauges(self):
+        """Metrics read from the bot's state whenever /metrics is scraped"""
+        metrics = self.metrics
+        metrics.gauge('discord_gateway_latency_seconds', 'Heartbeat latency per shard',
+                      lambda: [((shard_id,), latency) for shard_id, latency in self.latencies if math.isfinite(latency)],
+                      labels=('shard',))
+        metrics.gauge('discord_guilds', 'Servers the bot is in', lambda: [((), len(self.guilds))])
+        metrics.gauge('discord_log_queue_depth', 'Log embeds waiting to be sent',
+                      lambda: [((), self.log_dispatcher.stats()['queued'])])
+        metrics.gauge('discord_log_queue_deepest', 'Log embeds waiting for the busiest log channel',
+                      lambda: [((), self.log_dispatcher.stats()['deepest'])])
+        metrics.gauge('discord_log_spool_bytes', 'Undelivered log data on disk',
+                      lambda: [((), self.log_spool.stats()['pending_bytes'])])
+        metrics.gauge('discord_log_dropped', 'Log embeds dropped by the backlog policy',
+                      lambda: [((), self.log_dispatcher.stats()['dropped'])])
+    
+    def create_log_dispatcher(self):
+        """Build the log dispatcher, send scheduler and spool from environment settings"""
+        policy = os.getenv('LOG_BACKLOG_POLICY', 'drop_low_priority').lower()
+        if policy not in BACKLOG_POLICIES:
+            logging.warning(f"Unknown LOG_BACKLOG_POLICY '{policy}', using 'drop_low_priority'")
+            policy = 'drop_low_priority'
+        
+        self.log_spool = LogSpool(
+            worker_data_path('log_spool'),
+            segment_bytes=env_int('LOG_SPOOL_SEGMENT_BYTES', 4 * 1024 * 1024, minimum=4096),
+            max_bytes=env_int('LOG_SPOOL_MAX_BYTES', 256 * 1024 * 1024, minimum=0),
+            is_current=self.is_log_channel
+        )
+        scheduler = SendScheduler(
+            route_rate=env_float('LOG_ROUTE_RATE', 1.0, minimum=0.1),
+            route_burst=env_int('LOG_ROUTE_BURST', 5, minimum=1),
+            guild_inflight=env_int('LOG_GUILD_INFLIGHT', 2, minimum=1)
+        )
+        return LogDispatcher(
+            self.send_log_batch,
+            scheduler=scheduler,
+            max_latency=env_float('LOG_BATCH_MAX_LATENCY', 2.0, minimum=0.0),
+            queue_depth=env_int('LOG_QUEUE_DEPTH', 1000, minimum=1),
+            policy=policy,
+            spool=self.log_spool
+        )
     
-    def load_log_config(self):
-        """Load logging configuration from file"""
+    def is_log_channel(self, guild_id, channel_id):
+        """Check whether a channel is still the server's log channel"""
+        config = self.log_channels.get(guild_id)
+        return config is not None and config.channel_id == channel_id
+    
+    def search_retention_days(self, guild_id):
+        """Message search retention for a server, or None for the default"""
+        config = self.log_channels.get(guild_id)
+        return config.retention_days if config else None
+    
+    async def set_log_config(self, guild_id, config):
+        """Persist a server's logging config and refresh its event mask"""
+        await self.guild_config.set(guild_id, config)
+        self.log_masks[guild_id] = config.events
+    
+    async def remove_log_config(self, guild_id):
+        """Remove a server's logging config, returns the old config or None"""
+        self.log_masks.pop(guild_id, None)
+        self.message_cache.remove_guild(guild_id)
+        return await self.guild_config.delete(guild_id)
+    
+    async def cluster_query(self, action, timeout=10.0, **args):
+        """Run an owner query on every cluster worker, or just this process when not clustered
+
+        If the IPC hub cannot be reached, this worker's own result is returned with an error
+        entry for the others, so commands still answer with what is available.
+        """
+        if self.cluster is None:
+            return [{'cluster': self.cluster_id or 0, 'result': await self.cluster_handlers[action](**args)}]
         try:
-            with open('log_config.json', 'r') as f:
-                self.log_channels = json.load(f)
-        except FileNotFoundError:
-            self.log_channels = {}
-    
-    def save_log_config(self):
-        """Save logging configuration to file"""
-        with open('log_config.json', 'w') as f:
-            json.dump(self.log_channels, f, indent=2)
+            return await self.cluster.broadcast(action, timeout=timeout, **args)
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logging.warning(f"Cluster query '{action}' failed, answering with local results: {str(e) or 'timed out'}")
+            return [
+                {'cluster': self.cluster_id, 'result': await self.cluster_handlers[action](**args)},
+                {'cluster': 'others', 'error': "Cluster IPC unavailable"}
+            ]
+    
+    async def local_stats(self):
+        """This process's share of /stats"""
+        return {
+            'shards': sorted(self.shards),
+            'guilds': len(self.guilds),
+            'members': self.member_stats.totals.total,
+            'latency': round(self.latency * 1000) if math.isfinite(self.latency) else None
+        }
+    
+    async def local_servers(self):
+        """Servers handled by this process for /servers"""
+        return [
+            {'id': guild.id, 'name': guild.name, 'members': guild.member_count, 'owner': str(guild.owner)}
+            for guild in self.guilds
+        ]
+    
+    async def local_mutual_guilds(self, user_id):
+        """Servers handled by this process that a user is in, as [id, name] pairs"""
+        guilds = (self.get_guild(guild_id) for guild_id in self.membership_index.guilds_for(user_id))
+        return [[guild.id, guild.name] for guild in guilds if guild]
+    
+    async def local_memory(self):
+        """Member cache profile and the servers using the most cache memory, for /memoryreport"""
+        report = await memory_report(self.guilds, sample_size=50)
+        try:
+            import psutil
+            rss = psutil.Process().memory_info().rss
+        except ImportError:
+            rss = None
+        return {
+            'profile': self.member_chunker.profile,
+            'rss': rss,
+            'guilds': len(report),
+            'chunked': sum(1 for entry in report if entry['chunked']),
+            'cached': sum(entry['cached'] for entry in report),
+            'bytes': sum(entry['bytes'] for entry in report),
+            'top': report[:10]
+        }
+    
+    def member_list_loaded(self, guild):
+        """Recount and index a server after its member list was chunked on demand"""
+        self.member_stats.seed(guild)
+        self.membership_index.add_guild(guild)
     
     async def setup_hook(self):
         """Secure bot setup"""
+        # Client.login() runs this hook once the login request has returned
+        profiler.mark('login')
+        self.loop_monitor.start()
+        self.open_storage()
+        pool_size = env_int('LOG_WEBHOOK_POOL_SIZE', 20, minimum=1)
+        self.webhook_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_size, limit_per_host=pool_size),
+            trace_configs=[self.metrics.trace_config()]
+        )
+        self.log_spool.start(self.log_dispatcher.deliver)
+        self.audit_archive.start()
+        self.message_index.start()
+        if self.gateway_recorder:
+            self.gateway_recorder.start()
+        
+        ipc_port = os.getenv('CLUSTER_IPC_PORT')
+        if ipc_port:
+            self.cluster = ClusterClient(self.cluster_id, int(ipc_port), os.getenv('CLUSTER_IPC_SECRET', ''), self.cluster_handlers)
+            self.cluster.start()
+        
+        metrics_port = env_int('METRICS_PORT', 0, minimum=0)
+        if metrics_port:
+            # Each cluster worker serves its own metrics on the next port up
+            self.register_gauges()
+            try:
+                await self.metrics.start(os.getenv('METRICS_HOST', '127.0.0.1'), metrics_port + (self.cluster_id or 0))
+            except OSError as e:
+                logging.error(f"Could not start metrics endpoint: {e}")
+        
+        profiler.mark('storage')
+        
+        # Commands are global, one worker syncing them is enough
+        if not self.cluster_id:
+            await self.sync_commands()
+    
+    async def sync_commands(self):
+        """Upload slash commands only if they changed since the last sync"""
+        command_sync = CommandSync(self.tree, data_path('command_sync.json'))
+        force = os.getenv('FORCE_COMMAND_SYNC', '').lower() in ('1', 'true', 'yes')
+        
+        # A development server gets command changes instantly instead of waiting for global propagation
+        guild = None
+        dev_guild_id = env_int('DEV_GUILD_ID', 0, minimum=0)
+        if dev_guild_id:
+            guild = discord.Object(id=dev_guild_id)
+            self.tree.copy_global_to(guild=guild)
+        scope = f"to development server {dev_guild_id}" if guild else "globally"
+        
         try:
-            synced = await self.tree.sync()
-            logging.info(f"Successfully synced {len(synced)} slash commands")
+            synced, count, seconds = await command_sync.sync(guild=guild, force=force)
         except Exception as e:
             logging.error(f"Failed to sync commands: {e}")
+            profiler.mark('command_sync', "failed")
+            return
+        
+        if synced:
+            logging.info(f"Successfully synced {count} slash commands {scope} in {seconds:.2f}s")
+            profiler.mark('command_sync', f"synced {count} commands")
+        else:
+            logging.info(f"{count} slash commands unchanged, skipped sync {scope} (saved ~{seconds:.2f}s)")
+            profiler.mark('command_sync', f"unchanged, saved ~{seconds:.2f}s")
+    
+    def dispatch(self, event_name, /, *args, **kwargs):
+        # Gateway-level events are handled inline instead of starting a listener task for each
+        if event_name == 'socket_event_type':
+            self.metrics.gateway_events.inc(args[0])
+            return
+        if event_name == 'socket_raw_receive':
+            self.gateway_recorder.put(args[0])
+            return
+        if event_name == 'socket_raw_send':
+            return
+        super().dispatch(event_name, *args, **kwargs)
+    
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        await self.instrumentation.run(event_name, super()._run_event(coro, event_name, *args, **kwargs))
+    
+    async def on_error(self, event_method, *args, **kwargs):
+        self.metrics.handler_errors.inc(event_method)
+        await super().on_error(event_method, *args, **kwargs)
     
     async def on_ready(self):
         """Secure bot ready event"""
@@ -56,8 +376,14 @@ class SecureBot(commands.Bot):
         logging.info(f"Environment: {self.security.environment}")
         logging.info(f"Current User's Login: cRaz0y")
         logging.info(f"Current Date and Time (UTC - YYYY-MM-DD HH:MM:SS formatted): {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')}")
+        if not profiler.reported:
+            profiler.mark('ready')
+            profiler.report(worker_data_path('startup_profile.jsonl'))
         logging.info("=" * 50)
         
+        # Member counts and the membership index are filled per shard, see on_shard_ready
+        self.member_chunker.start(self.guilds)
+        
         # Set status based on environment
         if self.security.environment == 'development':
             activity = discord.Game(name="🔧 L-Hub Development | Secure Mode")
@@ -66,16 +392,92 @@ class SecureBot(commands.Bot):
         
         await self.change_presence(activity=activity)
     
-    async def log_event(self, guild_id, embed):
-        """Send log embed to configured log channel"""
-        if str(guild_id) in self.log_channels:
-            channel_id = self.log_channels[str(guild_id)]
-            channel = self.get_channel(channel_id)
-            if channel:
-                try:
-                    await channel.send(embed=embed)
-                except:
-                    pass
+    async def on_shard_ready(self, shard_id):
+        """Recount and reindex a shard's servers once it has a new session"""
+        # A resumed session replays the missed events and dispatches on_shard_resumed instead.
+        # Without a resume, member events were lost while the shard was disconnected
+        task = self.reseed_tasks.get(shard_id)
+        if task and not task.done():
+            task.cancel()
+        self.reseed_tasks[shard_id] = asyncio.create_task(self.reseed_shard(shard_id))
+    
+    async def reseed_shard(self, shard_id):
+        """Replace the counts and index entries of a shard's servers, yielding between servers"""
+        guilds = [guild for guild in self.guilds if guild.shard_id == shard_id]
+        shard_count = self.shard_count or 1
+        indexed = {guild_id for guild_id in self.indexed_guilds if (guild_id >> 22) % shard_count == shard_id}
+        await self.membership_index.drop_guilds(indexed)
+        # Servers left while the shard was disconnected are no longer in the cache
+        for guild_id in indexed.difference(guild.id for guild in guilds):
+            self.indexed_guilds.discard(guild_id)
+            self.member_stats.remove_guild(guild_id)
+        for guild in guilds:
+            self.indexed_guilds.add(guild.id)
+            self.member_stats.seed(guild)
+            self.membership_index.add_guild(guild)
+            await asyncio.sleep(0)
+    
+    async def close(self):
+        """Flush pending log batches before disconnecting"""
+        if self.cluster:
+            await self.cluster.close()
+        # Storage is only open once setup_hook has run (not after a failed login)
+        if self.guild_config:
+            await self.log_dispatcher.close()
+            await self.log_spool.close()
+            await self.audit_archive.close()
+            await self.message_index.close()
+        if self.gateway_recorder:
+            await self.gateway_recorder.close()
+        if self.webhook_session:
+            await self.webhook_session.close()
+        self.calculator.close()
+        await self.metrics.close()
+        await self.loop_monitor.close()
+        await super().close()
+        if self.guild_config:
+            self.guild_config.close()
+    
+    async def log_event(self, guild_id, embed, event, user_id=None, data=None):
+        """Queue log embed for the configured log channel and record it in the audit archive"""
+        config = self.log_channels.get(guild_id)
+        if config:
+            self.log_dispatcher.enqueue(guild_id, config.channel_id, embed, event)
+            if data is not None:
+                self.audit_archive.record(guild_id, event, user_id, data)
+    
+    def get_log_webhook(self, guild_id):
+        """Return the log webhook for a server, or None in channel mode"""
+        config = self.log_channels.get(guild_id)
+        if not config or not config.webhook_url or not self.webhook_session:
+            return None
+        
+        url = config.webhook_url
+        webhook = self.webhooks.get(url)
+        if webhook is None:
+            webhook = discord.Webhook.from_url(url, session=self.webhook_session)
+            self.webhooks[url] = webhook
+        return webhook
+    
+    async def send_log_batch(self, guild_id, channel_id, embeds):
+        """Deliver a batch of up to 10 log embeds as a single message"""
+        webhook = self.get_log_webhook(guild_id)
+        if webhook:
+            try:
+                await webhook.send(embeds=embeds)
+                return
+            except discord.NotFound:
+                # Webhook was deleted in Discord, fall back to the bot's own channel send
+                logging.warning(f"Log webhook for server {guild_id} no longer exists, using channel mode")
+                self.webhooks.pop(webhook.url, None)
+                config = self.log_channels.get(guild_id)
+                if config:
+                    await self.set_log_config(guild_id, config.replace(webhook_url=None))
+        
+        channel = self.get_channel(channel_id)
+        if channel is None:
+            raise LogChannelUnavailable(f"Log channel {channel_id} is not available")
+        await channel.send(embeds=embeds)
     
     # =================================
     # LOGGING EVENTS
@@ -83,118 +485,245 @@ class SecureBot(commands.Bot):
     
     async def on_message(self, message):
         """Log all messages"""
-        if message.author.bot:
+        if message.guild is None:
+            return
+        mask = self.log_masks.get(message.guild.id, 0)
+        if not mask or message.author.bot:
             return
         
-        embed = discord.Embed(
-            title="📝 Message Sent",
-            color=0x00ff00,
-            timestamp=datetime.now(timezone.utc)
-        )
-        embed.add_field(name="👤 User", value=f"{message.author.mention} ({message.author})", inline=True)
-        embed.add_field(name="📁 Channel", value=f"{message.channel.mention}", inline=True)
-        embed.add_field(name="🆔 Message ID", value=message.id, inline=True)
-        embed.add_field(name="💬 Content", value=message.content[:1000] if message.content else "*No text content*", inline=False)
+        # Remember the message so later deletes and edits can be logged
+        if mask & CACHED_EVENTS:
+            self.message_cache.add(message.guild.id, message)
+        if not mask & LogEvent.MESSAGE_SEND:
+            return
         
-        if message.attachments:
-            embed.add_field(name="📎 Attachments", value="\n".join([att.filename for att in message.attachments]), inline=False)
+        user, avatar_url = self.author_cache.get(message.author)
+        attachments = [att.filename for att in message.attachments]
+        embed = log_embeds.MESSAGE_SENT.build(
+            user,
+            message.channel.mention,
+            message.id,
+            message.content[:1000] if message.content else "*No text content*",
+            "\n".join(attachments) if attachments else None,
+            thumbnail=avatar_url
+        )
         
-        embed.set_thumbnail(url=message.author.avatar.url if message.author.avatar else message.author.default_avatar.url)
+        await self.log_event(message.guild.id, embed, LogEvent.MESSAGE_SEND, message.author.id, {
+            "channel_id": message.channel.id,
+            "message_id": message.id,
+            "content": message.content,
+            "attachments": attachments
+        })
+    
+    def cached_message(self, guild_id, message_id, discord_cached=None, remove=False):
+        """Find a message in our cache, falling back to discord.py's own message cache"""
+        if remove:
+            record = self.message_cache.pop(guild_id, message_id)
+        else:
+            record = self.message_cache.get(guild_id, message_id)
         
-        await self.log_event(message.guild.id, embed)
-    
-    async def on_message_delete(self, message):
-        """Log deleted messages"""
-        if message.author.bot:
+        if record is None and discord_cached is not None and not discord_cached.author.bot:
+            record = CachedMessage.from_message(discord_cached)
+        return record
+    
+    def user_label(self, user_id):
+        """Mention plus name for a user ID, and an avatar URL if the user is cached"""
+        user = self.get_user(user_id)
+        if user is None:
+            return f"<@{user_id}>", None
+        return self.author_cache.get(user)
+    
+    async def on_user_update(self, before, after):
+        """Drop cached display data when a user changes their name or avatar"""
+        self.author_cache.invalidate(after.id)
+    
+    async def on_raw_message_delete(self, payload):
+        """Log deleted messages, including ones discord.py no longer has cached"""
+        if payload.guild_id is None or not self.log_masks.get(payload.guild_id, 0) & LogEvent.MESSAGE_DELETE:
             return
         
-        embed = discord.Embed(
-            title="🗑️ Message Deleted",
-            color=0xff4444,
-            timestamp=datetime.now(timezone.utc)
+        record = self.cached_message(payload.guild_id, payload.message_id, payload.cached_message, remove=True)
+        if record is None:
+            if payload.cached_message is not None:
+                return  # Bot message
+            config = self.log_channels.get(payload.guild_id)
+            if config and config.channel_id == payload.channel_id:
+                return  # Our own log messages being cleaned up
+        
+        created_at = discord.utils.snowflake_time(payload.message_id)
+        if record is not None:
+            user, avatar_url = self.user_label(record.author_id)
+            content = record.content or "*No text content*"
+            attachments = "\n".join(record.attachments) if record.attachments else None
+        else:
+            user = avatar_url = attachments = None
+            content = "*Message was not cached*"
+        embed = log_embeds.MESSAGE_DELETED.build(
+            user,
+            f"<#{payload.channel_id}>",
+            payload.message_id,
+            content,
+            created_at.strftime('%Y-%m-%d %H:%M:%S UTC'),
+            attachments,
+            thumbnail=avatar_url
         )
-        embed.add_field(name="👤 User", value=f"{message.author.mention} ({message.author})", inline=True)
-        embed.add_field(name="📁 Channel", value=f"{message.channel.mention}", inline=True)
-        embed.add_field(name="🆔 Message ID", value=message.id, inline=True)
-        embed.add_field(name="💬 Deleted Content", value=message.content[:1000] if message.content else "*No text content*", inline=False)
-        embed.add_field(name="📅 Original Time", value=message.created_at.strftime('%Y-%m-%d %H:%M:%S UTC'), inline=True)
         
-        if message.attachments:
-            embed.add_field(name="📎 Attachments", value="\n".join([att.filename for att in message.attachments]), inline=False)
+        await self.log_event(payload.guild_id, embed, LogEvent.MESSAGE_DELETE, record.author_id if record else None, {
+            "channel_id": payload.channel_id,
+            "message_id": payload.message_id,
+            "content": record.content if record else None,
+            "attachments": list(record.attachments) if record else []
+        })
+    
+    async def on_raw_bulk_message_delete(self, payload):
+        """Log purges and other bulk deletions as a single summary"""
+        if payload.guild_id is None or not self.log_masks.get(payload.guild_id, 0) & LogEvent.MESSAGE_DELETE:
+            return
+        
+        discord_cached = {message.id: message for message in payload.cached_messages}
+        lines = []
+        for message_id in sorted(payload.message_ids):
+            record = self.cached_message(payload.guild_id, message_id, discord_cached.get(message_id), remove=True)
+            if record is not None:
+                content = record.content[:80] or "*No text content*"
+                lines.append(f"<@{record.author_id}>: {content}")
+                self.audit_archive.record(payload.guild_id, LogEvent.MESSAGE_DELETE, record.author_id, {
+                    "channel_id": payload.channel_id,
+                    "message_id": message_id,
+                    "content": record.content,
+                    "attachments": list(record.attachments),
+                    "bulk": True
+                })
+        
+        description = ""
+        for line in lines:
+            if len(description) + len(line) + 1 > 2000:
+                description += "\n…"
+                break
+            description += line + "\n"
         
-        embed.set_thumbnail(url=message.author.avatar.url if message.author.avatar else message.author.default_avatar.url)
+        embed = log_embeds.MESSAGES_BULK_DELETED.build(
+            f"<#{payload.channel_id}>",
+            len(payload.message_ids),
+            len(lines),
+            description=description
+        )
         
-        await self.log_event(message.guild.id, embed)
+        await self.log_event(payload.guild_id, embed, LogEvent.MESSAGE_DELETE)
     
-    async def on_message_edit(self, before, after):
-        """Log edited messages"""
-        if before.author.bot or before.content == after.content:
+    async def on_raw_message_edit(self, payload):
+        """Log edited messages, including ones discord.py no longer has cached"""
+        if payload.guild_id is None or not self.log_masks.get(payload.guild_id, 0) & LogEvent.MESSAGE_EDIT:
             return
         
-        embed = discord.Embed(
-            title="✏️ Message Edited",
-            color=0xffaa00,
-            timestamp=datetime.now(timezone.utc)
-        )
-        embed.add_field(name="👤 User", value=f"{before.author.mention} ({before.author})", inline=True)
-        embed.add_field(name="📁 Channel", value=f"{before.channel.mention}", inline=True)
-        embed.add_field(name="🆔 Message ID", value=before.id, inline=True)
-        embed.add_field(name="📝 Before", value=before.content[:500] if before.content else "*No content*", inline=False)
-        embed.add_field(name="📝 After", value=after.content[:500] if after.content else "*No content*", inline=False)
-        embed.add_field(name="🔗 Jump to Message", value=f"[Click here]({after.jump_url})", inline=True)
+        # Embed unfurls also arrive as edits, only content changes are logged
+        if 'content' not in payload.data or payload.data.get('author', {}).get('bot'):
+            return
         
-        embed.set_thumbnail(url=before.author.avatar.url if before.author.avatar else before.author.default_avatar.url)
+        after_content = payload.data['content']
+        record = self.cached_message(payload.guild_id, payload.message_id, payload.cached_message)
+        if record is not None:
+            if record.content == after_content[:MAX_CACHED_CONTENT]:
+                return
+            before_content = record.content
+            author_id = record.author_id
+            self.message_cache.update_content(record, payload.guild_id, after_content)
+        else:
+            before_content = None
+            author_id = int(payload.data['author']['id']) if 'author' in payload.data else None
+        
+        user = avatar_url = None
+        if author_id is not None:
+            user, avatar_url = self.user_label(author_id)
+        if before_content is None:
+            before = "*Message was not cached*"
+        else:
+            before = before_content[:500] if before_content else "*No content*"
+        jump_url = f"https://discord.com/channels/{payload.guild_id}/{payload.channel_id}/{payload.message_id}"
+        embed = log_embeds.MESSAGE_EDITED.build(
+            user,
+            f"<#{payload.channel_id}>",
+            payload.message_id,
+            before,
+            after_content[:500] if after_content else "*No content*",
+            f"[Click here]({jump_url})",
+            thumbnail=avatar_url
+        )
         
-        await self.log_event(before.guild.id, embed)
+        await self.log_event(payload.guild_id, embed, LogEvent.MESSAGE_EDIT, author_id, {
+            "channel_id": payload.channel_id,
+            "message_id": payload.message_id,
+            "before": before_content,
+            "content": after_content
+        })
+    
+    async def on_guild_join(self, guild):
+        """Start member counts for a newly joined server"""
+        self.indexed_guilds.add(guild.id)
+        self.member_stats.seed(guild)
+        self.membership_index.add_guild(guild)
+    
+    async def on_guild_remove(self, guild):
+        """Drop member counts for a server the bot left"""
+        self.indexed_guilds.discard(guild.id)
+        self.member_stats.remove_guild(guild.id)
+        self.membership_index.remove_guild(guild)
+    
+    async def on_presence_update(self, before, after):
+        """Track online counts (only dispatched with the presences intent)"""
+        self.member_stats.presence_changed(before, after)
+    
+    async def on_member_ban(self, guild, user):
+        """Bans also arrive as member removes, this covers users the member cache missed"""
+        self.membership_index.remove(user.id, guild.id)
     
     async def on_member_join(self, member):
         """Log member joins"""
-        embed = discord.Embed(
-            title="📥 Member Joined",
-            color=0x00ff00,
-            timestamp=datetime.now(timezone.utc)
-        )
-        embed.add_field(name="👤 User", value=f"{member.mention} ({member})", inline=True)
-        embed.add_field(name="🆔 User ID", value=member.id, inline=True)
-        embed.add_field(name="📅 Account Created", value=member.created_at.strftime('%Y-%m-%d %H:%M:%S UTC'), inline=True)
-        embed.add_field(name="👥 Member Count", value=member.guild.member_count, inline=True)
+        self.member_stats.member_joined(member)
+        self.membership_index.add(member.id, member.guild.id)
+        if not self.log_masks.get(member.guild.id, 0) & LogEvent.MEMBER_JOIN:
+            return
         
-        # Account age
+        user, avatar_url = self.author_cache.get(member)
         account_age = datetime.now(timezone.utc) - member.created_at
-        embed.add_field(name="⏰ Account Age", value=f"{account_age.days} days old", inline=True)
-        
-        embed.set_thumbnail(url=member.avatar.url if member.avatar else member.default_avatar.url)
+        embed = log_embeds.MEMBER_JOINED.build(
+            user,
+            member.id,
+            member.created_at.strftime('%Y-%m-%d %H:%M:%S UTC'),
+            member.guild.member_count,
+            f"{account_age.days} days old",
+            thumbnail=avatar_url
+        )
         
-        await self.log_event(member.guild.id, embed)
+        await self.log_event(member.guild.id, embed, LogEvent.MEMBER_JOIN, member.id, {"name": str(member)})
     
     async def on_member_remove(self, member):
         """Log member leaves"""
-        embed = discord.Embed(
-            title="📤 Member Left",
-            color=0xff4444,
-            timestamp=datetime.now(timezone.utc)
-        )
-        embed.add_field(name="👤 User", value=f"{member.mention} ({member})", inline=True)
-        embed.add_field(name="🆔 User ID", value=member.id, inline=True)
-        embed.add_field(name="📅 Joined Server", value=member.joined_at.strftime('%Y-%m-%d %H:%M:%S UTC') if member.joined_at else "Unknown", inline=True)
-        embed.add_field(name="👥 Member Count", value=member.guild.member_count, inline=True)
-        
-        # Time in server
-        if member.joined_at:
-            time_in_server = datetime.now(timezone.utc) - member.joined_at
-            embed.add_field(name="⏰ Time in Server", value=f"{time_in_server.days} days", inline=True)
+        self.member_stats.member_left(member)
+        self.membership_index.remove(member.id, member.guild.id)
+        if not self.log_masks.get(member.guild.id, 0) & LogEvent.MEMBER_REMOVE:
+            return
         
-        # Roles
+        user, avatar_url = self.author_cache.get(member)
+        time_in_server = datetime.now(timezone.utc) - member.joined_at if member.joined_at else None
         roles = [role.name for role in member.roles[1:]]  # Exclude @everyone
-        if roles:
-            embed.add_field(name="🎭 Roles", value=", ".join(roles[:10]), inline=False)
-        
-        embed.set_thumbnail(url=member.avatar.url if member.avatar else member.default_avatar.url)
+        embed = log_embeds.MEMBER_LEFT.build(
+            user,
+            member.id,
+            member.joined_at.strftime('%Y-%m-%d %H:%M:%S UTC') if member.joined_at else "Unknown",
+            member.guild.member_count,
+            f"{time_in_server.days} days" if time_in_server else None,
+            ", ".join(roles[:10]) if roles else None,
+            thumbnail=avatar_url
+        )
         
-        await self.log_event(member.guild.id, embed)
+        await self.log_event(member.guild.id, embed, LogEvent.MEMBER_REMOVE, member.id, {"name": str(member), "roles": roles})
     
     async def on_member_update(self, before, after):
         """Log member updates (nickname, roles, etc.)"""
+        if not self.log_masks.get(after.guild.id, 0) & LogEvent.MEMBER_UPDATE:
+            return
+        
         changes = []
         
         # Nickname change
@@ -212,81 +741,68 @@ class SecureBot(commands.Bot):
                 changes.append(f"**Roles Removed:** {', '.join([role.name for role in removed_roles])}")
         
         if changes:
-            embed = discord.Embed(
-                title="👤 Member Updated",
-                color=0x0099ff,
-                timestamp=datetime.now(timezone.utc)
-            )
-            embed.add_field(name="👤 User", value=f"{after.mention} ({after})", inline=True)
-            embed.add_field(name="🔄 Changes", value="\n".join(changes), inline=False)
-            embed.set_thumbnail(url=after.avatar.url if after.avatar else after.default_avatar.url)
+            user, avatar_url = self.author_cache.get(after)
+            embed = log_embeds.MEMBER_UPDATED.build(user, "\n".join(changes), thumbnail=avatar_url)
             
-            await self.log_event(after.guild.id, embed)
+            await self.log_event(after.guild.id, embed, LogEvent.MEMBER_UPDATE, after.id, {"name": str(after), "changes": changes})
     
     async def on_guild_channel_create(self, channel):
         """Log channel creation"""
-        embed = discord.Embed(
-            title="📁 Channel Created",
-            color=0x00ff00,
-            timestamp=datetime.now(timezone.utc)
+        if not self.log_masks.get(channel.guild.id, 0) & LogEvent.CHANNEL_CREATE:
+            return
+        
+        embed = log_embeds.CHANNEL_CREATED.build(
+            f"{channel.mention} (`{channel.name}`)",
+            channel.id,
+            str(channel.type).title()
         )
-        embed.add_field(name="📁 Channel", value=f"{channel.mention} (`{channel.name}`)", inline=True)
-        embed.add_field(name="🆔 Channel ID", value=channel.id, inline=True)
-        embed.add_field(name="📂 Type", value=str(channel.type).title(), inline=True)
         
-        await self.log_event(channel.guild.id, embed)
+        await self.log_event(channel.guild.id, embed, LogEvent.CHANNEL_CREATE, None, {
+            "channel_id": channel.id,
+            "name": channel.name,
+            "type": str(channel.type)
+        })
     
     async def on_guild_channel_delete(self, channel):
         """Log channel deletion"""
-        embed = discord.Embed(
-            title="🗑️ Channel Deleted",
-            color=0xff4444,
-            timestamp=datetime.now(timezone.utc)
+        if not self.log_masks.get(channel.guild.id, 0) & LogEvent.CHANNEL_DELETE:
+            return
+        
+        embed = log_embeds.CHANNEL_DELETED.build(
+            f"`{channel.name}`",
+            channel.id,
+            str(channel.type).title()
         )
-        embed.add_field(name="📁 Channel", value=f"`{channel.name}`", inline=True)
-        embed.add_field(name="🆔 Channel ID", value=channel.id, inline=True)
-        embed.add_field(name="📂 Type", value=str(channel.type).title(), inline=True)
         
-        await self.log_event(channel.guild.id, embed)
+        await self.log_event(channel.guild.id, embed, LogEvent.CHANNEL_DELETE, None, {
+            "channel_id": channel.id,
+            "name": channel.name,
+            "type": str(channel.type)
+        })
     
     async def on_voice_state_update(self, member, before, after):
         """Log voice channel activity"""
+        if not self.log_masks.get(member.guild.id, 0) & LogEvent.VOICE:
+            return
         if before.channel == after.channel:
             return
         
+        user, avatar_url = self.author_cache.get(member)
         if before.channel is None and after.channel is not None:
             # User joined voice channel
-            embed = discord.Embed(
-                title="🔊 Voice Channel Joined",
-                color=0x00ff00,
-                timestamp=datetime.now(timezone.utc)
-            )
-            embed.add_field(name="👤 User", value=f"{member.mention} ({member})", inline=True)
-            embed.add_field(name="🔊 Channel", value=after.channel.name, inline=True)
-            
+            embed = log_embeds.VOICE_JOINED.build(user, after.channel.name, thumbnail=avatar_url)
         elif before.channel is not None and after.channel is None:
             # User left voice channel
-            embed = discord.Embed(
-                title="🔇 Voice Channel Left",
-                color=0xff4444,
-                timestamp=datetime.now(timezone.utc)
-            )
-            embed.add_field(name="👤 User", value=f"{member.mention} ({member})", inline=True)
-            embed.add_field(name="🔊 Channel", value=before.channel.name, inline=True)
-            
+            embed = log_embeds.VOICE_LEFT.build(user, before.channel.name, thumbnail=avatar_url)
         else:
             # User moved between voice channels
-            embed = discord.Embed(
-                title="🔄 Voice Channel Moved",
-                color=0x0099ff,
-                timestamp=datetime.now(timezone.utc)
-            )
-            embed.add_field(name="👤 User", value=f"{member.mention} ({member})", inline=True)
-            embed.add_field(name="🔊 From", value=before.channel.name, inline=True)
-            embed.add_field(name="🔊 To", value=after.channel.name, inline=True)
+            embed = log_embeds.VOICE_MOVED.build(user, before.channel.name, after.channel.name, thumbnail=avatar_url)
         
-        embed.set_thumbnail(url=member.avatar.url if member.avatar else member.default_avatar.url)
-        await self.log_event(member.guild.id, embed)
+        await self.log_event(member.guild.id, embed, LogEvent.VOICE, member.id, {
+            "name": str(member),
+            "before": before.channel.name if before.channel else None,
+            "after": after.channel.name if after.channel else None
+        })
 
 bot = SecureBot()
 
@@ -294,26 +810,61 @@ bot = SecureBot()
 # LOGGING COMMANDS
 # =================================
 
+async def delete_log_webhook(config):
+    """Delete the webhook created for a log channel, if any"""
+    if not config.webhook_url:
+        return
+    
+    bot.webhooks.pop(config.webhook_url, None)
+    try:
+        await discord.Webhook.from_url(config.webhook_url, client=bot).delete(reason="Logging channel changed")
+    except discord.HTTPException:
+        pass
+
 @bot.tree.command(name="setlogchannel", description="Set the logging channel for this server (Admin only)")
-@app_commands.describe(channel="Channel where logs will be sent")
+@app_commands.describe(
+    channel="Channel where logs will be sent",
+    use_webhook="Deliver logs through a webhook so they don't share rate limits with commands"
+)
 @app_commands.default_permissions(administrator=True)
-async def set_log_channel(interaction: discord.Interaction, channel: discord.TextChannel):
-    bot.log_channels[str(interaction.guild.id)] = channel.id
-    bot.save_log_config()
+async def set_log_channel(interaction: discord.Interaction, channel: discord.TextChannel, use_webhook: bool = False):
+    await interaction.response.defer()
+    
+    old_config = bot.log_channels.get(interaction.guild.id)
+    if old_config:
+        await delete_log_webhook(old_config)
+    
+    webhook_url = None
+    webhook_note = None
+    if use_webhook:
+        try:
+            webhook = await channel.create_webhook(name=f"{bot.user.name} Logs", reason="Log delivery webhook")
+            webhook_url = webhook.url
+        except discord.HTTPException:
+            webhook_note = "⚠️ Could not create a webhook (missing **Manage Webhooks** permission?), using channel mode"
+    
+    if old_config:
+        config = old_config.replace(channel_id=channel.id, webhook_url=webhook_url)
+    else:
+        config = GuildLogConfig(channel.id, webhook_url)
+    await bot.set_log_config(interaction.guild.id, config)
     
     embed = discord.Embed(
         title="📋 Logging Channel Set",
         description=f"All server logs will now be sent to {channel.mention}",
         color=0x00ff00
     )
-    await interaction.response.send_message(embed=embed)
+    embed.add_field(name="📨 Delivery", value="Webhook" if webhook_url else "Channel", inline=True)
+    if webhook_note:
+        embed.add_field(name="Note", value=webhook_note, inline=False)
+    await interaction.followup.send(embed=embed)
 
 @bot.tree.command(name="removelogchannel", description="Remove logging for this server (Admin only)")
 @app_commands.default_permissions(administrator=True)
 async def remove_log_channel(interaction: discord.Interaction):
-    if str(interaction.guild.id) in bot.log_channels:
-        del bot.log_channels[str(interaction.guild.id)]
-        bot.save_log_config()
+    config = await bot.remove_log_config(interaction.guild.id)
+    if config:
+        await delete_log_webhook(config)
         
         embed = discord.Embed(
             title="📋 Logging Disabled",
@@ -332,8 +883,9 @@ async def remove_log_channel(interaction: discord.Interaction):
 @bot.tree.command(name="logstatus", description="Check current logging status (Admin only)")
 @app_commands.default_permissions(administrator=True)
 async def log_status(interaction: discord.Interaction):
-    if str(interaction.guild.id) in bot.log_channels:
-        channel_id = bot.log_channels[str(interaction.guild.id)]
+    config = bot.log_channels.get(interaction.guild.id)
+    if config:
+        channel_id = config.channel_id
         channel = bot.get_channel(channel_id)
         
         if channel:
@@ -342,7 +894,10 @@ async def log_status(interaction: discord.Interaction):
                 description=f"✅ Logging is **enabled**\n📁 Log Channel: {channel.mention}",
                 color=0x00ff00
             )
-            embed.add_field(name="📊 Events Logged", value="• Messages (sent/edited/deleted)\n• Member joins/leaves\n• Role changes\n• Channel creation/deletion\n• Voice activity\n• Nickname changes", inline=False)
+            enabled = [label for event, label in EVENT_LABELS.items() if config.events & event]
+            embed.add_field(name="📊 Events Logged", value="\n".join(f"• {label}" for label in enabled) or "None (use `/logevent` to enable)", inline=False)
+            embed.add_field(name="📨 Delivery", value="Webhook" if config.webhook_url else "Channel", inline=True)
+            embed.add_field(name="📬 Queued Events", value=bot.log_dispatcher.queue_depth_for(channel_id), inline=True)
         else:
             embed = discord.Embed(
                 title="📋 Logging Status",
@@ -358,6 +913,154 @@ async def log_status(interaction: discord.Interaction):
     
     await interaction.response.send_message(embed=embed)
 
+@bot.tree.command(name="logevent", description="Enable or disable logging of an event type (Admin only)")
+@app_commands.describe(
+    event="Event type to change",
+    enabled="Whether this event should be logged"
+)
+@app_commands.choices(event=[app_commands.Choice(name="All events", value="ALL")] + [
+    app_commands.Choice(name=label, value=event.name) for event, label in EVENT_LABELS.items()
+])
+@app_commands.default_permissions(administrator=True)
+async def log_event_toggle(interaction: discord.Interaction, event: app_commands.Choice[str], enabled: bool):
+    config = bot.log_channels.get(interaction.guild.id)
+    if not config:
+        await interaction.response.send_message("❌ No logging channel set! Use `/setlogchannel` first.", ephemeral=True)
+        return
+    
+    bits = ALL_EVENTS if event.value == "ALL" else LogEvent[event.value]
+    events = config.events | int(bits) if enabled else config.events & ~int(bits)
+    await bot.set_log_config(interaction.guild.id, config.replace(events=events))
+    
+    embed = discord.Embed(
+        title="📋 Log Events Updated",
+        description=f"**{event.name}** logging is now **{'enabled' if enabled else 'disabled'}**",
+        color=0x00ff00 if enabled else 0xff9900
+    )
+    await interaction.response.send_message(embed=embed)
+
+@bot.tree.command(name="logevents", description="Show which events are logged for this server (Admin only)")
+@app_commands.default_permissions(administrator=True)
+async def log_events_list(interaction: discord.Interaction):
+    config = bot.log_channels.get(interaction.guild.id)
+    if not config:
+        await interaction.response.send_message("❌ No logging channel set! Use `/setlogchannel` first.", ephemeral=True)
+        return
+    
+    embed = discord.Embed(title="📋 Log Events", color=0x0099ff)
+    embed.description = "\n".join(
+        f"{'✅' if config.events & event else '❌'} {label}" for event, label in EVENT_LABELS.items()
+    )
+    embed.set_footer(text="Use /logevent to change")
+    await interaction.response.send_message(embed=embed)
+
+def archive_summary(record):
+    """One-line description of an archived event for search results"""
+    data = record["d"]
+    if "content" in data:
+        text = data["content"] or "*No text content*"
+    elif "changes" in data:
+        text = "; ".join(data["changes"])
+    elif record["e"] == LogEvent.VOICE.name:
+        text = f"{data.get('before') or '—'} → {data.get('after') or '—'}"
+    else:
+        text = data.get("name", "")
+    return text.replace("\n", " ")[:100]
+
+@bot.tree.command(name="logsearch", description="Search this server's archived log events (Admin only)")
+@app_commands.describe(
+    user="Only show events for this user",
+    event="Only show this event type",
+    days="How many days back to search (default: 7)"
+)
+@app_commands.choices(event=[
+    app_commands.Choice(name=label, value=event.name) for event, label in EVENT_LABELS.items()
+])
+@app_commands.default_permissions(administrator=True)
+async def log_search(interaction: discord.Interaction, user: discord.User = None,
+                     event: app_commands.Choice[str] = None, days: app_commands.Range[int, 1, 365] = 7):
+    await interaction.response.defer(ephemeral=True)
+    
+    started = time.perf_counter()
+    since = time.time() - days * 86400
+    records, segments = await bot.audit_archive.search(
+        interaction.guild.id,
+        since,
+        user_id=user.id if user else None,
+        events=LogEvent[event.value] if event else None,
+        limit=15
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    
+    embed = discord.Embed(title="🔎 Log Search", color=0x0099ff)
+    filters = [f"Last {days} days"]
+    if user:
+        filters.append(f"User: {user.mention}")
+    if event:
+        filters.append(f"Event: {event.name}")
+    embed.add_field(name="Filters", value="\n".join(filters), inline=False)
+    
+    if records:
+        lines = []
+        for record in records:
+            label = EVENT_LABELS[LogEvent[record["e"]]]
+            who = f"<@{record['u']}> " if record["u"] else ""
+            lines.append(f"<t:{int(record['t'])}:f> **{label}** {who}{archive_summary(record)}")
+        embed.description = "\n".join(lines)[:4000]
+    else:
+        embed.description = "No matching events found"
+    
+    embed.set_footer(text=f"{len(records)} results • {segments} segments read • {elapsed_ms:.0f} ms")
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+SEARCH_PAGE_SIZE = 10
+
+@bot.tree.command(name="searchmessages", description="Search logged message content in this server (Admin only)")
+@app_commands.describe(
+    text="Words or phrase to search for",
+    page="Results page (default: 1)"
+)
+@app_commands.default_permissions(administrator=True)
+async def search_messages(interaction: discord.Interaction, text: str, page: app_commands.Range[int, 1, 1000] = 1):
+    await interaction.response.defer(ephemeral=True)
+    
+    rows, total = await bot.message_index.search(
+        interaction.guild.id, text, limit=SEARCH_PAGE_SIZE, offset=(page - 1) * SEARCH_PAGE_SIZE
+    )
+    pages = max(1, (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE)
+    
+    embed = discord.Embed(title=f"🔎 Message Search - \"{text[:100]}\"", color=0x0099ff)
+    if rows:
+        lines = []
+        for author_id, channel_id, message_id, event, ts, snippet in rows:
+            label = EVENT_LABELS[LogEvent[event]]
+            link = f"[jump](https://discord.com/channels/{interaction.guild.id}/{channel_id}/{message_id})" if message_id else ""
+            lines.append(f"<t:{int(ts)}:f> <@{author_id}> in <#{channel_id}> ({label}) {link}\n> {snippet.replace(chr(10), ' ')[:200]}")
+        embed.description = "\n".join(lines)[:4000]
+    else:
+        embed.description = "No matching messages found"
+    
+    embed.set_footer(text=f"Page {min(page, pages)} of {pages} • {total:,} matches • Use page to see more")
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="searchretention", description="Set how long logged messages stay searchable (Admin only)")
+@app_commands.describe(days="Days to keep message content in the search index")
+@app_commands.default_permissions(administrator=True)
+async def search_retention(interaction: discord.Interaction, days: app_commands.Range[int, 1, 365]):
+    config = bot.log_channels.get(interaction.guild.id)
+    if not config:
+        await interaction.response.send_message("❌ No logging channel set! Use `/setlogchannel` first.", ephemeral=True)
+        return
+    
+    await bot.set_log_config(interaction.guild.id, config.replace(retention_days=days))
+    
+    embed = discord.Embed(
+        title="🔎 Search Retention Updated",
+        description=f"Logged messages will be searchable for **{days}** days",
+        color=0x00ff00
+    )
+    await interaction.response.send_message(embed=embed)
+
 # =================================
 # SECURITY COMMANDS
 # =================================
@@ -457,23 +1160,34 @@ async def servers_command(interaction: discord.Interaction):
         await interaction.response.send_message("❌ Owner only command!", ephemeral=True)
         return
     
+    await interaction.response.defer(ephemeral=True)
+    
+    clusters = await bot.cluster_query('servers')
+    servers = [server for cluster in clusters for server in cluster.get('result', [])]
+    
     embed = discord.Embed(
         title="🏠 Bot Servers",
-        description=f"Bot is currently in {len(bot.guilds)} servers:",
+        description=f"Bot is currently in {len(servers)} servers:",
         color=0x0099ff
     )
     
-    for guild in bot.guilds[:10]:  # Show first 10 servers
+    for server in servers[:10]:  # Show first 10 servers
         embed.add_field(
-            name=f"🏠 {guild.name}",
-            value=f"ID: `{guild.id}`\nMembers: {guild.member_count}\nOwner: {guild.owner}",
+            name=f"🏠 {server['name']}",
+            value=f"ID: `{server['id']}`\nMembers: {server['members']}\nOwner: {server['owner']}",
             inline=False
         )
     
-    if len(bot.guilds) > 10:
-        embed.set_footer(text=f"Showing 10 of {len(bot.guilds)} servers")
+    footer = []
+    if len(servers) > 10:
+        footer.append(f"Showing 10 of {len(servers)} servers")
+    missing = [str(cluster['cluster']) for cluster in clusters if 'error' in cluster]
+    if missing:
+        footer.append(f"No answer from cluster {', '.join(missing)}")
+    if footer:
+        embed.set_footer(text=" • ".join(footer))
     
-    await interaction.response.send_message(embed=embed, ephemeral=True)
+    await interaction.followup.send(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="leave", description="Leave a server (Owner only)")
 @app_commands.describe(server_id="Server ID to leave")
@@ -503,6 +1217,42 @@ async def leave_server_command(interaction: discord.Interaction, server_id: str)
     except Exception as e:
         await interaction.response.send_message(f"❌ Error leaving server: {e}", ephemeral=True)
 
+def fanout_embed(job):
+    """Progress or result embed for a fan-out job"""
+    total = len(job.guild_ids)
+    if job.running:
+        color = 0x0099ff
+        status = f"⏳ {job.done}/{total} servers done"
+    elif job.failed:
+        color = 0xff9900
+        status = f"⚠️ Finished with {len(job.failed)} failures"
+    else:
+        color = 0x00ff00
+        status = "✅ Finished"
+    
+    embed = discord.Embed(title=job.title, description=status, color=color)
+    embed.add_field(name="✅ Succeeded", value=f"{len(job.succeeded)}/{total}", inline=True)
+    embed.add_field(name="❌ Failed", value=len(job.failed), inline=True)
+    embed.add_field(name="⏱️ Time", value=f"{job.elapsed:.1f}s", inline=True)
+    
+    if job.failed:
+        lines = []
+        for guild_id, reason in list(job.failed.items())[:10]:
+            lines.append(f"🏠 {job.labels.get(guild_id, guild_id)}: {reason}")
+        if len(job.failed) > 10:
+            lines.append(f"…and {len(job.failed) - 10} more")
+        embed.add_field(name="📋 Failures", value="\n".join(lines), inline=False)
+        if not job.running:
+            embed.set_footer(text=f"Job {job.id} • Use /fanoutresume {job.id} to retry the failed servers")
+    else:
+        embed.set_footer(text=f"Job {job.id}")
+    return embed
+
+async def run_fanout(interaction, job):
+    """Run a fan-out job, editing one follow-up message with its progress"""
+    message = await interaction.followup.send(embed=fanout_embed(job), ephemeral=True, wait=True)
+    await bot.fanout.run(job, progress=lambda job: message.edit(embed=fanout_embed(job)))
+
 @bot.tree.command(name="globalban", description="Ban user from all mutual servers (Owner only)")
 @app_commands.describe(
     user_id="User ID to ban globally",
@@ -515,31 +1265,49 @@ async def globalban_command(interaction: discord.Interaction, user_id: str, reas
     
     try:
         user = await bot.fetch_user(int(user_id))
-        banned_from = []
-        
-        for guild in bot.guilds:
-            try:
-                member = guild.get_member(user.id)
-                if member:
-                    await member.ban(reason=f"Global ban: {reason}")
-                    banned_from.append(guild.name)
-            except:
-                pass
-        
-        embed = discord.Embed(
-            title="🔨 Global Ban",
-            description=f"**User:** {user.mention}\n**Reason:** {reason}\n**Banned from {len(banned_from)} servers**",
-            color=0xff0000
-        )
-        if banned_from:
-            embed.add_field(name="🏠 Servers", value="\n".join(banned_from[:10]), inline=False)
-        
-        await interaction.response.send_message(embed=embed, ephemeral=True)
-        
     except ValueError:
         await interaction.response.send_message("❌ Invalid user ID!", ephemeral=True)
-    except Exception as e:
-        await interaction.response.send_message(f"❌ Error: {e}", ephemeral=True)
+        return
+    except discord.NotFound:
+        await interaction.response.send_message("❌ User not found!", ephemeral=True)
+        return
+    
+    # Banning can take much longer than the 3 second interaction deadline
+    await interaction.response.defer(ephemeral=True)
+    
+    clusters = await bot.cluster_query('mutual_guilds', user_id=user.id)
+    guild_names = {guild_id: name for cluster in clusters for guild_id, name in cluster.get('result', [])}
+    if not guild_names:
+        await interaction.followup.send(f"❌ {user.mention} is not in any mutual servers", ephemeral=True)
+        return
+    
+    async def ban(guild_id):
+        # Bans go straight to the REST API, so servers handled by other cluster workers work too
+        await bot.http.ban(user.id, guild_id, reason=f"Global ban: {reason}")
+    
+    job = bot.fanout.create(f"🔨 Global Ban - {user}", 'ban', sorted(guild_names), ban, labels=guild_names)
+    await run_fanout(interaction, job)
+
+@bot.tree.command(name="fanoutresume", description="Retry the failed servers of a cross-server job (Owner only)")
+@app_commands.describe(job_id="Job ID shown in the job's footer")
+async def fanout_resume_command(interaction: discord.Interaction, job_id: str):
+    if not bot.security.is_owner(interaction.user.id):
+        await interaction.response.send_message("❌ Owner only command!", ephemeral=True)
+        return
+    
+    job = bot.fanout.get(job_id.strip())
+    if job is None:
+        await interaction.response.send_message("❌ Unknown or expired job ID!", ephemeral=True)
+        return
+    if job.running:
+        await interaction.response.send_message("❌ That job is still running!", ephemeral=True)
+        return
+    if not job.remaining():
+        await interaction.response.send_message("✅ That job already succeeded in every server", ephemeral=True)
+        return
+    
+    await interaction.response.defer(ephemeral=True)
+    await run_fanout(interaction, job)
 
 @bot.tree.command(name="userinfo_global", description="Get detailed user info across all servers (Owner only)")
 @app_commands.describe(user_id="User ID to check")
@@ -548,14 +1316,13 @@ async def userinfo_global_command(interaction: discord.Interaction, user_id: str
         await interaction.response.send_message("❌ Owner only command!", ephemeral=True)
         return
     
+    # Asking the other cluster workers can take longer than the interaction deadline
+    await interaction.response.defer(ephemeral=True)
+    
     try:
         user = await bot.fetch_user(int(user_id))
-        mutual_servers = []
-        
-        for guild in bot.guilds:
-            member = guild.get_member(user.id)
-            if member:
-                mutual_servers.append(f"🏠 {guild.name}")
+        clusters = await bot.cluster_query('mutual_guilds', user_id=user.id)
+        mutual_servers = [f"🏠 {name}" for cluster in clusters for _, name in cluster.get('result', [])]
         
         embed = discord.Embed(
             title=f"🔍 Global User Info - {user.name}",
@@ -572,34 +1339,132 @@ async def userinfo_global_command(interaction: discord.Interaction, user_id: str
             if len(mutual_servers) > 10:
                 embed.set_footer(text=f"Showing 10 of {len(mutual_servers)} servers")
         
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        await interaction.followup.send(embed=embed, ephemeral=True)
         
     except ValueError:
-        await interaction.response.send_message("❌ Invalid user ID!", ephemeral=True)
+        await interaction.followup.send("❌ Invalid user ID!", ephemeral=True)
     except Exception as e:
-        await interaction.response.send_message(f"❌ Error: {e}", ephemeral=True)
+        await interaction.followup.send(f"❌ Error: {e}", ephemeral=True)
+
+def handler_latency_embed():
+    """Slowest handlers and slash commands by p95, plus recent slow invocations"""
+    embed = discord.Embed(title="⏱️ Handler Latency", color=0x0099ff)
+    rows = bot.instrumentation.summary(limit=12)
+    if rows:
+        lines = [f"{'name':<24} {'count':>7} {'p50':>6} {'p95':>6} {'p99':>6} {'max':>6}"]
+        for row in rows:
+            times = " ".join(f"{row[key] * 1000:>6.0f}" for key in ('p50', 'p95', 'p99', 'max'))
+            lines.append(f"{row['name'][:24]:<24} {row['count']:>7,} {times}")
+        embed.description = "```\n" + "\n".join(lines) + "\n```"
+    else:
+        embed.description = "No handlers timed yet"
+    
+    slow = [
+        f"<t:{int(when)}:R> `{name}` {seconds:.2f}s: {where}"
+        for when, name, seconds, where in reversed(bot.instrumentation.recent_slow)
+    ]
+    embed.add_field(
+        name=f"🐢 Slow Invocations (over {bot.instrumentation.threshold:g}s)",
+        value="\n".join(slow)[:1024] if slow else "None",
+        inline=False
+    )
+    loop_stats = bot.loop_monitor.stats()
+    embed.add_field(
+        name=f"🔁 Event Loop ({bot.event_loop})",
+        value=f"Lag p50: {loop_stats['p50'] * 1000:.1f} ms, p99: {loop_stats['p99'] * 1000:.1f} ms\nWorst: {loop_stats['max'] * 1000:.0f} ms\nBlocked: {loop_stats['stalls']:,} times",
+        inline=False
+    )
+    if bot.gateway_recorder:
+        capture = bot.gateway_recorder.stats()
+        embed.add_field(
+            name="🎥 Gateway Capture",
+            value=f"Recorded: {capture['recorded']:,} events ({capture['bytes_written'] / 1024 / 1024:.1f} MB)\nFiltered: {capture['filtered']:,}\nDropped (queue full): {capture['dropped']:,}\nWrite errors: {capture['errors']:,}",
+            inline=False
+        )
+    embed.set_footer(text="Times in milliseconds" + (f" • cluster #{bot.cluster_id}" if bot.cluster else ""))
+    return embed
 
 @bot.tree.command(name="stats", description="Detailed bot statistics (Owner only)")
-async def stats_command(interaction: discord.Interaction):
+@app_commands.describe(detail="Also show handler and command latency")
+async def stats_command(interaction: discord.Interaction, detail: bool = False):
     if not bot.security.is_owner(interaction.user.id):
         await interaction.response.send_message("❌ Owner only command!", ephemeral=True)
         return
     
+    # Cluster workers can take a moment to answer
+    await interaction.response.defer(ephemeral=True)
+    
     uptime = datetime.now(timezone.utc) - bot.start_time
-    total_members = sum(guild.member_count for guild in bot.guilds)
+    clusters = await bot.cluster_query('stats')
+    answered = [cluster['result'] for cluster in clusters if 'result' in cluster]
+    total_guilds = sum(result['guilds'] for result in answered)
+    total_members = sum(result['members'] for result in answered)
     
     embed = discord.Embed(
         title="📊 Bot Statistics",
         color=0x0099ff
     )
     embed.add_field(name="🕒 Uptime", value=f"{uptime.days}d {uptime.seconds//3600}h {(uptime.seconds//60)%60}m", inline=True)
-    embed.add_field(name="🏠 Servers", value=len(bot.guilds), inline=True)
+    embed.add_field(name="🏠 Servers", value=f"{total_guilds:,}", inline=True)
     embed.add_field(name="👥 Total Users", value=f"{total_members:,}", inline=True)
+    
+    cluster_lines = []
+    for cluster in clusters:
+        if 'result' in cluster:
+            result = cluster['result']
+            shards = f"{result['shards'][0]}-{result['shards'][-1]}" if result['shards'] else "none"
+            latency = f"{result['latency']} ms" if result['latency'] is not None else "connecting"
+            cluster_lines.append(f"#{cluster['cluster']} shards {shards}: {result['guilds']:,} servers, {latency}")
+        else:
+            cluster_lines.append(f"#{cluster['cluster']}: ❌ {cluster['error']}")
+    embed.add_field(name=f"🧩 Clusters ({bot.shard_count} shards)", value="\n".join(cluster_lines)[:1024], inline=False)
+    
     embed.add_field(name="⚙️ Commands", value=len(bot.tree.get_commands()), inline=True)
     embed.add_field(name="🌍 Environment", value=bot.security.environment.title(), inline=True)
     embed.add_field(name="🐛 Debug Mode", value="On" if bot.security.debug_mode else "Off", inline=True)
     embed.add_field(name="📋 Logging Servers", value=len(bot.log_channels), inline=True)
     
+    log_stats = bot.log_dispatcher.stats()
+    embed.add_field(
+        name="📬 Log Queue",
+        value=f"Queued: {log_stats['queued']:,} (deepest {log_stats['deepest']:,})\nIn flight: {log_stats['inflight']}\nSent: {log_stats['sent_embeds']:,} in {log_stats['sent_messages']:,} messages",
+        inline=True
+    )
+    embed.add_field(
+        name="🗑️ Log Drops",
+        value=f"Dropped: {log_stats['dropped']:,}\nSpilled: {log_stats['spilled']:,}\nFailed: {log_stats['failed']:,} ({log_stats['rejected']:,} rejected)",
+        inline=True
+    )
+    
+    spool_stats = bot.log_spool.stats()
+    embed.add_field(
+        name="🧾 Log Spool",
+        value=f"Pending: {spool_stats['pending_bytes'] / 1024:.1f} KB in {spool_stats['channels']} channels\nReplayed: {spool_stats['replayed']:,} ({spool_stats['replay_rate']:.1f}/s)\nDiscarded: {spool_stats['discarded']:,}",
+        inline=True
+    )
+    
+    index_stats = bot.membership_index.stats()
+    embed.add_field(
+        name="🗂️ Membership Index",
+        value=f"Users: {index_stats['users']:,}\nEntries: {index_stats['entries']:,}\nSize: {index_stats['bytes'] / 1024 / 1024:.1f} MB",
+        inline=True
+    )
+    
+    cache_stats = bot.message_cache.stats()
+    embed.add_field(
+        name="💬 Message Cache",
+        value=f"Messages: {cache_stats['messages']:,}\nSize: {cache_stats['bytes'] / 1024 / 1024:.1f} MB\nHit rate: {cache_stats['hit_rate']:.0%}",
+        inline=True
+    )
+    
+    archive_stats = bot.audit_archive.stats()
+    index_stats = bot.message_index.stats()
+    embed.add_field(
+        name="🗄️ Archive",
+        value=f"Records: {archive_stats['records']:,} in {archive_stats['segments']} segments\nSearch indexed: {index_stats['indexed']:,}\nSearch pruned: {index_stats['pruned']:,}",
+        inline=True
+    )
+    
     # Memory usage (if psutil is installed)
     try:
         import psutil
@@ -609,8 +1474,49 @@ async def stats_command(interaction: discord.Interaction):
     except ImportError:
         embed.add_field(name="💾 Memory", value="Install psutil for memory info", inline=True)
     
-    embed.set_footer(text=f"Bot ID: {bot.user.id}")
-    await interaction.response.send_message(embed=embed, ephemeral=True)
+    embed.set_footer(text=f"Bot ID: {bot.user.id}" + (f" • Details below are for cluster #{bot.cluster_id}" if bot.cluster else ""))
+    embeds = [embed, handler_latency_embed()] if detail else [embed]
+    await interaction.followup.send(embeds=embeds, ephemeral=True)
+
+@bot.tree.command(name="memoryreport", description="Member cache memory use per server (Owner only)")
+async def memory_report_command(interaction: discord.Interaction):
+    if not bot.security.is_owner(interaction.user.id):
+        await interaction.response.send_message("❌ Owner only command!", ephemeral=True)
+        return
+    
+    # Measuring walks a sample of every server's members
+    await interaction.response.defer(ephemeral=True)
+    clusters = await bot.cluster_query('memory', timeout=30.0)
+    
+    embed = discord.Embed(
+        title="💾 Member Cache Memory",
+        description=f"Cache profile: **{bot.member_chunker.profile}**",
+        color=0x0099ff
+    )
+    top = []
+    for cluster in clusters:
+        result = cluster.get('result')
+        if result is None:
+            embed.add_field(name=f"🧩 Cluster #{cluster['cluster']}", value=f"❌ {cluster['error']}", inline=True)
+            continue
+        rss = f"{result['rss'] / 1024 / 1024:.1f} MB" if result['rss'] is not None else "Install psutil"
+        embed.add_field(
+            name=f"🧩 Cluster #{cluster['cluster']}" if bot.cluster else "📦 Process",
+            value=f"RSS: {rss}\nMember cache: ~{result['bytes'] / 1024 / 1024:.1f} MB\nCached members: {result['cached']:,}\nChunked: {result['chunked']}/{result['guilds']} servers",
+            inline=True
+        )
+        top.extend(result['top'])
+    
+    top.sort(key=lambda entry: entry['bytes'], reverse=True)
+    if top:
+        lines = [
+            f"{'✅' if entry['chunked'] else '⏳'} **{entry['name'][:40]}**: ~{entry['bytes'] / 1024 / 1024:.2f} MB "
+            f"({entry['cached']:,}/{entry['members']:,} members cached)"
+            for entry in top[:10]
+        ]
+        embed.add_field(name="🏠 Largest Servers", value="\n".join(lines)[:1024], inline=False)
+    embed.set_footer(text="Sizes are measured on a sample of each server's cached members")
+    await interaction.followup.send(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="logs", description="View recent bot logs (Owner only)")
 async def logs_command(interaction: discord.Interaction):
@@ -727,21 +1633,39 @@ async def avatar_slash(interaction: discord.Interaction, member: discord.Member
 @bot.tree.command(name="membercount", description="Show detailed member statistics for the server")
 async def membercount_slash(interaction: discord.Interaction):
     guild = interaction.guild
-    total_members = guild.member_count
-    online_members = len([m for m in guild.members if m.status != discord.Status.offline])
-    bots = len([m for m in guild.members if m.bot])
-    humans = total_members - bots
+    counts = bot.member_stats.get(guild)
+    note = None
+    
+    # Member list not cached yet: load it if the cache profile allows, else use Discord's estimates
+    if not counts.complete:
+        await interaction.response.defer()
+        if await bot.member_chunker.ensure(guild):
+            counts = bot.member_stats.get(guild)
+    
+    if counts.complete:
+        total, online, humans, bots = counts.total, counts.online, counts.humans, counts.bots
+    else:
+        estimate = await bot.fetch_guild(guild.id, with_counts=True)
+        total = estimate.approximate_member_count or counts.total
+        online = estimate.approximate_presence_count or "Unknown"
+        humans = bots = "Unknown"
+        note = "Member cache is disabled, counts are Discord's estimates"
     
     embed = discord.Embed(
         title="📊 Member Statistics",
         color=0x0099ff
     )
-    embed.add_field(name="👥 Total Members", value=total_members, inline=True)
-    embed.add_field(name="🟢 Online", value=online_members, inline=True)
+    embed.add_field(name="👥 Total Members", value=total, inline=True)
+    embed.add_field(name="🟢 Online", value=online, inline=True)
     embed.add_field(name="👤 Humans", value=humans, inline=True)
     embed.add_field(name="🤖 Bots", value=bots, inline=True)
+    if note:
+        embed.set_footer(text=note)
     
-    await interaction.response.send_message(embed=embed)
+    if interaction.response.is_done():
+        await interaction.followup.send(embed=embed)
+    else:
+        await interaction.response.send_message(embed=embed)
 
 @bot.tree.command(name="channelinfo", description="Get information about a channel")
 @app_commands.describe(channel="The channel to get information about (leave empty for current channel)")
@@ -757,9 +1681,20 @@ async def channelinfo_slash(interaction: discord.Interaction, channel: discord.T
     embed.add_field(name="📅 Created", value=channel.created_at.strftime("%B %d, %Y"), inline=True)
     embed.add_field(name="📝 Topic", value=channel.topic or "No topic set", inline=False)
     embed.add_field(name="🔞 NSFW", value="Yes" if channel.is_nsfw() else "No", inline=True)
-    embed.add_field(name="👥 Members", value=len(channel.members), inline=True)
     
-    await interaction.response.send_message(embed=embed)
+    # Channel members come from the member cache, which may need loading first
+    if not channel.guild.chunked and bot.member_chunker.enabled:
+        await interaction.response.defer()
+        await bot.member_chunker.ensure(channel.guild)
+    if channel.guild.chunked:
+        embed.add_field(name="👥 Members", value=len(channel.members), inline=True)
+    else:
+        embed.add_field(name="👥 Members", value="Unknown (member cache disabled)", inline=True)
+    
+    if interaction.response.is_done():
+        await interaction.followup.send(embed=embed)
+    else:
+        await interaction.response.send_message(embed=embed)
 
 # =================================
 # MODERATION SLASH COMMANDS
@@ -927,16 +1862,17 @@ async def warn_slash(interaction: discord.Interaction, member: discord.Member, r
 # =================================
 
 @bot.tree.command(name="time", description="Get the current time in UTC or a specific timezone")
-@app_commands.describe(timezone_name="Timezone (e.g., US/Eastern, Europe/London)")
+@app_commands.describe(timezone_name="Timezone or city (e.g., America/New_York, Europe/London, Tokyo)")
 async def time_slash(interaction: discord.Interaction, timezone_name: str = None):
     if timezone_name:
-        try:
-            tz = pytz.timezone(timezone_name)
-            time = datetime.now(tz)
-            tz_display = timezone_name
-        except:
-            await interaction.response.send_message("❌ Invalid timezone! Use format like 'US/Eastern' or 'Europe/London'", ephemeral=True)
+        tz = timezones.resolve(timezone_name)
+        if tz is None:
+            suggestions = timezones.search(timezone_name, limit=3)
+            hint = f" Did you mean {', '.join(f'`{name}`' for name in suggestions)}?" if suggestions else ""
+            await interaction.response.send_message(f"❌ Unknown timezone!{hint}", ephemeral=True)
             return
+        time = datetime.now(tz)
+        tz_display = tz.key
     else:
         time = datetime.now(timezone.utc)
         tz_display = "UTC"
@@ -948,6 +1884,10 @@ async def time_slash(interaction: discord.Interaction, timezone_name: str = None
     )
     await interaction.response.send_message(embed=embed)
 
+@time_slash.autocomplete('timezone_name')
+async def timezone_autocomplete(interaction: discord.Interaction, current: str):
+    return [app_commands.Choice(name=name, value=name) for name in timezones.search(current)]
+
 @bot.tree.command(name="date", description="Get the current date and time information")
 async def date_slash(interaction: discord.Interaction):
     now = datetime.now(timezone.utc)
@@ -960,32 +1900,7 @@ async def date_slash(interaction: discord.Interaction):
 
 @bot.tree.command(name="timezone", description="Show common timezones with current times")
 async def timezone_slash(interaction: discord.Interaction):
-    timezones = {
-        "UTC": "UTC",
-        "Eastern": "US/Eastern",
-        "Central": "US/Central", 
-        "Mountain": "US/Mountain",
-        "Pacific": "US/Pacific",
-        "London": "Europe/London",
-        "Paris": "Europe/Paris",
-        "Tokyo": "Asia/Tokyo",
-        "Sydney": "Australia/Sydney"
-    }
-    
-    embed = discord.Embed(title="🌍 Common Timezones", color=0x0099ff)
-    for name, tz in timezones.items():
-        try:
-            time = datetime.now(pytz.timezone(tz))
-            embed.add_field(
-                name=name,
-                value=f"`{tz}`\n{time.strftime('%H:%M')}",
-                inline=True
-            )
-        except:
-            pass
-    
-    embed.set_footer(text="Use /time [timezone] to get specific time")
-    await interaction.response.send_message(embed=embed)
+    await interaction.response.send_message(embed=bot.timezone_board.get())
 
 # =================================
 # MATH SLASH COMMANDS
@@ -995,29 +1910,20 @@ async def timezone_slash(interaction: discord.Interaction):
 @app_commands.describe(expression="Mathematical expression to calculate (use * for multiply, ** for power)")
 async def calc_slash(interaction: discord.Interaction, expression: str):
     try:
-        # Remove spaces and validate
-        expression = expression.replace(' ', '')
-        
-        # Only allow certain characters for security
-        allowed_chars = set('0123456789+-*/().')
-        if not all(c in allowed_chars for c in expression):
-            await interaction.response.send_message("❌ Invalid characters in expression! Only use numbers, +, -, *, /, (, ), .", ephemeral=True)
-            return
-        
-        # Evaluate safely
-        result = eval(expression)
-        
-        embed = discord.Embed(
-            title="🧮 Calculator",
-            description=f"**Expression:** `{expression}`\n**Result:** `{result}`",
-            color=0x0099ff
-        )
-        await interaction.response.send_message(embed=embed)
-        
+        result = await bot.calculator.calculate(expression)
     except ZeroDivisionError:
         await interaction.response.send_message("❌ Cannot divide by zero!", ephemeral=True)
-    except:
-        await interaction.response.send_message("❌ Invalid mathematical expression!", ephemeral=True)
+        return
+    except CalcError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+    
+    embed = discord.Embed(
+        title="🧮 Calculator",
+        description=f"**Expression:** `{expression.replace(' ', '')}`\n**Result:** `{result}`",
+        color=0x0099ff
+    )
+    await interaction.response.send_message(embed=embed)
 
 @bot.tree.command(name="random", description="Generate a random number between min and max")
 @app_commands.describe(
@@ -1153,14 +2059,20 @@ async def test_slash(interaction: discord.Interaction):
 # SECURE BOT STARTUP
 # =================================
 
+profiler.mark('import')
+
 def main():
     """Secure bot startup"""
+    setup_logging()
     try:
         logging.info("Starting Ultimate Secure Discord bot...")
         
         # Validate environment
         if security.environment == 'production':
             logging.info("Production mode: Enhanced security active")
+        bot.event_loop = use_event_loop(os.getenv('EVENT_LOOP', 'asyncio').lower())
+        logging.info(f"Using the {bot.event_loop} event loop")
+        profiler.mark('config')
         
         # Start bot
         bot.run(security.token)
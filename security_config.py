@@ -2,17 +2,102 @@ import os
 import sys
 import logging
 import hashlib
-from datetime import datetime, timezone
-from dotenv import load_dotenv
+from datetime import datetime
 
 class SecurityError(Exception):
     """Custom exception for security-related errors"""
     pass
 
+_environment_loaded = False
+_logging_configured = False
+
+def load_environment():
+    """Load the .env file into the environment once"""
+    global _environment_loaded
+    if _environment_loaded:
+        return
+    from dotenv import load_dotenv
+    load_dotenv()
+    _environment_loaded = True
+
+def setup_logging():
+    """Configure secure logging once (Windows compatible)"""
+    global _logging_configured
+    if _logging_configured:
+        return
+    log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    
+    # Configure logging with UTF-8 encoding for Windows
+    logging.basicConfig(
+        level=logging.INFO,
+        format=log_format,
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ],
+        force=True
+    )
+    
+    # Set Discord logging to WARNING to reduce noise
+    logging.getLogger('discord').setLevel(logging.WARNING)
+    logging.getLogger('discord.http').setLevel(logging.WARNING)
+    _logging_configured = True
+
+def env_int(name, default, minimum=None):
+    """Read an integer setting from the environment, falling back to default"""
+    load_environment()
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    
+    try:
+        value = int(value)
+    except ValueError:
+        logging.warning(f"Invalid {name} value '{value}' (must be a number), using {default}")
+        return default
+    
+    if minimum is not None and value < minimum:
+        logging.warning(f"{name} must be at least {minimum}, using {minimum}")
+        return minimum
+    return value
+
+def env_float(name, default, minimum=None):
+    """Read a float setting from the environment, falling back to default"""
+    load_environment()
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    
+    try:
+        value = float(value)
+    except ValueError:
+        logging.warning(f"Invalid {name} value '{value}' (must be a number), using {default}")
+        return default
+    
+    if minimum is not None and value < minimum:
+        logging.warning(f"{name} must be at least {minimum}, using {minimum}")
+        return minimum
+    return value
+
+def data_path(filename):
+    """Path for a runtime data file inside BOT_DATA_DIR (created on demand)"""
+    load_environment()
+    data_dir = os.getenv('BOT_DATA_DIR', 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    return os.path.join(data_dir, filename)
+
+def worker_data_path(filename):
+    """Like data_path, but private to one cluster worker for files a single process must own"""
+    cluster_id = os.getenv('CLUSTER_ID')
+    if cluster_id is None:
+        return data_path(filename)
+    worker_dir = data_path(f'cluster-{cluster_id}')
+    os.makedirs(worker_dir, exist_ok=True)
+    return os.path.join(worker_dir, filename)
+
 class BotSecurity:
     def __init__(self):
         self.setup_logging()
-        load_dotenv()
+        load_environment()
         
         # Security validation
         self.token = self._validate_token()
@@ -25,21 +110,7 @@ class BotSecurity:
     
     def setup_logging(self):
         """Configure secure logging (Windows compatible)"""
-        log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        
-        # Configure logging with UTF-8 encoding for Windows
-        logging.basicConfig(
-            level=logging.INFO,
-            format=log_format,
-            handlers=[
-                logging.StreamHandler(sys.stdout)
-            ],
-            force=True
-        )
-        
-        # Set Discord logging to WARNING to reduce noise
-        logging.getLogger('discord').setLevel(logging.WARNING)
-        logging.getLogger('discord.http').setLevel(logging.WARNING)
+        setup_logging()
     
     def _validate_token(self):
         """Validate Discord bot token"""
@@ -126,5 +197,20 @@ class BotSecurity:
         """Check if debug logging should be enabled"""
         return self.debug_mode and self.environment != 'production'
 
-# Initialize security config
-security = BotSecurity()
\ No newline at end of file
+_security = None
+
+def get_security():
+    """The BotSecurity singleton, validated on first use"""
+    global _security
+    if _security is None:
+        _security = BotSecurity()
+    return _security
+
+class _LazySecurity:
+    """Stands in for the BotSecurity singleton until an attribute is first used"""
+    
+    def __getattr__(self, name):
+        return getattr(get_security(), name)
+
+# Initialize security config on first use, so importing the bot's modules stays cheap
+security = _LazySecurity()
@@ -30,8 +30,8 @@ def create_env_file():
 def check_python_version():
     """Check if Python version is compatible"""
     version = sys.version_info
-    if version.major < 3 or (version.major == 3 and version.minor < 8):
-        print(f"❌ Python 3.8+ required, you have {version.major}.{version.minor}")
+    if version.major < 3 or (version.major == 3 and version.minor < 9):
+        print(f"❌ Python 3.9+ required, you have {version.major}.{version.minor}")
         return False
     print(f"✅ Python {version.major}.{version.minor}.{version.micro} is compatible")
     return True
@@ -42,7 +42,11 @@ def check_dependencies():
         import discord
         import dotenv
         import aiohttp
-        import pytz
+        import tzdata  # zoneinfo's time zone data on systems without one, like Windows
+        if discord.version_info < (2, 4):
+            print(f"❌ discord.py 2.4+ required, you have {discord.__version__}")
+            print("Run: pip install -U -r requirements.txt")
+            return False
         print("✅ All required dependencies are installed")
         return True
     except ImportError as e:
@@ -0,0 +1,74 @@
+"""
+Startup phase profiler
+Times each startup phase, logs a summary at the first on_ready and warns when a phase got slower
+"""
+
+import json
+import logging
+import os
+import statistics
+import time
+
+class StartupProfiler:
+    """Records consecutive startup phases as (name, seconds)"""
+
+    def __init__(self, history_size=20, regression_factor=1.5, regression_seconds=0.5):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = []
+        self.notes = {}  # phase -> extra detail for the summary
+        self.history_size = history_size
+        # A phase counts as a regression when it is this much slower than its recent median
+        self.regression_factor = regression_factor
+        self.regression_seconds = regression_seconds
+        self.reported = False
+
+    def mark(self, phase, note=None):
+        """End the current phase and start the next one"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+        if note:
+            self.notes[phase] = note
+
+    @property
+    def total(self):
+        return self.last - self.started
+
+    def _load_history(self, path):
+        try:
+            with open(path, 'r') as f:
+                return [json.loads(line) for line in f if line.strip()][-self.history_size:]
+        except (OSError, ValueError):
+            return []
+
+    def _save_history(self, path, history):
+        entry = {'time': time.time(), 'phases': dict(self.phases)}
+        history = (history + [entry])[-self.history_size:]
+        try:
+            with open(path + '.tmp', 'w') as f:
+                f.writelines(json.dumps(run, separators=(',', ':')) + '\n' for run in history)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logging.warning(f"Could not save startup profile: {e}")
+
+    def report(self, history_path=None):
+        """Log the phase summary once, compare it with earlier runs and store it"""
+        if self.reported:
+            return
+        self.reported = True
+
+        history = self._load_history(history_path) if history_path else []
+        logging.info(f"Startup profile ({self.total:.2f}s total):")
+        for phase, seconds in self.phases:
+            note = f" ({self.notes[phase]})" if phase in self.notes else ""
+            logging.info(f"  {phase:<14} {seconds:7.2f}s{note}")
+
+            previous = [run['phases'][phase] for run in history if phase in run.get('phases', {})]
+            if len(previous) >= 3:
+                median = statistics.median(previous)
+                if seconds > median * self.regression_factor and seconds - median > self.regression_seconds:
+                    logging.warning(f"Startup phase '{phase}' took {seconds:.2f}s, usually {median:.2f}s")
+
+        if history_path:
+            self._save_history(history_path, history)
@@ -0,0 +1,120 @@
+"""
+Timezone lookups for the time commands
+Zones come from the standard library's zoneinfo; lookups are memoized and matched case-insensitively
+"""
+
+import difflib
+import time
+from datetime import datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+import discord
+
+# Label -> IANA zone shown by /timezone
+COMMON_TIMEZONES = {
+    "UTC": "UTC",
+    "Eastern": "America/New_York",
+    "Central": "America/Chicago",
+    "Mountain": "America/Denver",
+    "Pacific": "America/Los_Angeles",
+    "London": "Europe/London",
+    "Paris": "Europe/Paris",
+    "Tokyo": "Asia/Tokyo",
+    "Sydney": "Australia/Sydney"
+}
+
+def _normalize(text):
+    return text.strip().lower().replace(' ', '_')
+
+class TimezoneIndex:
+    """Every known zone name, prepared once for exact, city and fuzzy matching"""
+
+    def __init__(self, names):
+        self.names = sorted(names)
+        self.by_key = {name.lower(): name for name in self.names}
+        # "london" -> "Europe/London", only for city names that belong to a single zone
+        cities = {}
+        for name in self.names:
+            cities.setdefault(name.rsplit('/', 1)[-1].lower(), []).append(name)
+        self.by_city = {city: names[0] for city, names in cities.items() if len(names) == 1}
+        self.keys = list(self.by_key)
+
+    def lookup(self, text):
+        """Canonical zone name for an exact or city match, or None"""
+        key = _normalize(text)
+        return self.by_key.get(key) or self.by_city.get(key)
+
+    def search(self, text, limit=25):
+        """Zone names matching a partial or misspelt query, best matches first"""
+        key = _normalize(text)
+        if not key:
+            return self.names[:limit]
+
+        prefix, segment, substring = [], [], []
+        for lower in self.keys:
+            if lower.startswith(key):
+                prefix.append(lower)
+            elif any(part.startswith(key) for part in lower.split('/')[1:]):
+                segment.append(lower)
+            elif key in lower:
+                substring.append(lower)
+        matches = (prefix + segment + substring)[:limit]
+        if len(matches) < limit:
+            # Typos: fall back to similarity against the full name and the city alone
+            close = difflib.get_close_matches(key, self.keys, n=limit, cutoff=0.6)
+            cities = difflib.get_close_matches(key, self.by_city, n=limit, cutoff=0.6)
+            close += [self.by_city[city].lower() for city in cities]
+            matches += [lower for lower in dict.fromkeys(close) if lower not in matches]
+        return [self.by_key[lower] for lower in matches[:limit]]
+
+@lru_cache(maxsize=1)
+def timezone_index():
+    """The zone index, built on first use"""
+    return TimezoneIndex(available_timezones())
+
+@lru_cache(maxsize=1024)
+def search(text, limit=25):
+    """Cached TimezoneIndex.search, autocomplete asks for the same prefixes over and over"""
+    return tuple(timezone_index().search(text, limit))
+
+@lru_cache(maxsize=2048)
+def resolve(text):
+    """ZoneInfo for a zone or city name, None if unknown (unknown names are cached too)"""
+    name = timezone_index().lookup(text)
+    if name is None:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+class TimezoneBoard:
+    """The /timezone embed, rebuilt at most once per minute"""
+
+    def __init__(self, zones=COMMON_TIMEZONES):
+        self.zones = zones
+        self.minute = None
+        self.embed = None
+
+    def _build(self, now):
+        embed = discord.Embed(title="🌍 Common Timezones", color=0x0099ff)
+        for label, name in self.zones.items():
+            zone = resolve(name)
+            if zone is None:
+                continue
+            embed.add_field(
+                name=label,
+                value=f"`{name}`\n{datetime.fromtimestamp(now, zone).strftime('%H:%M')}",
+                inline=True
+            )
+        embed.set_footer(text="Use /time [timezone] to get specific time")
+        return embed
+
+    def get(self):
+        now = time.time()
+        minute = int(now // 60)
+        if minute != self.minute:
+            self.embed = self._build(now)
+            self.minute = minute
+        return self.embed